@@ -0,0 +1,162 @@
+import asyncio
+import contextvars
+import logging
+import time
+import aiohttp
+from modules.html_parser import declared_encoding
+from modules.http_cache import default_cache, safe_cache_call
+from modules.metrics import (mark_cache_hit, record_error, record_request_setup, record_stage, record_ttfb,
+                             trace_url)
+from modules.throttle import MAX_ATTEMPTS, THROTTLE_STATUSES
+from modules.transport import (DEFAULT_HEADERS, DEFAULT_RETRIES, KEEPALIVE_SECONDS, RETRY_STATUSES,
+                               aiohttp_trace_config, backoff_delay, transport_stats)
+
+logger = logging.getLogger(__name__)
+
+DNS_CACHE_TTL = 300
+
+async def _cache_call(method, *args):
+    # SQLite and zlib block; keep them off the event loop. Errors come back as a miss.
+    return await asyncio.get_running_loop().run_in_executor(None, safe_cache_call, method, *args)
+
+async def _fetch_page(session, url, timeout, cache, throttle=None, retries=DEFAULT_RETRIES):
+    cached = await _cache_call(cache.get, url) if cache else None
+    if cached is not None and cached.is_fresh(cache.ttl):
+        mark_cache_hit()
+        return cached.content, declared_encoding(cached.content_type)
+    if throttle is not None:
+        await asyncio.get_running_loop().run_in_executor(None, throttle.prepare, url)
+    attempt = retried = 0
+    delay = 0.0
+    try:
+        while True:
+            attempt += 1
+            if delay:
+                await asyncio.sleep(delay)
+                delay = 0.0
+            ticket = await throttle.acquire_async(url) if throttle is not None else None
+            status = retry_after = None
+            try:
+                start = time.perf_counter()
+                async with session.get(url, headers=cached.validators() if cached else None,
+                                       timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                    status, retry_after = response.status, response.headers.get('Retry-After')
+                    headers_received = time.perf_counter()
+                    record_ttfb(headers_received - start)
+                    if cached is not None and response.status == 304:
+                        await _cache_call(cache.mark_revalidated, url)
+                        return cached.content, declared_encoding(cached.content_type)
+                    if throttle is not None and status in THROTTLE_STATUSES and attempt < MAX_ATTEMPTS:
+                        logger.info(f"{url} answered {status}, retrying (attempt {attempt + 1} of {MAX_ATTEMPTS})")
+                        continue
+                    if status in RETRY_STATUSES and retried < retries:
+                        retried += 1
+                        transport_stats.add_retry(f"HTTP {status}")
+                        delay = backoff_delay(retried)
+                        continue
+                    response.raise_for_status()
+                    content = await response.read()
+                    record_stage('download', time.perf_counter() - headers_received)
+                    if cache and response.status == 200:
+                        await _cache_call(cache.put, url, content, response.headers)
+                    return content, response.charset
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if retried >= retries:
+                    raise
+                retried += 1
+                transport_stats.add_retry(type(e).__name__)
+                delay = backoff_delay(retried)
+            finally:
+                if ticket is not None:
+                    throttle.release(ticket, status, retry_after)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"Request failed for {url}: {str(e) or type(e).__name__}")
+        record_error(e)
+        return None, None
+
+def _stage_trace_config():
+    """Return an aiohttp TraceConfig timing the connection-pool wait, DNS lookups and new connections.
+
+    They run in the request's task, so the times go to the URL's trace.
+    """
+    async def on_request_start(session, context, params):
+        context.resolve_seconds = 0.0
+
+    async def on_step_start(session, context, params):
+        context.step_started = time.perf_counter()
+
+    async def on_queued_end(session, context, params):
+        record_request_setup('wait', time.perf_counter() - context.step_started)
+
+    async def on_dns_resolvehost_start(session, context, params):
+        context.resolve_started = time.perf_counter()
+
+    async def on_dns_resolvehost_end(session, context, params):
+        context.resolve_seconds = time.perf_counter() - context.resolve_started
+        record_request_setup('dns', context.resolve_seconds)
+
+    async def on_connection_create_end(session, context, params):
+        # Creating a connection includes resolving the host; that part is dns.
+        seconds = time.perf_counter() - context.step_started - context.resolve_seconds
+        record_request_setup('connect', max(seconds, 0.0))
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_connection_queued_start.append(on_step_start)
+    trace_config.on_connection_queued_end.append(on_queued_end)
+    trace_config.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+    trace_config.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+    trace_config.on_connection_create_start.append(on_step_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    return trace_config
+
+async def _fetch_and_process(urls, handle_page, on_complete, concurrency, per_host_limit, timeout, cache, throttle):
+    loop = asyncio.get_running_loop()
+    connector = aiohttp.TCPConnector(
+        limit=concurrency, limit_per_host=per_host_limit, keepalive_timeout=KEEPALIVE_SECONDS,
+        use_dns_cache=True, ttl_dns_cache=DNS_CACHE_TTL, ssl=False
+    )
+
+    # aiohttp asks for the compressed encodings it can decode by itself.
+    async with aiohttp.ClientSession(connector=connector, headers=DEFAULT_HEADERS,
+                                     trace_configs=[aiohttp_trace_config(), _stage_trace_config()]) as session:
+        async def fetch_and_handle(url):
+            with trace_url(url):
+                content, encoding = await _fetch_page(session, url, timeout, cache, throttle)
+                if content is None:
+                    return url, None
+                # Parsing and matching are CPU-bound; keep them off the event loop. The
+                # copied context carries the trace into the worker thread.
+                return url, await loop.run_in_executor(None, contextvars.copy_context().run,
+                                                       handle_page, url, content, encoding)
+
+        def report(done):
+            for task in done:
+                url, result = task.result()
+                if on_complete:
+                    on_complete(url, result)
+
+        pending = set()
+        for url in urls:
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                report(done)
+            pending.add(asyncio.ensure_future(fetch_and_handle(url)))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            report(done)
+
+def fetch_and_process(urls, handle_page, on_complete=None, concurrency=200, per_host_limit=10, timeout=20, cache=None,
+                      throttle=None):
+    """Download urls with aiohttp, keeping up to `concurrency` requests in flight.
+
+    `handle_page(url, content, encoding)` runs in a worker thread for every
+    page that downloads successfully. `on_complete(url, result)` is called on
+    the calling thread as each URL finishes, with None for failed downloads.
+    Pages go through the shared page cache unless it is disabled. With an
+    AdaptiveThrottle, requests wait for a slot for their host and
+    rate-limited responses are retried. Connection errors, timeouts and
+    server errors are retried with backoff as in modules.transport.
+    """
+    cache = cache or default_cache()
+    asyncio.run(_fetch_and_process(urls, handle_page, on_complete, concurrency, per_host_limit, timeout, cache, throttle))
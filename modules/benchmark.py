@@ -0,0 +1,216 @@
+"""Offline benchmarks against a generated site served on localhost.
+
+    python -m modules.benchmark -o benchmark.json
+    python -m modules.benchmark -o after.json --compare benchmark.json --pages 2000 --latency 0.02
+
+Benchmarks the sitemap crawl (fetch_sitemap_urls), keyword matching per
+page (process_single_url_for_all_keywords) at several keyword counts and
+the reverse silo analysis (analyze_silo and the first page of the matrix the app
+shows). Each one runs in a fresh process so its peak RSS is its own, and
+the page cache is disabled so every page is downloaded. Throughput, p50/p99
+latency and peak RSS are written to a JSON file that later runs can be
+compared against.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from datetime import datetime, timezone
+import numpy as np
+from modules.synthetic_site import SiteConfig, SyntheticSite, SyntheticSiteServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEYWORD_COUNTS = [10, 1000, 10000]
+DEFAULT_SILO_SIZE = 20
+DEFAULT_REPEAT = 3
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere.
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def summarize(latencies, items, elapsed, unit, **extra):
+    """Reduce per-operation latencies (seconds) to the figures stored for a benchmark."""
+    latencies = np.asarray(latencies, dtype=float)
+    return {
+        'operations': len(latencies),
+        'items': items,
+        'seconds': round(elapsed, 4),
+        'throughput': round(items / elapsed, 2) if elapsed else None,
+        'unit': unit,
+        'latency_p50': round(float(np.percentile(latencies, 50)), 6) if len(latencies) else None,
+        'latency_p99': round(float(np.percentile(latencies, 99)), 6) if len(latencies) else None,
+        'peak_rss_mb': _peak_rss_mb(),
+        **extra,
+    }
+
+def _init_benchmark_worker():
+    # Requests the server fails on purpose would otherwise flood the output.
+    logging.disable(logging.ERROR)
+
+def bench_sitemaps(config, base_url, repeat):
+    from modules.sitemaps import fetch_sitemap_urls
+    from modules.transport import transport_stats
+    transport_before = transport_stats.snapshot()
+    latencies = []
+    found = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = len(set(fetch_sitemap_urls(base_url)))
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, found * repeat, sum(latencies), 'urls/s', urls_found=found,
+                     transport=transport_stats.since(transport_before))
+
+def bench_keywords(config, base_url, keyword_count):
+    from modules.keyword_matcher import KeywordMatcher
+    from modules.opportunities import process_single_url_for_all_keywords
+    from modules.transport import create_session, transport_stats
+    site = SyntheticSite(config, base_url)
+    start = time.perf_counter()
+    matcher = KeywordMatcher(site.keyword_pairs(keyword_count))
+    build_seconds = time.perf_counter() - start
+
+    latencies = []
+    matched_pages = opportunities = 0
+    transport_before = transport_stats.snapshot()
+    with create_session(pool_size=1) as session:
+        for url in site.page_urls():
+            start = time.perf_counter()
+            result = process_single_url_for_all_keywords(url, matcher, session)
+            latencies.append(time.perf_counter() - start)
+            # None covers both failed downloads and pages without opportunities.
+            if result is not None:
+                matched_pages += 1
+                opportunities += len(result['unlinked_matches'])
+    return summarize(latencies, len(latencies), sum(latencies), 'pages/s', keywords=keyword_count,
+                     matcher_build_seconds=round(build_seconds, 4), matched_pages=matched_pages,
+                     opportunities=opportunities, transport=transport_stats.since(transport_before))
+
+def bench_silo(config, base_url, silo_size, repeat):
+    from modules.silos import MATRIX_PAGE_SIZE, analyze_silo, render_matrix_html
+    data = SyntheticSite(config, base_url).silo_frame(silo_size)
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        analysis = analyze_silo(data)
+        # The first page of the matrix, as the app shows it.
+        render_matrix_html(analysis.matrix_df, slice(MATRIX_PAGE_SIZE), slice(MATRIX_PAGE_SIZE))
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, len(data) * repeat, sum(latencies), 'pages/s', silo_pages=len(data))
+
+def run_benchmarks(config, keyword_counts=DEFAULT_KEYWORD_COUNTS, silo_size=DEFAULT_SILO_SIZE,
+                   repeat=DEFAULT_REPEAT, only=None):
+    """Serve the site for `config` and run the selected benchmarks, returning {name: summary}."""
+    # Set before the workers import the page cache, which reads it once.
+    os.environ['LINK_FINDER_CACHE'] = '0'
+    results = {}
+    with SyntheticSiteServer(config) as server:
+        jobs = [('sitemap_crawl', bench_sitemaps, (config, server.base_url, repeat))]
+        jobs += [(f"keywords_{count}", bench_keywords, (config, server.base_url, count)) for count in keyword_counts]
+        jobs.append(('silo_analysis', bench_silo, (config, server.base_url, silo_size, repeat)))
+        for name, bench, args in jobs:
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            logger.info(f"Running {name}...")
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_init_benchmark_worker) as executor:
+                results[name] = executor.submit(bench, *args).result()
+            logger.info(f"{name}: {results[name]['throughput']} {results[name]['unit']}, "
+                        f"p50 {results[name]['latency_p50']}s, p99 {results[name]['latency_p99']}s")
+    return results
+
+def benchmark_report(config, results):
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'site': asdict(config),
+        'benchmarks': results,
+    }
+
+def compare_reports(baseline, current):
+    """Return text lines comparing throughput and p99 latency of two reports."""
+    lines = []
+    if baseline.get('site') != current.get('site'):
+        lines.append("Note: the baseline was run against a different site configuration.")
+    lines.append(f"{'benchmark':<18}{'throughput':>24}{'change':>9}{'p99 latency':>26}{'change':>9}")
+    for name, result in current['benchmarks'].items():
+        before = baseline.get('benchmarks', {}).get(name)
+        if before is None:
+            lines.append(f"{name:<18}{result['throughput']:>24}   (new)")
+            continue
+        cells = []
+        for key, width in (('throughput', 24), ('latency_p99', 26)):
+            old, new = before.get(key), result.get(key)
+            change = f"{(new - old) / old:+.1%}" if old and new is not None else 'n/a'
+            cells.append(f"{old} -> {new}".rjust(width) + change.rjust(9))
+        lines.append(f"{name:<18}" + ''.join(cells))
+    return lines
+
+def build_parser():
+    defaults = SiteConfig()
+    parser = argparse.ArgumentParser(prog="python -m modules.benchmark", description=__doc__.split('\n')[0])
+    parser.add_argument('-o', '--output', default='benchmark.json', help="JSON file for the results")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    parser.add_argument('--only', nargs='+', help="Run only benchmarks whose names start with these, "
+                                                  "e.g. sitemap_crawl keywords_1000 silo_analysis")
+    parser.add_argument('--keywords', type=int, nargs='+', default=DEFAULT_KEYWORD_COUNTS,
+                        help="Keyword counts for the keyword matching benchmark")
+    parser.add_argument('--silo-pages', type=int, default=DEFAULT_SILO_SIZE, help="Pages in the silo analysis")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="Runs of the sitemap and silo benchmarks")
+    site = parser.add_argument_group('synthetic site')
+    site.add_argument('--pages', type=int, default=defaults.pages)
+    site.add_argument('--paragraphs', type=int, default=defaults.paragraphs, help="Paragraphs per page")
+    site.add_argument('--anchors', type=int, default=defaults.anchors, help="Content links per page")
+    site.add_argument('--sitemap-depth', type=int, default=defaults.sitemap_depth,
+                      help="Levels of sitemap indexes above the URL sitemaps")
+    site.add_argument('--sitemap-size', type=int, default=defaults.sitemap_size, help="URLs per sitemap")
+    site.add_argument('--gzip', action='store_true', help="Serve the URL sitemaps as .xml.gz")
+    site.add_argument('--latency', type=float, default=defaults.latency, help="Seconds added to every response")
+    site.add_argument('--latency-jitter', type=float, default=defaults.latency_jitter,
+                      help="Up to this many extra seconds per response")
+    site.add_argument('--error-rate', type=float, default=defaults.error_rate,
+                      help="Share of requests answered with HTTP 500")
+    site.add_argument('--max-in-flight', type=int, default=defaults.max_in_flight,
+                      help="Answer requests beyond this many at once with 429 (0 for no limit)")
+    site.add_argument('--retry-after', type=int, default=defaults.retry_after,
+                      help="Retry-After seconds sent with those 429s")
+    site.add_argument('--crawl-delay', type=float, default=defaults.crawl_delay, help="Crawl-delay in robots.txt")
+    site.add_argument('--seed', type=int, default=defaults.seed)
+    return parser
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    args = build_parser().parse_args(argv)
+    config = SiteConfig(
+        pages=args.pages, paragraphs=args.paragraphs, anchors=args.anchors, sitemap_depth=args.sitemap_depth,
+        sitemap_size=args.sitemap_size, gzip=args.gzip, latency=args.latency, latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate, max_in_flight=args.max_in_flight, retry_after=args.retry_after,
+        crawl_delay=args.crawl_delay, seed=args.seed
+    )
+    report = benchmark_report(config, run_benchmarks(config, args.keywords, args.silo_pages, args.repeat, args.only))
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Wrote {args.output}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print('\n'.join(compare_reports(json.load(f), report)))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
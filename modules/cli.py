@@ -0,0 +1,209 @@
+"""Command-line interface for running the tools without Streamlit.
+
+    python -m modules sitemap https://example.com -o urls.csv
+    python -m modules opportunities --urls urls.csv --keywords pairs.csv -o opportunities.csv
+    python -m modules silos pages.csv -o silo_report/
+    python -m modules graph pages.csv -o site_graph/
+
+Inputs are the same CSV/XLSX files the app accepts.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from contextlib import nullcontext
+import pandas as pd
+from modules.crawl_jobs import open_job
+from modules.keyword_matcher import KeywordMatcher
+from modules.link_graph import DEFAULT_GRAPH_WORKERS, authority_scores, crawl_link_graph, join_authority, silo_checks
+from modules.metrics import active_metrics, collect_metrics
+from modules.opportunities import (FETCH_MODE_THREADS, FETCH_MODE_ASYNC, find_opportunities, keyword_pairs_from_frame,
+                                   urls_to_scan)
+from modules.result_sink import ResultSink
+from modules.silos import (analyze_silo, generate_pdf_report, render_report_html, style_matrix, tooltip_frame,
+                           validate_silo_data)
+from modules.sitemaps import DEFAULT_CONCURRENCY, DEFAULT_PER_HOST_LIMIT, classify_urls, fetch_sitemap_urls
+from modules.throttle import AdaptiveThrottle, log_throttle_report
+from modules.transport import DEFAULT_HEADERS, log_transport_stats, transport_stats
+from modules.utils import read_table
+
+logger = logging.getLogger(__name__)
+
+def _read_input(path, required_columns):
+    df = read_table(path)
+    df.columns = df.columns.str.strip().str.lower()
+    missing = [column for column in required_columns if column not in df.columns]
+    if missing:
+        raise SystemExit(f"{path} must contain the column(s): {', '.join(missing)}")
+    return df
+
+def _progress(label):
+    def show(done, total, *args):
+        sys.stderr.write(f"\r{label} {done}/{total}")
+        if done == total:
+            sys.stderr.write("\n")
+        sys.stderr.flush()
+    return show
+
+def run_sitemap(args):
+    urls = list(set(fetch_sitemap_urls(args.website_url, concurrency=args.workers, per_host_limit=args.per_host)))
+    if not urls:
+        logger.error("No sitemap or URLs found. Please check the website URL.")
+        return 1
+    lang_df = classify_urls(urls)
+    if args.categories:
+        lang_df = lang_df[lang_df['Language/Category'].isin(args.categories)]
+    lang_df.to_csv(args.output, index=False)
+    logger.info(f"Wrote {len(lang_df)} of {len(urls)} URLs to {args.output}")
+    return 0
+
+def run_opportunities(args):
+    df_urls = _read_input(args.urls, ['source_url'])
+    df_keywords = _read_input(args.keywords, ['keyword', 'target_url'])
+    source_urls = df_urls['source_url'].dropna().astype(str).str.strip().unique()
+    keyword_url_pairs = keyword_pairs_from_frame(df_keywords)
+    urls_to_process = urls_to_scan(source_urls, keyword_url_pairs)
+    if not urls_to_process:
+        logger.warning("All provided source URLs are also target URLs. Nothing to process.")
+        return 0
+
+    logger.info(f"Processing {len(urls_to_process)} URLs against {len(keyword_url_pairs)} keyword pairs...")
+    throttle = None if args.fixed_concurrency else AdaptiveThrottle(max_limit=args.per_host,
+                                                                    headers=DEFAULT_HEADERS)
+    job = open_job(urls_to_process, keyword_url_pairs, restart=args.restart)
+    if job is not None and job.resumed:
+        logger.info(f"Resuming an interrupted run: {job.finished_count} URLs already done, "
+                    f"{job.retry_count} failed URLs to retry")
+    transport_before = transport_stats.snapshot()
+    start_time = time.time()
+    with ResultSink(args.output) as sink, job or nullcontext():
+        find_opportunities(
+            urls_to_process, KeywordMatcher(keyword_url_pairs), fetch_mode=args.fetch_mode,
+            max_workers=args.workers, per_host_limit=args.per_host, parse_workers=args.parse_workers,
+            incremental=not args.full_scan, on_progress=_progress("Processed URLs"), sink=sink, throttle=throttle,
+            job=job
+        )
+    duration = time.time() - start_time
+    logger.info(f"Found {sink.num_opportunities} opportunities across {sink.matched_urls} URLs "
+                f"in {duration:.2f} seconds ({len(urls_to_process) / duration:.1f} URLs/s); wrote {args.output}")
+    log_transport_stats(transport_stats.since(transport_before), logger)
+    if job is not None and job.failed_count:
+        logger.warning(f"{job.failed_count} URLs could not be fetched")
+    if throttle is not None:
+        report = throttle.report()
+        log_throttle_report(report, logger)
+        metrics = active_metrics()
+        if metrics is not None:
+            metrics.sections['throttle'] = report
+    return 0
+
+def run_silos(args):
+    data = _read_input(args.input, ['type', 'url'])
+    error = validate_silo_data(data)
+    if error:
+        logger.error(error)
+        return 1
+
+    analysis = analyze_silo(data, on_progress=_progress("Analyzed pages"))
+    os.makedirs(args.output, exist_ok=True)
+    analysis.matrix_df.to_csv(os.path.join(args.output, 'matrix.csv'), na_rep='NA')
+    pd.DataFrame(
+        [{'page_type': page_type, 'url': link['url'], 'text': link['text']}
+         for page_type, links in analysis.all_links.items() for link in links],
+        columns=['page_type', 'url', 'text']
+    ).to_csv(os.path.join(args.output, 'links.csv'), index=False)
+
+    matrix_html = style_matrix(analysis.matrix_df, tooltip_frame(analysis)).to_html()
+    report_html = render_report_html(data, matrix_html, analysis.all_links, analysis.url_to_type)
+    with open(os.path.join(args.output, 'report.html'), 'w', encoding='utf-8') as f:
+        f.write(report_html)
+    if args.pdf:
+        with open(os.path.join(args.output, 'report.pdf'), 'wb') as f:
+            f.write(generate_pdf_report(report_html))
+    logger.info(f"Wrote silo analysis to {args.output}")
+    return 0
+
+def run_graph(args):
+    pages = _read_input(args.input, ['url'])
+    graph = crawl_link_graph(pages, max_workers=args.workers, on_progress=_progress("Crawled pages"))
+    os.makedirs(args.output, exist_ok=True)
+    graph.write_edge_list(os.path.join(args.output, 'edges.csv'))
+    silo_checks(graph).to_csv(os.path.join(args.output, 'silo_checks.csv'), index=False)
+    scores = authority_scores(graph)
+    scores.to_csv(os.path.join(args.output, 'authority.csv'), index=False)
+    if args.opportunities:
+        opportunities = _read_input(args.opportunities, ['source_url', 'target_url'])
+        join_authority(opportunities, scores).to_csv(
+            os.path.join(args.output, 'opportunities_authority.csv'), index=False)
+    logger.info(f"Wrote {graph.num_links} links between {graph.num_pages} pages to {args.output}")
+    return 0
+
+def _add_metrics_arguments(parser):
+    parser.add_argument('--metrics-json', help="Write per-stage timings, per-host totals and errors to this JSON file")
+    parser.add_argument('--metrics-prom', help="Write the same metrics as a Prometheus textfile (*.prom)")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m modules", description="Internal link finding tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    sitemap = subparsers.add_parser('sitemap', help="Extract and classify the URLs in a website's sitemaps")
+    sitemap.add_argument('website_url')
+    sitemap.add_argument('-o', '--output', required=True, help="CSV file for source_url and Language/Category")
+    sitemap.add_argument('--categories', nargs='+', help="Only keep URLs with these languages/categories")
+    sitemap.add_argument('--workers', type=int, default=DEFAULT_CONCURRENCY, help="Sitemaps fetched at the same time")
+    sitemap.add_argument('--per-host', type=int, default=DEFAULT_PER_HOST_LIMIT, help="Simultaneous requests per host")
+    sitemap.set_defaults(func=run_sitemap)
+
+    opportunities = subparsers.add_parser('opportunities', help="Find unlinked keyword occurrences")
+    opportunities.add_argument('--urls', required=True, help="CSV/XLSX with a 'source_url' column")
+    opportunities.add_argument('--keywords', required=True, help="CSV/XLSX with 'keyword' and 'target_url' columns")
+    opportunities.add_argument('-o', '--output', required=True, help="Results file, .csv or .jsonl")
+    opportunities.add_argument('--fetch-mode', choices=[FETCH_MODE_THREADS, FETCH_MODE_ASYNC], default=FETCH_MODE_THREADS)
+    opportunities.add_argument('--workers', type=int, default=15,
+                               help="Download threads, or requests in flight in async mode")
+    opportunities.add_argument('--per-host', type=int, default=10,
+                               help="Most requests in flight to one host (connections per host with --fixed-concurrency)")
+    opportunities.add_argument('--fixed-concurrency', action='store_true',
+                               help="Keep the worker and per-host limits fixed instead of adapting them to each host's "
+                                    "latency, errors, Retry-After and robots.txt Crawl-delay")
+    opportunities.add_argument('--parse-workers', type=int, default=0,
+                               help="Parse and match pages in this many processes (0 parses on the download workers)")
+    opportunities.add_argument('--full-scan', action='store_true',
+                               help="Check every page against every keyword instead of reusing earlier results")
+    opportunities.add_argument('--restart', action='store_true',
+                               help="Start over instead of resuming an interrupted run with the same inputs")
+    _add_metrics_arguments(opportunities)
+    opportunities.set_defaults(func=run_opportunities)
+
+    silos = subparsers.add_parser('silos', help="Analyze reverse content silo interlinking")
+    silos.add_argument('input', help="CSV/XLSX with 'type' and 'url' columns")
+    silos.add_argument('-o', '--output', required=True, help="Directory for matrix.csv, links.csv and report.html")
+    silos.add_argument('--pdf', action='store_true', help="Also render report.pdf with wkhtmltopdf")
+    _add_metrics_arguments(silos)
+    silos.set_defaults(func=run_silos)
+
+    graph = subparsers.add_parser('graph', help="Crawl the internal links between a list of pages and check each silo")
+    graph.add_argument('input', help="CSV/XLSX with a 'url' column and optional 'silo' and 'type' columns")
+    graph.add_argument('-o', '--output', required=True,
+                       help="Directory for edges.csv, silo_checks.csv and authority.csv")
+    graph.add_argument('--workers', type=int, default=DEFAULT_GRAPH_WORKERS, help="Pages fetched at the same time")
+    graph.add_argument('--opportunities',
+                       help="Keyword search results (.csv) to write again with each source and target page's scores")
+    _add_metrics_arguments(graph)
+    graph.set_defaults(func=run_graph)
+    return parser
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    args = build_parser().parse_args(argv)
+    metrics_json, metrics_prom = getattr(args, 'metrics_json', None), getattr(args, 'metrics_prom', None)
+    if not (metrics_json or metrics_prom):
+        return args.func(args)
+    with collect_metrics(args.command) as metrics:
+        status = args.func(args)
+    if metrics_json:
+        metrics.write_json(metrics_json)
+    if metrics_prom:
+        metrics.write_prometheus(metrics_prom)
+    return status
@@ -0,0 +1,220 @@
+"""Checkpoints that let an interrupted keyword search resume.
+
+A job is identified by its source URLs and keyword-URL pairs, so running
+the same search again after a browser refresh, a crash or a network
+failure picks up where the last attempt stopped. Every finished URL is
+stored with its result, or as failed, in batches: at least every
+CHECKPOINT_PAGES pages or CHECKPOINT_SECONDS seconds, and when the run
+raises. Resuming skips the URLs that finished and fetches the rest,
+including those that failed in fewer than MAX_URL_ATTEMPTS attempts.
+A job is deleted as soon as a run gets through every URL, failed or not,
+so only interrupted runs are resumed and a later search of the same
+sheet downloads every page again. Jobs created more than JOB_MAX_AGE ago
+are dropped.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from modules.http_cache import DEFAULT_CACHE_DIR
+from modules.scan_store import SCAN_VERSION
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_PAGES = 100
+CHECKPOINT_SECONDS = 5.0
+JOB_MAX_AGE = 7 * 24 * 3600
+# Attempts after which a URL that keeps failing (a 404, say) is not retried on resume.
+MAX_URL_ATTEMPTS = 3
+# Bumped when the tables change; older job stores are dropped and recreated.
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+DROP TABLE IF EXISTS jobs;
+DROP TABLE IF EXISTS job_pages;
+CREATE TABLE jobs (
+    job_id TEXT PRIMARY KEY,
+    total INTEGER NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE job_pages (
+    job_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    failed INTEGER NOT NULL,
+    attempts INTEGER NOT NULL,
+    result TEXT,
+    PRIMARY KEY (job_id, url)
+);
+"""
+
+def job_id_for(urls, keyword_url_pairs):
+    """Return the id of the search of `urls` for `keyword_url_pairs`, independent of URL order."""
+    digest = hashlib.sha1(f"{SCAN_VERSION}\x00".encode('utf-8'))
+    for url in sorted(set(urls)):
+        digest.update(url.encode('utf-8') + b'\x00')
+    digest.update(b'\x01')
+    for keyword, target_url in keyword_url_pairs:
+        digest.update(f"{keyword}\x00{target_url}\x00".encode('utf-8'))
+    return digest.hexdigest()
+
+class JobStore:
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'jobs.sqlite3')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        if self._conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            # Checkpoints are disposable, so an older layout is simply replaced.
+            self._conn.executescript(_SCHEMA + f"PRAGMA user_version = {SCHEMA_VERSION};")
+
+    def open_job(self, urls, keyword_url_pairs, restart=False):
+        """Return the CrawlJob for this search, resuming an earlier attempt unless `restart`."""
+        job_id = job_id_for(urls, keyword_url_pairs)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                stale = [row[0] for row in self._conn.execute(
+                    "SELECT job_id FROM jobs WHERE created < ?", (now - JOB_MAX_AGE,))]
+                if restart:
+                    stale.append(job_id)
+                for stale_id in stale:
+                    self._delete(stale_id)
+                self._conn.execute("INSERT OR IGNORE INTO jobs (job_id, total, created, updated) VALUES (?, ?, ?, ?)",
+                                   (job_id, len(urls), now, now))
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+        return CrawlJob(self, job_id)
+
+    def progress(self, job_id):
+        """Return (finished, to_retry, failed) page counts of a job.
+
+        `finished` pages are not fetched again on resume, `to_retry` are,
+        and `failed` counts the pages whose last attempt failed.
+        """
+        with self._lock:
+            total, to_retry, failed = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(failed = 1 AND attempts < ?), 0), COALESCE(SUM(failed), 0) "
+                "FROM job_pages WHERE job_id = ?", (MAX_URL_ATTEMPTS, job_id)).fetchone()
+        return total - to_retry, to_retry, failed
+
+    def finished_pages(self, job_id):
+        """Yield (url, result) for every page of the job not to fetch again.
+
+        That is every page that finished without failing, and every page
+        that failed MAX_URL_ATTEMPTS times, with a None result.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, result FROM job_pages WHERE job_id = ? AND (failed = 0 OR attempts >= ?)",
+                (job_id, MAX_URL_ATTEMPTS)).fetchall()
+        for url, result in rows:
+            yield url, json.loads(result) if result is not None else None
+
+    def save(self, job_id, pages):
+        """Store (url, result, failed) outcomes, replacing earlier ones for the same URLs."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO job_pages (job_id, url, failed, attempts, result) VALUES (?, ?, ?, 1, ?) "
+                    "ON CONFLICT (job_id, url) DO UPDATE SET failed = excluded.failed, "
+                    "attempts = job_pages.attempts + 1, result = excluded.result",
+                    [(job_id, url, int(failed), json.dumps(result, ensure_ascii=False) if result else None)
+                     for url, result, failed in pages]
+                )
+                self._conn.execute("UPDATE jobs SET updated = ? WHERE job_id = ?", (time.time(), job_id))
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, job_id):
+        with self._lock:
+            self._delete(job_id)
+
+    def _delete(self, job_id):
+        self._conn.execute("DELETE FROM job_pages WHERE job_id = ?", (job_id,))
+        self._conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+class CrawlJob:
+    """The checkpoint of one search: buffers page outcomes and saves them in batches."""
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+        self.finished_count, self.retry_count, self.failed_count = store.progress(job_id)
+        self._pending = []
+        self._last_save = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def resumed(self):
+        return bool(self.finished_count or self.retry_count)
+
+    def finished(self):
+        """Yield (url, result) for the pages an earlier attempt finished; result is None without opportunities."""
+        return self.store.finished_pages(self.job_id)
+
+    def record(self, url, result, failed):
+        with self._lock:
+            self._pending.append((url, result, failed))
+            due = (len(self._pending) >= CHECKPOINT_PAGES
+                   or time.monotonic() - self._last_save >= CHECKPOINT_SECONDS)
+        if due:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Save the outcomes recorded since the last checkpoint."""
+        with self._lock:
+            pages, self._pending = self._pending, []
+            self._last_save = time.monotonic()
+        if pages:
+            self.store.save(self.job_id, pages)
+
+    def close(self):
+        """End a run that got through every URL: count the outcomes and delete the job.
+
+        The next search of the same inputs starts over instead of replaying
+        these results.
+        """
+        self.checkpoint()
+        self.finished_count, self.retry_count, self.failed_count = self.store.progress(self.job_id)
+        self.store.delete(self.job_id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            # Finished without being interrupted.
+            self.close()
+        else:
+            # Keep the job so the next attempt resumes from here.
+            self.checkpoint()
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def open_job_store():
+    """Return the process-wide JobStore in the cache directory, or None if it cannot be opened."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            try:
+                _default_store = JobStore()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Resumable searches disabled, could not open {DEFAULT_CACHE_DIR}: {e}")
+                return None
+        return _default_store
+
+def open_job(urls, keyword_url_pairs, restart=False):
+    """Return the CrawlJob for a search from the default store, or None if it cannot be opened."""
+    store = open_job_store()
+    return store.open_job(urls, keyword_url_pairs, restart) if store is not None else None
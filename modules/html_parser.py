@@ -0,0 +1,319 @@
+"""HTML and sitemap parsing backends.
+
+Two interchangeable backends extract the same data from raw response bytes:
+
+- ``lxml``: walks the libxml2 tree directly and never mutates it; boilerplate
+  is skipped rather than decomposed, which is several times faster than
+  building a BeautifulSoup tree.
+- ``bs4``: the original BeautifulSoup implementation, kept as a
+  compatibility fallback.
+
+The backend defaults to ``lxml`` and can be switched with the
+``LINK_FINDER_PARSER`` environment variable or per call. Running
+``python -m modules.html_parser data/parser_corpus`` checks that both
+backends agree on every page of the parity corpus.
+"""
+import os
+import sys
+from urllib.parse import urljoin, urlparse
+from bs4 import BeautifulSoup
+from bs4.dammit import EncodingDetector
+from lxml import etree
+from modules.metrics import stage
+from modules.page_model import PageModel, BOILERPLATE_TAGS, BOILERPLATE_CLASSES, extract_anchors, remove_boilerplate, extract_paragraphs
+from modules.utils import clean_text, standardize_url
+
+BACKENDS = ('lxml', 'bs4')
+DEFAULT_BACKEND = os.environ.get('LINK_FINDER_PARSER', 'lxml')
+
+CONTENT_REMOVED_TAGS = [
+    'script', 'style', 'nav', 'header', 'footer',
+    'meta', 'link', 'sidebar', 'aside', '.nav',
+    '.header', '.footer', '.sidebar', '.menu',
+    '[role="navigation"]', '[role="banner"]',
+    '[role="contentinfo"]'
+]
+CONTENT_REMOVED_CLASSES = ["d-none d-sm-flex align-items-center"]
+CONTENT_SELECTORS = [
+    'main', 'article', '#content', '.content',
+    '#main', '.main', '[role="main"]'
+]
+
+# Strings anywhere inside these tags are not plain text for BeautifulSoup's get_text().
+_NON_TEXT_TAGS = {'script', 'style', 'template', 'rt', 'rp'}
+
+def _resolve_backend(backend):
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown parser backend '{backend}', expected one of {BACKENDS}")
+    return backend
+
+def declared_encoding(content_type):
+    """Return the charset declared in a Content-Type header, or None to let the parser sniff it."""
+    for param in (content_type or '').split(';')[1:]:
+        name, _, value = param.strip().partition('=')
+        if name.lower() == 'charset' and value:
+            return value.strip('"\' ')
+    return None
+
+def _sniff_encoding(content):
+    # libxml2 falls back to latin-1 when nothing is declared; prefer the
+    # <meta> charset, then UTF-8 when the bytes decode cleanly.
+    encoding = EncodingDetector.find_declared_encoding(content, is_html=True)
+    if encoding:
+        return encoding
+    try:
+        content.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return None
+
+def _html_root(content, encoding=None):
+    with stage('decode'):
+        if isinstance(content, str):
+            content, encoding = content.encode('utf-8'), 'utf-8'
+        try:
+            parser = etree.HTMLParser(encoding=encoding or _sniff_encoding(content), recover=True)
+        except LookupError:
+            parser = etree.HTMLParser(recover=True)
+    with stage('parse'):
+        return etree.fromstring(content, parser) if content.strip() else None
+
+def _elements(root):
+    return (element for element in root.iter() if isinstance(element.tag, str))
+
+def _collect_strings(element, strings, removed):
+    if element.text:
+        strings.append(element.text)
+    for child in element:
+        if isinstance(child.tag, str) and child not in removed and child.tag not in _NON_TEXT_TAGS:
+            _collect_strings(child, strings, removed)
+        if child.tail:
+            strings.append(child.tail)
+    return strings
+
+def _get_text(element, removed=frozenset(), strip=False):
+    if any(ancestor.tag in _NON_TEXT_TAGS for ancestor in element.iterancestors()):
+        return ''
+    strings = _collect_strings(element, [], removed) if element.tag not in _NON_TEXT_TAGS else []
+    if strip:
+        return ''.join(string.strip() for string in strings if string.strip())
+    return ''.join(strings)
+
+def _class_matches(element, class_names):
+    # Same rules as BeautifulSoup's class_ filter: any single class or the whole attribute.
+    classes = (element.get('class') or '').split()
+    if not classes:
+        return False
+    return any(name in class_names for name in classes) or ' '.join(classes) in class_names
+
+def _removed_elements(root, tags, class_names):
+    class_names = set(class_names)
+    tags = set(tags)
+    return {element for element in _elements(root)
+            if element.tag in tags or _class_matches(element, class_names)}
+
+def _iter_visible(root, removed):
+    """Yield elements under root in document order, skipping removed subtrees."""
+    stack = [root]
+    while stack:
+        element = stack.pop()
+        if element in removed:
+            continue
+        yield element
+        stack.extend(reversed([child for child in element if isinstance(child.tag, str)]))
+
+def _lxml_parse_page(url, content, encoding=None):
+    root = _html_root(content, encoding)
+    if root is None:
+        return PageModel(url=url)
+    anchors = []
+    with stage('anchors'):
+        for a_tag in root.iter('a'):
+            href = a_tag.get('href')
+            if href is None:
+                continue
+            link_text = _get_text(a_tag, strip=True)
+            if not link_text:
+                continue
+            try:
+                standardized_href = standardize_url(urljoin(url, href))
+            except ValueError:
+                continue
+            anchors.append((standardized_href, clean_text(link_text)))
+
+    paragraphs = []
+    with stage('paragraphs'):
+        removed = _removed_elements(root, BOILERPLATE_TAGS, BOILERPLATE_CLASSES)
+        for p_tag in (element for element in _iter_visible(root, removed) if element.tag == 'p'):
+            original_paragraph_text = _get_text(p_tag, removed, strip=True)
+            if original_paragraph_text:
+                paragraphs.append((original_paragraph_text, clean_text(original_paragraph_text)))
+    return PageModel(url=url, anchors=anchors, paragraphs=paragraphs)
+
+def _bs4_parse_page(url, content, encoding=None):
+    # BeautifulSoup decodes while it builds the tree, so decoding counts as parsing here.
+    with stage('parse'):
+        soup = BeautifulSoup(content, 'lxml', from_encoding=encoding if isinstance(content, bytes) else None)
+    with stage('anchors'):
+        anchors = extract_anchors(soup, url)
+    with stage('paragraphs'):
+        remove_boilerplate(soup)
+        paragraphs = extract_paragraphs(soup)
+    soup.decompose()
+    return PageModel(url=url, anchors=anchors, paragraphs=paragraphs)
+
+def parse_page(url, content, encoding=None, backend=None):
+    """Parse raw page bytes once and reduce them to a PageModel."""
+    if _resolve_backend(backend) == 'lxml':
+        return _lxml_parse_page(url, content, encoding)
+    return _bs4_parse_page(url, content, encoding)
+
+def _selector_matches(element, selector):
+    if selector.startswith('#'):
+        return element.get('id') == selector[1:]
+    if selector.startswith('.'):
+        return selector[1:] in (element.get('class') or '').split()
+    if selector.startswith('['):
+        name, _, value = selector[1:-1].partition('=')
+        return element.get(name) == value.strip('"')
+    return element.tag == selector
+
+def _internal_links(url, links_source):
+    links = []
+    for href, text in links_source:
+        if not text or text.isspace():
+            continue
+        absolute_url = urljoin(url, href)
+        # Keep only internal links
+        if urlparse(absolute_url).netloc == urlparse(url).netloc:
+            links.append({
+                'text': text,
+                'url': absolute_url
+            })
+    return links
+
+def _lxml_content_links(url, content, encoding=None):
+    root = _html_root(content, encoding)
+    if root is None:
+        return []
+    with stage('anchors'):
+        removed = _removed_elements(root, CONTENT_REMOVED_TAGS, CONTENT_REMOVED_CLASSES)
+        visible = list(_iter_visible(root, removed))
+        main_content = None
+        for selector in CONTENT_SELECTORS:
+            main_content = next((element for element in visible if _selector_matches(element, selector)), None)
+            if main_content is not None:
+                break
+        if main_content is None:
+            main_content = next((element for element in visible if element.tag == 'body'), None)
+        if main_content is None:
+            return []
+        return _internal_links(url, (
+            (link.get('href'), ' '.join(_get_text(link, removed).strip().split()))
+            for link in _iter_visible(main_content, removed)
+            if link.tag == 'a' and link is not main_content and link.get('href') is not None
+        ))
+
+def _bs4_content_links(url, content, encoding=None):
+    with stage('parse'):
+        soup = BeautifulSoup(content, 'html.parser', from_encoding=encoding if isinstance(content, bytes) else None)
+    with stage('anchors'):
+        for element in soup.find_all(CONTENT_REMOVED_TAGS):
+            element.decompose()
+
+        for element in soup.find_all(attrs={"class": CONTENT_REMOVED_CLASSES}):
+            element.decompose()
+
+        main_content = None
+        for selector in CONTENT_SELECTORS:
+            main_content = soup.select_one(selector)
+            if main_content:
+                break
+        if not main_content:
+            main_content = soup.body
+        if not main_content:
+            return []
+        return _internal_links(url, (
+            (link.get('href'), ' '.join(link.get_text().strip().split()))
+            for link in main_content.find_all('a', href=True)
+        ))
+
+def extract_content_links(url, content, encoding=None, backend=None):
+    """Return internal {'text', 'url'} links from the main content area of a page."""
+    if _resolve_backend(backend) == 'lxml':
+        return _lxml_content_links(url, content, encoding)
+    return _bs4_content_links(url, content, encoding)
+
+def _xml_root(content):
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    parser = etree.XMLParser(recover=True, huge_tree=True, resolve_entities=False)
+    return etree.fromstring(content, parser) if content.strip() else None
+
+def _local_name(element):
+    return etree.QName(element).localname if isinstance(element.tag, str) else None
+
+def extract_sitemap_locs(content, backend=None):
+    """Return the text of every <loc> element in a sitemap document."""
+    if _resolve_backend(backend) == 'lxml':
+        root = _xml_root(content)
+        if root is None:
+            return []
+        return [''.join(element.itertext()).strip() for element in root.iter()
+                if _local_name(element) == 'loc']
+    soup = BeautifulSoup(content, 'lxml-xml')
+    return [tag.get_text().strip() for tag in soup.find_all('loc')]
+
+def extract_sitemap_index_locs(content, backend=None):
+    """Return the first <loc> of every <sitemap> entry in a sitemap index."""
+    if _resolve_backend(backend) == 'lxml':
+        root = _xml_root(content)
+        if root is None:
+            return []
+        locs = []
+        for sitemap in root.iter():
+            if _local_name(sitemap) != 'sitemap':
+                continue
+            loc = next((element for element in sitemap.iterdescendants() if _local_name(element) == 'loc'), None)
+            if loc is not None:
+                locs.append(''.join(loc.itertext()).strip())
+        return locs
+    soup = BeautifulSoup(content, 'lxml-xml')
+    locs = []
+    for sitemap in soup.find_all('sitemap'):
+        loc = sitemap.find('loc')
+        if loc:
+            locs.append(loc.get_text().strip())
+    return locs
+
+def check_parity(paths, base_url="https://www.example.com/"):
+    """Compare both backends on the given files and return a list of mismatch descriptions."""
+    mismatches = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            content = f.read()
+        name = os.path.basename(path)
+        if path.endswith('.xml'):
+            for extractor in (extract_sitemap_locs, extract_sitemap_index_locs):
+                if extractor(content, backend='lxml') != extractor(content, backend='bs4'):
+                    mismatches.append(f"{name}: {extractor.__name__} differs")
+            continue
+        url = urljoin(base_url, os.path.splitext(name)[0])
+        fast, compat = parse_page(url, content, backend='lxml'), parse_page(url, content, backend='bs4')
+        if fast.anchors != compat.anchors:
+            mismatches.append(f"{name}: anchors differ")
+        if fast.paragraphs != compat.paragraphs:
+            mismatches.append(f"{name}: paragraphs differ")
+        if extract_content_links(url, content, backend='lxml') != extract_content_links(url, content, backend='bs4'):
+            mismatches.append(f"{name}: content links differ")
+    return mismatches
+
+if __name__ == "__main__":
+    corpus_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join('data', 'parser_corpus')
+    corpus = sorted(os.path.join(corpus_dir, name) for name in os.listdir(corpus_dir))
+    problems = check_parity(corpus)
+    for problem in problems:
+        print(problem)
+    print(f"Checked {len(corpus)} files, {len(problems)} mismatches")
+    sys.exit(1 if problems else 0)
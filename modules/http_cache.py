@@ -0,0 +1,241 @@
+"""Shared on-disk HTTP page cache.
+
+Responses are stored in a SQLite database under the user cache directory.
+Bodies are zlib-compressed and content-addressed by their SHA-256, so a
+page served from several URLs is stored once. Entries younger than the TTL
+are served without touching the network; older ones are revalidated with a
+conditional GET (If-None-Match / If-Modified-Since). The total size of the
+stored bodies is bounded, and least recently used entries are evicted first.
+A database error (another process holding a lock too long, say) or a
+corrupt body is logged and treated as a cache miss.
+
+Configuration comes from environment variables:
+``LINK_FINDER_CACHE=0`` disables the cache, ``LINK_FINDER_CACHE_DIR``,
+``LINK_FINDER_CACHE_TTL`` (seconds) and ``LINK_FINDER_CACHE_MAX_MB``.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+import requests
+from requests.structures import CaseInsensitiveDict
+from platformdirs import user_cache_dir
+from modules.transport import default_session
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.environ.get('LINK_FINDER_CACHE', '1') != '0'
+DEFAULT_CACHE_DIR = os.environ.get('LINK_FINDER_CACHE_DIR') or user_cache_dir('internal_link_finding')
+DEFAULT_TTL = int(os.environ.get('LINK_FINDER_CACHE_TTL', 3600))
+DEFAULT_MAX_BYTES = int(os.environ.get('LINK_FINDER_CACHE_MAX_MB', 1024)) * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    blob_hash TEXT NOT NULL,
+    content_type TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+CREATE INDEX IF NOT EXISTS entries_blob_hash ON entries (blob_hash);
+"""
+
+@dataclass
+class CachedPage:
+    url: str
+    content: bytes
+    content_hash: str
+    content_type: str
+    etag: str
+    last_modified: str
+    fetched_at: float
+
+    def is_fresh(self, ttl):
+        return time.time() - self.fetched_at < ttl
+
+    def validators(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def to_response(self):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = self.url
+        response._content = self.content
+        response.headers = CaseInsensitiveDict({'Content-Type': self.content_type or ''})
+        response.from_cache = True
+        return response
+
+class PageCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'pages.sqlite3')
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+        # Kept up to date by put and eviction, so the size check does not scan every blob.
+        self._total_bytes = self._stored_bytes()
+
+    def _stored_bytes(self):
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def get(self, url):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT e.blob_hash, b.data, e.content_type, e.etag, e.last_modified, e.fetched_at "
+                "FROM entries e JOIN blobs b ON b.hash = e.blob_hash WHERE e.url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE url = ?", (time.time(), url))
+        blob_hash, data, content_type, etag, last_modified, fetched_at = row
+        return CachedPage(url, zlib.decompress(data), blob_hash, content_type, etag, last_modified, fetched_at)
+
+    def put(self, url, content, headers):
+        blob_hash = hashlib.sha256(content).hexdigest()
+        now = time.time()
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (blob_hash,)).fetchone() is None:
+                data = zlib.compress(content)
+                inserted = self._conn.execute("INSERT OR IGNORE INTO blobs (hash, data, size) VALUES (?, ?, ?)",
+                                              (blob_hash, data, len(data))).rowcount
+                self._total_bytes += len(data) if inserted else 0
+            previous = self._conn.execute("SELECT blob_hash FROM entries WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (url, blob_hash, content_type, etag, last_modified, fetched_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, blob_hash, headers.get('Content-Type'), headers.get('ETag'),
+                 headers.get('Last-Modified'), now, now)
+            )
+            if previous and previous[0] != blob_hash:
+                self._total_bytes -= self._delete_blob_if_unused(previous[0])
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+        return blob_hash
+
+    def mark_revalidated(self, url):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("UPDATE entries SET fetched_at = ?, last_access = ? WHERE url = ?", (now, now, url))
+
+    def _delete_blob_if_unused(self, blob_hash):
+        if self._conn.execute("SELECT 1 FROM entries WHERE blob_hash = ?", (blob_hash,)).fetchone() is not None:
+            return 0
+        size = self._conn.execute("SELECT size FROM blobs WHERE hash = ?", (blob_hash,)).fetchone()
+        self._conn.execute("DELETE FROM blobs WHERE hash = ?", (blob_hash,))
+        return size[0] if size else 0
+
+    def _evict(self):
+        # Other processes share the database; recount before evicting on a possibly stale total.
+        total = self._stored_bytes()
+        while total > self.max_bytes:
+            oldest = self._conn.execute(
+                "SELECT url, blob_hash FROM entries ORDER BY last_access LIMIT 64"
+            ).fetchall()
+            if not oldest:
+                break
+            for url, blob_hash in oldest:
+                self._conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+                total -= self._delete_blob_if_unused(blob_hash)
+                if total <= self.max_bytes:
+                    break
+        self._total_bytes = total
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM blobs")
+            self._conn.execute("VACUUM")
+            self._total_bytes = 0
+
+CACHE_ERRORS = (sqlite3.Error, zlib.error)
+
+def safe_cache_call(method, *args):
+    """Call a PageCache method, returning None if the database fails so the caller sees a miss."""
+    try:
+        return method(*args)
+    except CACHE_ERRORS as e:
+        logger.warning(f"Page cache {method.__name__} failed, treating it as a miss: {e}")
+        return None
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def default_cache():
+    """Return the process-wide cache, or None when caching is disabled or unavailable."""
+    global _default_cache, CACHE_ENABLED
+    if not CACHE_ENABLED:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = PageCache()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Page cache disabled, could not open {DEFAULT_CACHE_DIR}: {e}")
+                CACHE_ENABLED = False
+        return _default_cache
+
+_LOOK_UP = object()
+
+def cache_lookup(url, cache=None):
+    """Return (entry, fresh): the cached entry for `url` or None, and whether
+    cached_get would answer it without a request.
+
+    Pass the entry on as cached_get(..., cached=entry) so the page is not
+    read and decompressed a second time.
+    """
+    cache = cache or default_cache()
+    if cache is None:
+        return None, False
+    cached = safe_cache_call(cache.get, url)
+    return cached, cached is not None and cached.is_fresh(cache.ttl)
+
+def cached_get(url, session=None, cache=None, headers=None, revalidate=False, cached=_LOOK_UP, **kwargs):
+    """GET through the page cache; behaves like requests.get for the caller.
+
+    Fresh entries are returned without a request, stale ones are revalidated
+    and only 200 responses are stored. With `revalidate`, cached entries are
+    always revalidated, so a page changed since it was cached is never
+    served stale. Responses served from the cache have `from_cache` set to
+    True. Without a `session`, the process-wide transport session is used.
+    `cached` is an entry already returned by cache_lookup for `url`.
+    """
+    http = session or default_session()
+    cache = cache or default_cache()
+    if cache is None:
+        return http.get(url, headers=headers, **kwargs)
+
+    if cached is _LOOK_UP:
+        cached = safe_cache_call(cache.get, url)
+    if cached is not None and not revalidate and cached.is_fresh(cache.ttl):
+        return cached.to_response()
+    request_headers = dict(headers or {})
+    if cached is not None:
+        request_headers.update(cached.validators())
+    response = http.get(url, headers=request_headers, **kwargs)
+    if cached is not None and response.status_code == 304:
+        safe_cache_call(cache.mark_revalidated, url)
+        return cached.to_response()
+    if response.status_code == 200:
+        safe_cache_call(cache.put, url, response.content, response.headers)
+    response.from_cache = False
+    return response
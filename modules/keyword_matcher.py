@@ -0,0 +1,174 @@
+from collections import deque
+from modules.utils import clean_text, standardize_urls
+
+FORBIDDEN_TERMS = ["solution", "service", "software", "app", "platforms", "solutions", "services", "softwares", "apps", "platform"]
+EXCLUSION_THRESHOLD = 50
+
+# Characters re.IGNORECASE treats as equal on top of plain lowercasing (e.g. the
+# long s and s). Folding each group onto its first character keeps matching on
+# already-lowercased text identical to the per-keyword regexes.
+_IGNORECASE_EQUIVALENTS = [
+    "i\u0131", "s\u017f", "\u00b5\u03bc", "\u0345\u03b9\u1fbe", "\u0390\u1fd3",
+    "\u03b0\u1fe3", "\u03b2\u03d0", "\u03b5\u03f5", "\u03b8\u03d1", "\u03ba\u03f0",
+    "\u03c0\u03d6", "\u03c1\u03f1", "\u03c2\u03c3", "\u03c6\u03d5", "\u0432\u1c80",
+    "\u0434\u1c81", "\u043e\u1c82", "\u0441\u1c83", "\u0442\u1c84\u1c85", "\u044a\u1c86",
+    "\u0463\u1c87", "\u1c88\ua64b", "\u1e61\u1e9b", "\ufb05\ufb06",
+]
+_CASE_FOLD = str.maketrans({ch: group[0] for group in _IGNORECASE_EQUIVALENTS for ch in group[1:]})
+
+def _is_word_char(ch):
+    # Same definition of a word character as `\w` in the re module.
+    return ch.isalnum() or ch == '_'
+
+def _at_word_boundary(text, index):
+    before = index > 0 and _is_word_char(text[index - 1])
+    after = index < len(text) and _is_word_char(text[index])
+    return before != after
+
+def _followed_by_forbidden_term(text, folded_text, end):
+    # Cleaned text only ever contains single spaces between words.
+    if end >= len(text) or text[end] != ' ':
+        return False
+    start = end + 1
+    for term in FORBIDDEN_TERMS:
+        if folded_text.startswith(term, start) and _at_word_boundary(text, start + len(term)):
+            return True
+    return False
+
+class KeywordMatcher:
+    """Finds unlinked keyword occurrences for every keyword-URL pair of a job.
+
+    The matcher is built once from all keyword-URL pairs and scans each
+    paragraph of a page in a single Aho-Corasick pass, instead of compiling
+    and running one regex per keyword per paragraph. Matching follows the
+    rules of the original per-keyword search: whole-word phrase matches on
+    cleaned text, keywords not ending in a forbidden term are rejected when
+    followed by one, the first 50 words of a page are skipped and only the
+    first qualifying paragraph is reported per keyword.
+    """
+
+    def __init__(self, keyword_url_pairs):
+        self.pairs = list(keyword_url_pairs)
+        self.pair_patterns = []
+        self.standardized_targets = standardize_urls([target_url for _, target_url in self.pairs])
+        self._patterns = []
+        self._phrases = []
+        pattern_ids = {}
+        phrase_ids = {}
+        for keyword, target_url in self.pairs:
+            keyword = keyword.strip()
+            phrase = clean_text(keyword)
+            if not phrase:
+                self.pair_patterns.append(None)
+                continue
+            keyword_lower = keyword.lower()
+            check_forbidden = not any(keyword_lower.endswith(term) for term in FORBIDDEN_TERMS)
+            phrase = phrase.translate(_CASE_FOLD)
+            if phrase not in phrase_ids:
+                phrase_ids[phrase] = len(self._phrases)
+                self._phrases.append(phrase)
+            key = (phrase_ids[phrase], check_forbidden)
+            if key not in pattern_ids:
+                pattern_ids[key] = len(self._patterns)
+                self._patterns.append(key)
+            self.pair_patterns.append(pattern_ids[key])
+        self._build_automaton()
+
+    def _build_automaton(self):
+        self._goto = [{}]
+        self._outputs = [[]]
+        for phrase_id, phrase in enumerate(self._phrases):
+            state = 0
+            for ch in phrase:
+                next_state = self._goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][ch] = next_state
+                    self._goto.append({})
+                    self._outputs.append([])
+                state = next_state
+            self._outputs[state].append(phrase_id)
+
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(ch, 0)
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+
+    def scan(self, text):
+        """Return {phrase_id: followed_by_forbidden} for whole-word phrase hits in text."""
+        hits = {}
+        goto, fail, outputs, phrases = self._goto, self._fail, self._outputs, self._phrases
+        folded_text = text.translate(_CASE_FOLD)
+        state = 0
+        for position, ch in enumerate(folded_text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not outputs[state]:
+                continue
+            end = position + 1
+            for phrase_id in outputs[state]:
+                start = end - len(phrases[phrase_id])
+                if not (_at_word_boundary(text, start) and _at_word_boundary(text, end)):
+                    continue
+                if not hits.get(phrase_id):
+                    hits[phrase_id] = _followed_by_forbidden_term(text, folded_text, end)
+        return hits
+
+    def contains(self, text, pair_index):
+        """Whole-word search for a single pair's keyword, used for anchor texts."""
+        pattern_id = self.pair_patterns[pair_index]
+        if pattern_id is None:
+            return False
+        phrase = self._phrases[self._patterns[pattern_id][0]]
+        folded_text = text.translate(_CASE_FOLD)
+        start = folded_text.find(phrase)
+        while start != -1:
+            end = start + len(phrase)
+            if _at_word_boundary(text, start) and _at_word_boundary(text, end):
+                return True
+            start = folded_text.find(phrase, start + 1)
+        return False
+
+    def find_unlinked(self, paragraphs):
+        """Map pair index -> paragraph context for every keyword found in paragraphs.
+
+        `paragraphs` is a sequence of (original_text, cleaned_text) tuples in
+        document order, with empty paragraphs already left out.
+        """
+        phrase_hits = {}
+        word_counts = []
+        for index, (_, cleaned_text) in enumerate(paragraphs):
+            word_counts.append(len(cleaned_text.split()))
+            for phrase_id, forbidden in self.scan(cleaned_text).items():
+                phrase_hits.setdefault(phrase_id, []).append((index, forbidden))
+
+        words_before = [0] * len(word_counts)
+        for index in range(1, len(word_counts)):
+            words_before[index] = words_before[index - 1] + word_counts[index - 1]
+
+        pattern_paragraph = {}
+        for pattern_id, (phrase_id, check_forbidden) in enumerate(self._patterns):
+            skipped_words = 0
+            for index, forbidden in phrase_hits.get(phrase_id, ()):
+                word_count = words_before[index] - skipped_words
+                if word_count + word_counts[index] < EXCLUSION_THRESHOLD:
+                    continue
+                if check_forbidden and forbidden:
+                    skipped_words += word_counts[index]
+                    continue
+                pattern_paragraph[pattern_id] = index
+                break
+
+        contexts = {}
+        for pair_index, pattern_id in enumerate(self.pair_patterns):
+            if pattern_id in pattern_paragraph:
+                contexts[pair_index] = paragraphs[pattern_paragraph[pattern_id]][0]
+        return contexts
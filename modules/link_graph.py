@@ -0,0 +1,334 @@
+"""Site-wide internal link graph, for auditing silos over whole sections.
+
+`crawl_link_graph` fetches every page of a URL list and keeps the links in
+each page's main content (the links the silo matrix uses) that point to
+another page of the list. Pages are nodes numbered in input order. Links
+are stored in compressed sparse row form: the targets of node i are
+``indices[indptr[i]:indptr[i + 1]]``, sorted, with each link's anchor
+text in a shared table. Memory grows with the number of links, not with
+the square of the pages. URLs are compared after standardize_url, so a
+trailing slash, query string or fragment does not split a page in two,
+and links from a page to itself are dropped.
+
+`authority_scores` ranks the pages of a graph: PageRank, click depth from
+the homepage, links in and out, orphans and pages no page of their own
+silo links to. SciPy's sparse matrices are used for PageRank when SciPy
+is installed; the NumPy fallback gives the same scores, more slowly.
+"""
+import concurrent.futures
+from array import array
+import numpy as np
+import pandas as pd
+from modules.silos import get_main_content_anchor_tags
+from modules.transport import create_session
+from modules.utils import standardize_url, standardize_urls
+
+try:
+    import scipy.sparse
+except ImportError:  # optional, only speeds up PageRank
+    scipy = None
+
+DEFAULT_GRAPH_WORKERS = 16
+# Pages waiting to be fetched per worker; keeps the queue small on large crawls.
+QUEUE_PER_WORKER = 4
+EDGE_CHUNK_SIZE = 100000
+TARGET_TYPE = 'Target Page'
+HOMEPAGE_TYPE = 'Homepage'
+PAGERANK_DAMPING = 0.85
+# Stop when the scores move less than this in total (L1) between iterations.
+PAGERANK_TOLERANCE = 1e-8
+PAGERANK_MAX_ITERATIONS = 200
+
+class LinkGraph:
+    """Pages and the links between them, in CSR form.
+
+    `pages` has one row per node with at least a 'url' column; 'type' and
+    'silo' columns are used by the silo checks when present. `failed` marks
+    pages that could not be fetched, so their links are unknown, and
+    `outside_links` counts each page's links to URLs outside the list.
+    """
+    def __init__(self, pages, indptr, indices, text_ids, texts, failed, outside_links):
+        self.pages = pages
+        self.indptr = indptr
+        self.indices = indices
+        self.text_ids = text_ids
+        self.texts = texts
+        self.failed = failed
+        self.outside_links = outside_links
+
+    @property
+    def num_pages(self):
+        return len(self.pages)
+
+    @property
+    def num_links(self):
+        return len(self.indices)
+
+    def links_from(self, node):
+        """Return the target nodes of `node`'s links, sorted, once per link."""
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def has_link(self, source, target):
+        targets = self.links_from(source)
+        position = np.searchsorted(targets, target)
+        return bool(position < len(targets) and targets[position] == target)
+
+    def edges(self):
+        """Return (sources, targets) arrays with one entry per link."""
+        sources = np.repeat(np.arange(self.num_pages, dtype=np.int32), np.diff(self.indptr))
+        return sources, self.indices
+
+    def unique_edges(self):
+        """Return (sources, targets) with several links between the same two pages counted once."""
+        sources, targets = self.edges()
+        keep = np.ones(len(sources), dtype=bool)
+        # Rows are sorted by target, so repeated links are adjacent.
+        keep[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+        return sources[keep], targets[keep]
+
+    def targets_of(self, nodes):
+        """Return the targets of every link from `nodes` (an array), concatenated."""
+        starts = self.indptr[nodes]
+        counts = self.indptr[nodes + 1] - starts
+        # Offset of each link within its row, added to its row's start.
+        positions = np.arange(counts.sum()) + np.repeat(starts - np.cumsum(counts) + counts, counts)
+        return self.indices[positions]
+
+    def homepage(self):
+        """Return the node of the 'Homepage' type, or of the first page listed without one."""
+        if 'type' in self.pages:
+            homepages = np.flatnonzero(self.pages['type'].astype(str).to_numpy() == HOMEPAGE_TYPE)
+            if len(homepages):
+                return int(homepages[0])
+        return 0
+
+    def iter_edge_frames(self, chunk_size=EDGE_CHUNK_SIZE):
+        """Yield the edge list as DataFrames of source_url, target_url and anchor_text, `chunk_size` links each."""
+        sources, targets = self.edges()
+        urls = self.pages['url'].to_numpy()
+        texts = np.asarray(self.texts, dtype=object)
+        for start in range(0, len(sources), chunk_size):
+            end = start + chunk_size
+            yield pd.DataFrame({
+                'source_url': urls[sources[start:end]],
+                'target_url': urls[targets[start:end]],
+                'anchor_text': texts[self.text_ids[start:end]],
+            })
+
+    def write_edge_list(self, path_or_buffer):
+        """Write the edge list as CSV, one chunk at a time."""
+        header = True
+        for frame in self.iter_edge_frames():
+            frame.to_csv(path_or_buffer, mode='w' if header else 'a', header=header, index=False)
+            header = False
+        if header:
+            pd.DataFrame(columns=['source_url', 'target_url', 'anchor_text']).to_csv(path_or_buffer, index=False)
+
+def _fetch_links(url, page_type, session):
+    errors = []
+    return get_main_content_anchor_tags(url, page_type, errors.append, session=session), errors
+
+def crawl_link_graph(pages, max_workers=DEFAULT_GRAPH_WORKERS, on_progress=None, on_error=None):
+    """Fetch every page in `pages` (a DataFrame with a 'url' column) and return its LinkGraph.
+
+    Pages whose standardized URL repeats an earlier one are dropped. Up to
+    `max_workers` pages are fetched at once; `on_progress(done, total)` and
+    `on_error(message)` are called on the calling thread.
+    """
+    pages = pages.copy()
+    pages['url'] = pages['url'].astype(str).str.strip()
+    keys = standardize_urls(pages['url'])
+    pages = pages[~keys.duplicated()].reset_index(drop=True)
+    keys = keys.drop_duplicates().tolist()
+    node_of = {key: node for node, key in enumerate(keys)}
+    types = pages['type'].tolist() if 'type' in pages else [''] * len(pages)
+
+    sources, targets, text_ids = array('i'), array('i'), array('i')
+    text_table = {}
+    failed = np.zeros(len(pages), dtype=bool)
+    outside_links = np.zeros(len(pages), dtype=np.int32)
+
+    def add_page(node, links, errors):
+        if errors:
+            failed[node] = True
+            if on_error:
+                for message in errors:
+                    on_error(message)
+        for link in links:
+            target = node_of.get(standardize_url(link['url']))
+            if target is None:
+                outside_links[node] += 1
+            elif target != node:
+                sources.append(node)
+                targets.append(target)
+                text_ids.append(text_table.setdefault(link['text'], len(text_table)))
+
+    with create_session(pool_size=max_workers) as session, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+        next_node = done = 0
+        while next_node < len(pages) or pending:
+            while next_node < len(pages) and len(pending) < max_workers * QUEUE_PER_WORKER:
+                future = executor.submit(_fetch_links, pages['url'].iat[next_node], types[next_node], session)
+                pending[future] = next_node
+                next_node += 1
+            finished, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                add_page(pending.pop(future), *future.result())
+                done += 1
+                if on_progress:
+                    on_progress(done, len(pages))
+
+    sources = np.frombuffer(sources, dtype=np.int32) if sources else np.zeros(0, dtype=np.int32)
+    targets = np.frombuffer(targets, dtype=np.int32) if targets else np.zeros(0, dtype=np.int32)
+    text_ids = np.frombuffer(text_ids, dtype=np.int32) if text_ids else np.zeros(0, dtype=np.int32)
+    # Pages finish in any order; sorting by (source, target) makes the graph independent of it.
+    order = np.lexsort((targets, sources))
+    indptr = np.zeros(len(pages) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=len(pages)), out=indptr[1:])
+    return LinkGraph(pages, indptr, targets[order], text_ids[order], list(text_table), failed, outside_links)
+
+def _silo_codes(pages):
+    silos = pages['silo'].fillna('').astype(str) if 'silo' in pages else pd.Series([''] * len(pages))
+    return pd.factorize(silos)[0]
+
+def pagerank(graph, damping=PAGERANK_DAMPING, tolerance=PAGERANK_TOLERANCE, max_iterations=PAGERANK_MAX_ITERATIONS):
+    """Return the PageRank of every page, summing to 1, by power iteration.
+
+    A page passes its score equally to the distinct pages it links to.
+    Pages without links, including those that could not be fetched, share
+    theirs with every page.
+    """
+    n = graph.num_pages
+    if not n:
+        return np.zeros(0)
+    sources, targets = graph.unique_edges()
+    out_degree = np.bincount(sources, minlength=n)
+    dangling = out_degree == 0
+    weights = 1.0 / out_degree[sources]
+    if scipy is not None:
+        transition = scipy.sparse.csr_matrix((weights, (targets, sources)), shape=(n, n))
+        spread = transition.dot
+    else:
+        def spread(ranks):
+            return np.bincount(targets, weights=ranks[sources] * weights, minlength=n)
+    ranks = np.full(n, 1.0 / n)
+    for _ in range(max_iterations):
+        previous = ranks
+        ranks = damping * spread(previous) + (damping * previous[dangling].sum() + 1 - damping) / n
+        if np.abs(ranks - previous).sum() < tolerance:
+            break
+    return ranks
+
+def click_depths(graph, start=None):
+    """Return the fewest clicks from `start` (the homepage by default) to every page; -1 where unreachable."""
+    depths = np.full(graph.num_pages, -1, dtype=np.int32)
+    if not graph.num_pages:
+        return depths
+    frontier = np.array([graph.homepage() if start is None else start])
+    depth = 0
+    while len(frontier):
+        depths[frontier] = depth
+        reached = graph.targets_of(frontier)
+        frontier = np.unique(reached[depths[reached] < 0])
+        depth += 1
+    return depths
+
+def authority_scores(graph, damping=PAGERANK_DAMPING):
+    """Score every page of the graph; returns one row per page, keyed by 'url'.
+
+    Degrees count distinct pages. `orphan` pages have no links from other
+    pages of the list, and `click_depth` is NA for pages the homepage
+    cannot reach. With a 'silo' column, `no_silo_links_in` marks pages
+    no other page of their silo links to.
+    """
+    n = graph.num_pages
+    pages = graph.pages
+    sources, targets = graph.unique_edges()
+    links_in = np.bincount(targets, minlength=n)
+    depths = click_depths(graph)
+    scores = pages[[column for column in ('url', 'silo', 'type') if column in pages]].copy()
+    scores = scores.assign(**{
+        'pagerank': pagerank(graph, damping),
+        'click_depth': pd.Series(depths, dtype='Int64').where(depths >= 0),
+        'links_in': links_in,
+        'links_out': np.bincount(sources, minlength=n),
+        'orphan': links_in == 0,
+    })
+    if 'silo' in pages:
+        silo_codes = _silo_codes(pages)
+        same_silo = silo_codes[sources] == silo_codes[targets]
+        scores['no_silo_links_in'] = np.bincount(targets[same_silo], minlength=n) == 0
+    scores['pagerank_rank'] = scores['pagerank'].rank(ascending=False, method='min').astype(int)
+    return scores
+
+def join_authority(opportunities, scores):
+    """Add the source and target pages' scores to opportunities output (source_url, keyword, target_url, ...).
+
+    URLs are matched after standardize_url; score columns get 'source_' and
+    'target_' prefixes and are NA for pages that are not in the graph.
+    """
+    scores = scores.drop(columns=[column for column in ('silo', 'type') if column in scores])
+    scores = scores.assign(url=standardize_urls(scores['url']).to_numpy())
+    joined = opportunities
+    for side in ('source', 'target'):
+        side_scores = scores.add_prefix(f"{side}_").rename(columns={f"{side}_url": '_key'})
+        joined = joined.assign(_key=standardize_urls(joined[f"{side}_url"]).to_numpy())
+        joined = joined.merge(side_scores, on='_key', how='left').drop(columns='_key')
+    return joined
+
+def silo_checks(graph):
+    """Check how every page links within its silo; returns one row per page.
+
+    Pages are grouped by the 'silo' column (all in one silo without it).
+    Counts are of distinct pages: `silo_links_out` pages of the same silo
+    the page links to, `silo_links_in` pages of the silo linking to it and
+    `silo_pages_not_linked` the rest of its silo it does not link to.
+    With a 'type' column, `links_to_target` and `linked_from_target` tell
+    whether a page links to or is linked from its silo's 'Target Page',
+    and `linked_from_homepage` whether the 'Homepage' links to it.
+    """
+    n = graph.num_pages
+    pages = graph.pages
+    sources, targets = graph.unique_edges()
+    silo_codes = _silo_codes(pages)
+    same_silo = silo_codes[sources] == silo_codes[targets]
+    silo_links_out = np.bincount(sources[same_silo], minlength=n)
+    checks = pages[[column for column in ('url', 'silo', 'type') if column in pages]].copy()
+    checks = checks.assign(**{
+        'fetched': ~graph.failed,
+        'links_out': np.bincount(sources, minlength=n),
+        'links_in': np.bincount(targets, minlength=n),
+        'outside_links': graph.outside_links,
+        'silo_links_out': silo_links_out,
+        'silo_links_in': np.bincount(targets[same_silo], minlength=n),
+        'silo_pages_not_linked': np.bincount(silo_codes, minlength=n)[silo_codes] - 1 - silo_links_out,
+    })
+    if 'type' not in pages:
+        return checks
+
+    types = pages['type'].fillna('').astype(str).to_numpy()
+    target_nodes = np.flatnonzero(types == TARGET_TYPE)
+    silo_target = np.full(silo_codes.max() + 1 if n else 0, -1)
+    # Assign in reverse so the first target page of a silo wins.
+    silo_target[silo_codes[target_nodes[::-1]]] = target_nodes[::-1]
+    page_target = silo_target[silo_codes]
+    # Pages of a silo without a target page, and the target pages themselves, get NA.
+    applicable = (page_target >= 0) & (page_target != np.arange(n))
+
+    def flags(mask):
+        return pd.Series(mask, dtype='boolean').where(applicable)
+
+    to_target = np.zeros(n, dtype=bool)
+    to_target[sources[targets == page_target[sources]]] = True
+    from_target = np.zeros(n, dtype=bool)
+    from_target[targets[sources == page_target[targets]]] = True
+    checks['links_to_target'] = flags(to_target)
+    checks['linked_from_target'] = flags(from_target)
+    homepages = np.flatnonzero(types == HOMEPAGE_TYPE)
+    if len(homepages):
+        from_homepage = np.zeros(n, dtype=bool)
+        from_homepage[targets[sources == homepages[0]]] = True
+        checks['linked_from_homepage'] = pd.Series(from_homepage, dtype='boolean').where(
+            np.arange(n) != homepages[0])
+    return checks
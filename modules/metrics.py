@@ -0,0 +1,372 @@
+"""Per-URL stage timings for crawl and match jobs.
+
+While a run is being collected (`collect_metrics`), every URL handled by
+`process_single_url_for_all_keywords`, the async fetcher or
+`get_main_content_anchor_tags` gets a trace, and the code that waits for a
+throttle slot or a free connection, resolves host names (dns), opens
+connections including TLS (connect), waits for the response headers
+(ttfb), downloads, decodes, parses, extracts anchors and paragraphs and
+matches keywords times itself with `stage()`. Finished traces are folded into one
+histogram per stage and per-host totals, which can be written as a
+Prometheus textfile (for node_exporter's textfile collector) or as a JSON
+run report. Outside a collected run `stage()` does nothing. The report
+also counts the run's HTTP requests, new connections and retries.
+"""
+import contextvars
+import heapq
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from modules.transport import transport_stats
+
+STAGES = ('wait', 'dns', 'connect', 'ttfb', 'download', 'decode', 'parse', 'anchors', 'paragraphs', 'match')
+# Upper bounds in seconds, as for a Prometheus histogram.
+HISTOGRAM_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SLOWEST_URLS = 20
+METRIC_PREFIX = 'link_finder'
+
+class Histogram:
+    """Counts of observations per bucket, with their sum and maximum."""
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def cumulative(self):
+        """Yield (upper bound, observations at or below it), ending with +Inf."""
+        total = 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            total += count
+            yield bound, total
+
+    def quantile(self, q):
+        """Estimate the q-quantile by interpolating inside its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        lower = 0.0
+        below = 0
+        for bound, total in self.cumulative():
+            if total >= rank:
+                upper = min(bound, self.max)
+                in_bucket = total - below
+                return lower + (upper - lower) * ((rank - below) / in_bucket if in_bucket else 1.0)
+            lower, below = bound, total
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else None,
+            'p50': _round(self.quantile(0.5)),
+            'p95': _round(self.quantile(0.95)),
+            'p99': _round(self.quantile(0.99)),
+            'max': round(self.max, 6),
+        }
+
+def _round(value):
+    return round(value, 6) if value is not None else None
+
+class UrlTrace:
+    """Seconds spent on one URL in each stage, plus whether it failed."""
+    def __init__(self, url):
+        self.url = url
+        self.stages = defaultdict(float)
+        self.error = None
+        self.from_cache = False
+        # Seconds spent setting up the request in flight, taken out of its ttfb.
+        self.request_setup = 0.0
+
+    def take_request_setup(self):
+        setup, self.request_setup = self.request_setup, 0.0
+        return setup
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - start
+
+class RunMetrics:
+    """Stage histograms, per-host totals and error counts for one run."""
+    def __init__(self, job):
+        self.job = job
+        self.started = time.time()
+        self.finished = None
+        self.histograms = {name: Histogram() for name in STAGES}
+        self.hosts = defaultdict(lambda: {'pages': 0, 'errors': 0, 'cache_hits': 0, 'seconds': defaultdict(float)})
+        self.errors = Counter()
+        self.pages = 0
+        # Extra report sections from other components, such as the throttle.
+        self.sections = {}
+        self._slowest = []
+        self._lock = threading.Lock()
+
+    def add_stages(self, url, stages):
+        """Fold stage timings for `url` into the totals without counting it as a page."""
+        host = urlsplit(url).hostname or ''
+        with self._lock:
+            for name, seconds in stages.items():
+                self.histograms.setdefault(name, Histogram()).observe(seconds)
+                self.hosts[host]['seconds'][name] += seconds
+
+    def record(self, trace):
+        self.add_stages(trace.url, trace.stages)
+        host = urlsplit(trace.url).hostname or ''
+        total = sum(trace.stages.values())
+        with self._lock:
+            self.pages += 1
+            summary = self.hosts[host]
+            summary['pages'] += 1
+            summary['cache_hits'] += trace.from_cache
+            if trace.error:
+                summary['errors'] += 1
+                self.errors[trace.error] += 1
+            # The page number breaks ties so the stage dicts are never compared.
+            entry = (total, self.pages, trace.url, dict(trace.stages))
+            if len(self._slowest) < SLOWEST_URLS:
+                heapq.heappush(self._slowest, entry)
+            elif total > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def report(self):
+        """Return the run as a JSON-serializable dict."""
+        with self._lock:
+            finished = self.finished or time.time()
+            return {
+                'job': self.job,
+                'started': datetime.fromtimestamp(self.started, timezone.utc).isoformat(timespec='seconds'),
+                'duration_seconds': round(finished - self.started, 3),
+                'pages': self.pages,
+                'errors': sum(self.errors.values()),
+                'errors_by_kind': dict(self.errors),
+                'stages': {name: histogram.summary() for name, histogram in self.histograms.items()
+                           if histogram.count},
+                'hosts': {
+                    host: {
+                        'pages': summary['pages'],
+                        'errors': summary['errors'],
+                        'cache_hits': summary['cache_hits'],
+                        'seconds': {name: round(seconds, 6) for name, seconds in summary['seconds'].items()},
+                    }
+                    for host, summary in sorted(self.hosts.items())
+                },
+                'slowest_urls': [
+                    {'url': url, 'seconds': round(total, 6),
+                     'stages': {name: round(seconds, 6) for name, seconds in stages.items()}}
+                    for total, _, url, stages in sorted(self._slowest, reverse=True)
+                ],
+                **self.sections,
+            }
+
+    def prometheus_text(self):
+        """Return the run in the Prometheus text exposition format."""
+        job = _label_value(self.job)
+        lines = [
+            f"# HELP {METRIC_PREFIX}_stage_seconds Seconds spent per URL in each processing stage.",
+            f"# TYPE {METRIC_PREFIX}_stage_seconds histogram",
+        ]
+        with self._lock:
+            for name, histogram in self.histograms.items():
+                if not histogram.count:
+                    continue
+                labels = f'job="{job}",stage="{name}"'
+                for bound, total in histogram.cumulative():
+                    le = '+Inf' if bound == math.inf else repr(bound)
+                    lines.append(f'{METRIC_PREFIX}_stage_seconds_bucket{{{labels},le="{le}"}} {total}')
+                lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{{labels}}} {histogram.sum:.6f}')
+                lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{{labels}}} {histogram.count}')
+
+            counters = [
+                ('host_pages_total', "Pages handled per host.", 'pages'),
+                ('host_errors_total', "Pages that failed per host.", 'errors'),
+                ('host_cache_hits_total', "Pages served from the page cache per host.", 'cache_hits'),
+            ]
+            for metric, help_text, key in counters:
+                lines += [f"# HELP {METRIC_PREFIX}_{metric} {help_text}", f"# TYPE {METRIC_PREFIX}_{metric} counter"]
+                for host, summary in sorted(self.hosts.items()):
+                    if summary['pages']:
+                        lines.append(f'{METRIC_PREFIX}_{metric}{{job="{job}",host="{_label_value(host)}"}} '
+                                     f'{summary[key]}')
+
+            lines += [f"# HELP {METRIC_PREFIX}_host_stage_seconds_total Seconds spent per host in each stage.",
+                      f"# TYPE {METRIC_PREFIX}_host_stage_seconds_total counter"]
+            for host, summary in sorted(self.hosts.items()):
+                for name, seconds in summary['seconds'].items():
+                    lines.append(f'{METRIC_PREFIX}_host_stage_seconds_total'
+                                 f'{{job="{job}",host="{_label_value(host)}",stage="{name}"}} {seconds:.6f}')
+
+            lines += [f"# HELP {METRIC_PREFIX}_errors_total Failed pages by kind of error.",
+                      f"# TYPE {METRIC_PREFIX}_errors_total counter"]
+            for kind, count in sorted(self.errors.items()):
+                lines.append(f'{METRIC_PREFIX}_errors_total{{job="{job}",kind="{_label_value(kind)}"}} {count}')
+
+            transport = self.sections.get('transport')
+            if transport:
+                for metric, help_text, key in [
+                    ('http_requests_total', "HTTP requests sent, retries included.", 'requests'),
+                    ('http_connections_opened_total', "HTTP connections opened.", 'connections_opened'),
+                ]:
+                    lines += [f"# HELP {METRIC_PREFIX}_{metric} {help_text}", f"# TYPE {METRIC_PREFIX}_{metric} counter",
+                              f'{METRIC_PREFIX}_{metric}{{job="{job}"}} {transport[key]}']
+                lines += [f"# HELP {METRIC_PREFIX}_http_retries_total HTTP requests retried, by reason.",
+                          f"# TYPE {METRIC_PREFIX}_http_retries_total counter"]
+                for reason, count in sorted(transport['retries_by_reason'].items()):
+                    lines.append(f'{METRIC_PREFIX}_http_retries_total{{job="{job}",reason="{_label_value(reason)}"}} '
+                                 f'{count}')
+
+            finished = self.finished or time.time()
+            lines += [
+                f"# HELP {METRIC_PREFIX}_run_duration_seconds Wall-clock duration of the run.",
+                f"# TYPE {METRIC_PREFIX}_run_duration_seconds gauge",
+                f'{METRIC_PREFIX}_run_duration_seconds{{job="{job}"}} {finished - self.started:.3f}',
+                f"# HELP {METRIC_PREFIX}_run_finished_timestamp_seconds When the run finished.",
+                f"# TYPE {METRIC_PREFIX}_run_finished_timestamp_seconds gauge",
+                f'{METRIC_PREFIX}_run_finished_timestamp_seconds{{job="{job}"}} {finished:.3f}',
+            ]
+        return '\n'.join(lines) + '\n'
+
+    def write_json(self, path):
+        _write_atomically(path, json.dumps(self.report(), indent=2))
+
+    def write_prometheus(self, path):
+        _write_atomically(path, self.prometheus_text())
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _write_atomically(path, text):
+    # The textfile collector may read at any moment; never let it see half a file.
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temporary_path, path)
+
+_active_metrics = None
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+
+def active_metrics():
+    """Return the RunMetrics being collected, or None."""
+    return _active_metrics
+
+@contextmanager
+def collect_metrics(job):
+    """Collect traces from every thread of this process into a new RunMetrics while the block runs."""
+    global _active_metrics
+    previous, metrics = _active_metrics, RunMetrics(job)
+    _active_metrics = metrics
+    transport_before = transport_stats.snapshot()
+    try:
+        yield metrics
+    finally:
+        metrics.finished = time.time()
+        metrics.sections['transport'] = transport_stats.since(transport_before)
+        _active_metrics = previous
+
+@contextmanager
+def trace_url(url):
+    """Trace `url` while the block runs and record it when it ends; yields None when not collecting."""
+    metrics = _active_metrics
+    if metrics is None:
+        yield None
+        return
+    trace = UrlTrace(url)
+    try:
+        with use_trace(trace):
+            yield trace
+    except Exception as e:
+        trace.error = trace.error or type(e).__name__
+        raise
+    finally:
+        metrics.record(trace)
+
+@contextmanager
+def use_trace(trace):
+    """Make `trace` the current trace while the block runs, without recording it afterwards."""
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+@contextmanager
+def stage(name):
+    """Add the time spent in the block to stage `name` of the current trace, if any."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.stage(name):
+        yield
+
+def record_stage(name, seconds):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.stages[name] += seconds
+
+def record_request_setup(name, seconds):
+    """Add DNS, connect or connection-pool wait time of the request in flight to stage `name`.
+
+    The request's ttfb, recorded once its headers arrive, leaves this time out.
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.stages[name] += seconds
+        trace.request_setup += seconds
+
+def record_ttfb(seconds):
+    """Record the `seconds` from sending a request to its headers, less its setup time, as ttfb."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.stages['ttfb'] += max(seconds - trace.take_request_setup(), 0.0)
+
+def mark_cache_hit():
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.from_cache = True
+
+def record_error(error):
+    """Mark the current trace as failed with `error`, an exception or a short description."""
+    trace = _current_trace.get()
+    if trace is not None and trace.error is None:
+        trace.error = error if isinstance(error, str) else error_kind(error)
+
+def error_kind(error):
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None) or getattr(error, 'status', None)
+    return f"HTTP {status}" if status else type(error).__name__
+
+def record_response_timing(response, seconds):
+    """Split the `seconds` a requests call took into ttfb (until headers) and download.
+
+    DNS and connect time were recorded by the transport as the connection
+    opened and are left out of the ttfb.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    if getattr(response, 'from_cache', False):
+        trace.from_cache = True
+        trace.stages['download'] += seconds
+        return
+    headers = min(response.elapsed.total_seconds(), seconds)
+    trace.stages['ttfb'] += max(headers - trace.take_request_setup(), 0.0)
+    trace.stages['download'] += seconds - headers
@@ -0,0 +1,350 @@
+import concurrent.futures
+import logging
+from collections import OrderedDict
+import queue
+import threading
+import time
+import requests
+from urllib3.exceptions import InsecureRequestWarning
+from modules.async_fetcher import fetch_and_process
+from modules.html_parser import parse_page, declared_encoding
+from modules.http_cache import cache_lookup, cached_get
+from modules.keyword_matcher import KeywordMatcher
+from modules.metrics import (UrlTrace, active_metrics, record_error, record_response_timing, stage, trace_url,
+                             use_trace)
+from modules.scan_store import open_scan_store, page_content_hash, pair_fingerprint
+from modules.throttle import MAX_ATTEMPTS, THROTTLE_STATUSES
+from modules.transport import create_session
+from modules.utils import standardize_urls
+
+requests.packages.urllib3.disable_warnings(category=InsecureRequestWarning)
+logger = logging.getLogger(__name__)
+
+FETCH_MODE_THREADS = "threads"
+FETCH_MODE_ASYNC = "async"
+# Downloaded pages allowed to wait for a parser process, per process.
+PARSE_QUEUE_PER_WORKER = 4
+# Matchers built for keyword deltas, kept per scanner.
+DELTA_MATCHER_CACHE_SIZE = 16
+
+def keyword_pairs_from_frame(df_keywords):
+    """Return the (keyword, target_url) pairs of a DataFrame with those columns."""
+    df_keywords = df_keywords.dropna(subset=['keyword', 'target_url'])
+    return list(df_keywords[['keyword', 'target_url']].itertuples(index=False, name=None))
+
+def urls_to_scan(source_urls, keyword_url_pairs):
+    """Standardize source URLs, leaving out those that are themselves targets."""
+    target_urls_set = set(standardize_urls([u for k, u in keyword_url_pairs]))
+    return [url for url in standardize_urls(source_urls) if url not in target_urls_set]
+
+def check_existing_links(anchor_index, matcher, pair_index):
+    link_texts = anchor_index.get(matcher.standardized_targets[pair_index])
+    if not link_texts:
+        return False
+    return any(matcher.contains(link_text, pair_index) for link_text in link_texts)
+
+def find_page_opportunities(url, content, encoding, matcher):
+    page = parse_page(url, content, encoding=encoding)
+    with stage('match'):
+        anchor_index = page.anchor_index()
+        contexts = matcher.find_unlinked(page.paragraphs)
+        results_for_this_url = []
+        for pair_index, (keyword, target_url) in enumerate(matcher.pairs):
+            if pair_index not in contexts:
+                continue
+            if check_existing_links(anchor_index, matcher, pair_index):
+                continue
+            results_for_this_url.append({
+                'context': contexts[pair_index],
+                'keyword': keyword.strip(),
+                'target_url': target_url
+            })
+    return {'url': url, 'unlinked_matches': results_for_this_url} if results_for_this_url else None
+
+class IncrementalScanner:
+    """Scan pages against a matcher, reusing results stored by earlier runs.
+
+    Results are keyed by page URL, content hash and keyword-URL pair. A page
+    whose content is unchanged is only evaluated against the pairs it has not
+    seen before; a changed page is evaluated against every pair.
+    """
+    def __init__(self, matcher, store):
+        self.matcher = matcher
+        self.store = store
+        self.fingerprints = [pair_fingerprint(keyword, target_url) for keyword, target_url in matcher.pairs]
+        self.set_id = store.register_fingerprints(self.fingerprints)
+        self._delta_matchers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _matcher_for(self, pair_indices):
+        if len(pair_indices) == len(self.matcher.pairs):
+            return self.matcher
+        key = tuple(pair_indices)
+        with self._lock:
+            if key in self._delta_matchers:
+                self._delta_matchers.move_to_end(key)
+                return self._delta_matchers[key]
+        delta_matcher = KeywordMatcher([self.matcher.pairs[i] for i in pair_indices])
+        with self._lock:
+            self._delta_matchers[key] = delta_matcher
+            if len(self._delta_matchers) > DELTA_MATCHER_CACHE_SIZE:
+                self._delta_matchers.popitem(last=False)
+        return delta_matcher
+
+    def find_page_opportunities(self, url, content, encoding):
+        content_hash = page_content_hash(content, encoding)
+        evaluated, hits = self.store.lookup(url, content_hash)
+        pending = [i for i, fingerprint in enumerate(self.fingerprints) if fingerprint not in evaluated]
+        if pending:
+            result = find_page_opportunities(url, content, encoding, self._matcher_for(pending))
+            new_hits = {
+                pair_fingerprint(match['keyword'], match['target_url']): match['context']
+                for match in (result['unlinked_matches'] if result else [])
+            }
+            self.store.record(url, content_hash, self.set_id, new_hits)
+            hits.update(new_hits)
+
+        results_for_this_url = [
+            {'context': hits[fingerprint], 'keyword': keyword.strip(), 'target_url': target_url}
+            for (keyword, target_url), fingerprint in zip(self.matcher.pairs, self.fingerprints)
+            if fingerprint in hits
+        ]
+        return {'url': url, 'unlinked_matches': results_for_this_url} if results_for_this_url else None
+
+def page_scanner(matcher, incremental=False):
+    """Return an IncrementalScanner for `matcher`, or None for full scans."""
+    if not incremental:
+        return None
+    store = open_scan_store()
+    return IncrementalScanner(matcher, store) if store is not None else None
+
+def scan_page_content(url, content, encoding, matcher, scanner=None):
+    """Find a page's opportunities, returning (result, failed)."""
+    try:
+        if scanner is not None:
+            return scanner.find_page_opportunities(url, content, encoding), False
+        return find_page_opportunities(url, content, encoding, matcher), False
+    except Exception as e:
+        logger.error(f"An unexpected error occurred while processing {url}: {str(e)}")
+        record_error(e)
+        return None, True
+
+def process_page_content(url, content, encoding, matcher, scanner=None):
+    return scan_page_content(url, content, encoding, matcher, scanner)[0]
+
+def _get_page(session, url, throttle):
+    cached, fresh = cache_lookup(url)
+    if throttle is None or fresh:
+        start = time.perf_counter()
+        response = cached_get(url, session=session, timeout=20, verify=False, cached=cached)
+        record_response_timing(response, time.perf_counter() - start)
+        return response
+    throttle.prepare(url)
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        ticket = throttle.acquire(url)
+        response = None
+        try:
+            start = time.perf_counter()
+            response = cached_get(url, session=session, timeout=20, verify=False, cached=cached)
+            record_response_timing(response, time.perf_counter() - start)
+        finally:
+            throttle.release(ticket, response.status_code if response is not None else None,
+                             response.headers.get('Retry-After') if response is not None else None)
+        if response.status_code not in THROTTLE_STATUSES or attempt == MAX_ATTEMPTS:
+            return response
+        logger.info(f"{url} answered {response.status_code}, retrying (attempt {attempt + 1} of {MAX_ATTEMPTS})")
+
+def fetch_page(session, url, throttle=None):
+    """Download a page, returning (content, encoding) or (None, None) on failure.
+
+    With a `throttle`, the request waits for a slot for its host and
+    rate-limited responses are retried once the host's pause is over.
+    """
+    try:
+        response = _get_page(session, url, throttle)
+        response.raise_for_status()
+        return response.content, declared_encoding(response.headers.get('Content-Type'))
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Request failed for {url}: {str(e)}")
+        record_error(e)
+        return None, None
+
+def scan_url(url, matcher, session, scanner=None, throttle=None):
+    """Download and scan one page, returning (result, failed)."""
+    with trace_url(url):
+        content, encoding = fetch_page(session, url, throttle)
+        if content is None:
+            return None, True
+        return scan_page_content(url, content, encoding, matcher, scanner)
+
+def process_single_url_for_all_keywords(url, matcher, session, scanner=None, throttle=None):
+    return scan_url(url, matcher, session, scanner, throttle)[0]
+
+_worker_matcher = None
+_worker_scanner = None
+
+def _init_parse_worker(keyword_url_pairs, incremental):
+    global _worker_matcher, _worker_scanner
+    _worker_matcher = KeywordMatcher(keyword_url_pairs)
+    _worker_scanner = page_scanner(_worker_matcher, incremental)
+
+def _parse_in_worker(url, content, encoding):
+    # The parent's metrics live in another process; hand the stage timings back with the result.
+    with use_trace(UrlTrace(url)) as trace:
+        result, failed = scan_page_content(url, content, encoding, _worker_matcher, _worker_scanner)
+    return result, failed, dict(trace.stages)
+
+def _download_all(urls, hand_off, fetch_mode, max_workers, per_host_limit, throttle):
+    if fetch_mode == FETCH_MODE_ASYNC:
+        def hand_off_page(url, content, encoding):
+            hand_off(url, content, encoding)
+            return True
+
+        fetch_and_process(
+            urls, hand_off_page,
+            # Pages that were handed off report through the parse stage instead.
+            on_complete=lambda url, handed_off: None if handed_off else hand_off(url, None, None),
+            concurrency=max_workers, per_host_limit=per_host_limit, throttle=throttle
+        )
+        return
+
+    def download(url, session):
+        with trace_url(url):
+            content, encoding = fetch_page(session, url, throttle)
+        hand_off(url, content, encoding)
+
+    with create_session(pool_size=max_workers) as session:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for future in [executor.submit(download, url, session) for url in urls]:
+                future.result()
+
+def _run_two_stage(urls, matcher, fetch_mode, max_workers, per_host_limit, parse_workers, incremental, record,
+                   throttle):
+    """Download on I/O workers and parse/match in a pool of processes.
+
+    A bounded number of downloaded pages may wait for a parser; once the
+    queue is full, downloaders block until a parser frees a slot.
+    """
+    completed = queue.Queue()
+    slots = threading.BoundedSemaphore(parse_workers * PARSE_QUEUE_PER_WORKER)
+    download_errors = []
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=parse_workers, initializer=_init_parse_worker,
+                                                initargs=(matcher.pairs, incremental)) as executor:
+        def parsed(url, future):
+            slots.release()
+            if future.exception() is not None:
+                logger.error(f"Parser process failed: {future.exception()}")
+                completed.put((url, None, True))
+                return
+            result, failed, stages = future.result()
+            metrics = active_metrics()
+            if metrics is not None:
+                metrics.add_stages(url, stages)
+            completed.put((url, result, failed))
+
+        def hand_off(url, content, encoding):
+            if content is None:
+                completed.put((url, None, True))
+                return
+            slots.acquire()
+            executor.submit(_parse_in_worker, url, content, encoding).add_done_callback(
+                lambda future: parsed(url, future))
+
+        def download_stage():
+            try:
+                _download_all(urls, hand_off, fetch_mode, max_workers, per_host_limit, throttle)
+            except Exception as e:
+                download_errors.append(e)
+                completed.put(e)
+
+        downloader = threading.Thread(target=download_stage, daemon=True)
+        downloader.start()
+        for _ in range(len(urls)):
+            outcome = completed.get()
+            if download_errors:
+                break
+            record(*outcome)
+        downloader.join()
+    if download_errors:
+        raise download_errors[0]
+
+def find_opportunities(urls, matcher, fetch_mode=FETCH_MODE_THREADS, max_workers=15, per_host_limit=10,
+                       parse_workers=0, incremental=False, on_progress=None, sink=None, throttle=None, job=None):
+    """Fetch and scan every URL, returning the non-empty per-page results.
+
+    With `parse_workers` > 0, pages are parsed and matched in that many
+    processes while threads or the event loop only download. With
+    `incremental`, results from earlier runs are reused for pages whose
+    content has not changed. When a `sink` is given, each result is written
+    to it as soon as its page finishes and the returned list stays empty.
+    With an AdaptiveThrottle, requests to each host are paced by it and
+    `per_host_limit` only bounds the async connection pool. Download
+    threads share a transport session pooling `max_workers` connections.
+    With a CrawlJob, results of URLs it finished in an earlier attempt are
+    reused, only the other URLs are fetched, and every outcome is
+    checkpointed to it.
+    """
+    results = []
+    total_tasks = len(urls)
+    processed = 0
+
+    def keep(result):
+        if result:
+            if sink is not None:
+                sink.write(result)
+            else:
+                results.append(result)
+
+    def record(url, result, failed=False):
+        nonlocal processed
+        processed += 1
+        keep(result)
+        if job is not None:
+            job.record(url, result, failed)
+        if on_progress:
+            on_progress(processed, total_tasks)
+
+    if job is not None:
+        finished = set()
+        for url, result in job.finished():
+            finished.add(url)
+            keep(result)
+        urls = [url for url in urls if url not in finished]
+        processed = total_tasks - len(urls)
+
+    if parse_workers:
+        if incremental:
+            # Create the store before the parser processes open it.
+            incremental = open_scan_store() is not None
+        _run_two_stage(urls, matcher, fetch_mode, max_workers, per_host_limit, parse_workers, incremental, record,
+                       throttle)
+        return results
+
+    scanner = page_scanner(matcher, incremental)
+
+    if fetch_mode == FETCH_MODE_ASYNC:
+        fetch_and_process(
+            urls,
+            lambda url, content, encoding: scan_page_content(url, content, encoding, matcher, scanner),
+            # A failed download reports None instead of (result, failed).
+            on_complete=lambda url, outcome: record(url, *(outcome or (None, True))),
+            concurrency=max_workers, per_host_limit=per_host_limit, throttle=throttle
+        )
+        return results
+
+    with create_session(pool_size=max_workers) as session:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            future_to_url = {
+                executor.submit(scan_url, url, matcher, session, scanner, throttle): url
+                for url in urls
+            }
+            try:
+                for future in concurrent.futures.as_completed(future_to_url):
+                    record(future_to_url[future], *future.result())
+            except BaseException:
+                # Stop promptly (e.g. on a Streamlit rerun) instead of finishing every queued URL.
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+    return results
+
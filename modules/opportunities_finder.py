@@ -1,150 +1,150 @@
 import streamlit as st
-import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-import concurrent.futures
+import json
+import os
 import time
 import logging
-from urllib3.exceptions import InsecureRequestWarning
-import re
-import requests.compat
-from collections import defaultdict
+from contextlib import nullcontext
+from modules.transport import DEFAULT_HEADERS
+from modules.crawl_jobs import open_job
+from modules.keyword_matcher import KeywordMatcher
+from modules.metrics import collect_metrics
+from modules.opportunities import (FETCH_MODE_THREADS, FETCH_MODE_ASYNC, find_opportunities, keyword_pairs_from_frame,
+                                   urls_to_scan)
+from modules.result_sink import temporary_sink, iter_grouped, remove_sink_file
+from modules.throttle import DEFAULT_MAX_LIMIT, AdaptiveThrottle
+from modules.utils import read_table
 
-requests.packages.urllib3.disable_warnings(category=InsecureRequestWarning)
 logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
 
-def clean_text(text):
-    if not text:
-        return ""
-    text = re.sub(r'<[^>]+>', ' ', text)
-    text = re.sub(r'[^\w\s]', ' ', text)  
-    text = re.sub(r'\s+', ' ', text)       
-    return text.lower().strip()
-
-def standardize_url(url):
-    url = url.strip()
-    if url.startswith("www."):
-        url = "https://" + url
-    elif not url.startswith(('http://', 'https://')):
-        url = "https://" + url
-    parsed = requests.compat.urlparse(url)
-    netloc = parsed.netloc.lower()
-    path = parsed.path.rstrip('/') if parsed.path != '/' else '/'
-    standardized = requests.compat.urlunparse(
-        (parsed.scheme, netloc, path, '', '', '')
+def concurrency_controls(suffix, slider_key):
+    fetch_mode = st.radio(
+        "Fetch mode", [FETCH_MODE_THREADS, FETCH_MODE_ASYNC], horizontal=True, key=f"fetch_mode_{suffix}",
+        format_func=lambda mode: "Threads" if mode == FETCH_MODE_THREADS else "Async (aiohttp)",
+        help="Async mode keeps hundreds of requests in flight and suits large URL lists"
     )
-    return standardized
+    adaptive = st.checkbox("Adapt concurrency to each host", value=True, key=f"adaptive_{suffix}",
+                           help="Start with two requests per host and raise or lower the number in flight from each "
+                                "host's latency and errors. Rate-limited pages (429/503) wait for Retry-After and are "
+                                "retried, and robots.txt Crawl-delay is honoured.")
+    per_host_limit = None
+    if fetch_mode == FETCH_MODE_ASYNC:
+        col1, col2 = st.columns(2)
+        max_workers = col1.slider("Requests in flight", min_value=10, max_value=500, value=200,
+                                  help="Number of downloads kept open at the same time", key=f"in_flight_{suffix}")
+        per_host_limit = col2.slider("Connections per host", min_value=1, max_value=50, value=10,
+                                     help="Upper bound on simultaneous connections to a single host", key=f"per_host_{suffix}")
+    elif adaptive:
+        col1, col2 = st.columns(2)
+        max_workers = col1.slider("Concurrent searches", min_value=1, max_value=100, value=30,
+                                  help="Upper bound on URLs processed at the same time across all hosts",
+                                  key=f"{slider_key}_adaptive")
+        per_host_limit = col2.slider("Requests per host", min_value=1, max_value=50, value=10,
+                                     help="Upper bound the per-host limit can grow to", key=f"per_host_{suffix}")
+    else:
+        max_workers = st.slider("Concurrent searches", min_value=1, max_value=20, value=15,
+                                help="Number of URLs to process simultaneously", key=slider_key)
+    parse_workers = st.slider("Parser processes", min_value=0, max_value=os.cpu_count() or 1, value=0,
+                              help="Parse and match pages in this many separate processes so CPU work uses every core. "
+                                   "0 parses on the download workers.", key=f"parse_workers_{suffix}")
+    incremental = st.checkbox("Reuse results from earlier runs", value=True, key=f"incremental_{suffix}",
+                              help="Pages whose content has not changed are only checked against new or edited keywords")
+    resume = st.checkbox("Resume interrupted searches", value=True, key=f"resume_{suffix}",
+                         help="If a search of the same URLs and keywords was interrupted, keep the pages it finished "
+                              "and only fetch the rest, retrying pages that failed")
+    return fetch_mode, max_workers, per_host_limit, parse_workers, incremental, adaptive, resume
 
-def extract_text_from_html(html_content):
-    soup = BeautifulSoup(html_content, 'lxml')
-    for element in soup.find_all(['script', 'style', 'nav', 'header', 'footer', 'meta', 'link',
-                                'h1', 'h2', 'h3', 'h4', 'h5', 'h6','strong','a']):
-        element.decompose()
-    classes_to_remove = [
-        "position-relative mt-5 related-blog-post__swiper-container", "nav-red", "nav-label",
-        "row left-zero__without-shape position-relative z-1 mt-4 mt-md-5 px-0","footer pt-lg-9 pb-lg-10 pb-8 pt-7",
-        "related-blog-post related-blog-post--bottom-pattern position-relative overflow-hidden z-1 ps-3 px-sm-0 py-5 py-lg-7 bg-cool",
-        "section-content", "row banner ",
-        "contact-form position-relative generic-form gravity-form py-6 dark__form",
-    ]
-    for element in soup.find_all(class_=classes_to_remove):
-        element.decompose()
-    return soup
+def run_search(urls_to_process, keyword_url_pairs, results_key, adaptive=False, resume=True, **options):
+    """Stream opportunities for every URL into a CSV file and keep only its summary in the session."""
+    previous = st.session_state.get(results_key)
+    if previous:
+        remove_sink_file(previous['path'])
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    def show_progress(processed, total_tasks):
+        progress_bar.progress(processed / total_tasks)
+        status_text.text(f"Processed {processed}/{total_tasks} URLs...")
 
-def check_existing_links(full_soup, keyword, source_url, target_url):
-    cleaned_keyword = clean_text(keyword)
-    keyword_terms = cleaned_keyword.split()
-    if not keyword_terms:
-        return False
-    escaped_terms = [re.escape(term) for term in keyword_terms]
-    pattern = re.compile(r'\b' + r'\s+'.join(escaped_terms) + r'\b', re.IGNORECASE)
-    standardized_target = standardize_url(target_url)
-    for a_tag in full_soup.find_all('a', href=True):
-        link_text = a_tag.get_text(strip=True)
-        if not link_text:
-            continue
-        cleaned_link_text = clean_text(link_text)
-        if pattern.search(cleaned_link_text):
-            href = a_tag.get('href', '')
-            absolute_href = requests.compat.urljoin(source_url, href)
-            standardized_href = standardize_url(absolute_href)
-            if standardized_href == standardized_target:
-                return True
-    return False
+    matcher = KeywordMatcher(keyword_url_pairs)
+    throttle = AdaptiveThrottle(max_limit=options.get('per_host_limit') or DEFAULT_MAX_LIMIT,
+                                headers=DEFAULT_HEADERS) if adaptive else None
+    job = open_job(urls_to_process, keyword_url_pairs, restart=not resume)
+    if job is not None and job.resumed:
+        st.info(f"Resuming an interrupted search: {job.finished_count} URLs already done, "
+                f"{job.retry_count} failed URLs will be retried")
+    sink = temporary_sink()
+    try:
+        with sink, job or nullcontext(), collect_metrics('opportunities') as metrics:
+            find_opportunities(urls_to_process, matcher, on_progress=show_progress, sink=sink, throttle=throttle,
+                               job=job, **options)
+    except Exception:
+        remove_sink_file(sink.path)
+        raise
+    progress_bar.empty()
+    status_text.empty()
+    if throttle is not None:
+        metrics.sections['throttle'] = throttle.report()
+    if job is not None and job.failed_count:
+        st.warning(f"{job.failed_count} URLs could not be fetched.")
+    st.session_state[results_key] = {
+        'path': sink.path, 'num_opportunities': sink.num_opportunities, 'matched_urls': sink.matched_urls,
+        'metrics': metrics.report()
+    }
 
-def find_unlinked_keywords(soup, keyword, target_url):
-    keyword = keyword.strip()
-    cleaned_keyword = clean_text(keyword)
-    keyword_terms = cleaned_keyword.split()
-    if not keyword_terms:
-        return []
-    forbidden_terms = ["solution", "service", "software", "app", "platforms", "solutions", "services", "softwares", "apps", "platform"]
-    keyword_lower = keyword.lower()
-    ends_with_forbidden = any(keyword_lower.endswith(term) for term in forbidden_terms)
-    escaped_terms = [re.escape(term) for term in keyword_terms]
-    keyword_pattern = re.compile(r'\b' + r'\s+'.join(escaped_terms) + r'\b', re.IGNORECASE)
-    forbidden_pattern = None
-    if not ends_with_forbidden:
-        forbidden_regex_str = r'\s+(' + '|'.join(forbidden_terms) + r')\b'
-        forbidden_pattern = re.compile(keyword_pattern.pattern + forbidden_regex_str, re.IGNORECASE)
-    unlinked_occurrences = []
-    paragraphs = soup.find_all('p')
-    word_count = 0
-    exclusion_threshold = 50
-    for p_tag in paragraphs:
-        original_paragraph_text = p_tag.get_text(strip=True)
-        if not original_paragraph_text:
-            continue
-        cleaned_paragraph_text = clean_text(original_paragraph_text)
-        paragraph_word_count = len(cleaned_paragraph_text.split())
-        if word_count + paragraph_word_count < exclusion_threshold:
-            word_count += paragraph_word_count
-            continue
-        if keyword_pattern.search(cleaned_paragraph_text):
-            if forbidden_pattern and forbidden_pattern.search(cleaned_paragraph_text):
-                continue
-            unlinked_occurrences.append({
-                'context': original_paragraph_text,
-                'keyword': keyword,
-                'target_url': target_url
-            })
-            break
-        word_count += paragraph_word_count
-    return unlinked_occurrences
+def show_run_metrics(summary, download_key):
+    """Show where the time of the last search went, per stage and per host."""
+    report = (summary or {}).get('metrics')
+    if not report or not report['stages']:
+        return
+    with st.expander("Timing by stage"):
+        st.dataframe([{'stage': name, **stats} for name, stats in report['stages'].items()], hide_index=True)
+        st.dataframe([{'host': host, 'pages': host_summary['pages'], 'errors': host_summary['errors'],
+                       'cache hits': host_summary['cache_hits'], **host_summary['seconds']}
+                      for host, host_summary in report['hosts'].items()], hide_index=True)
+        if report['errors_by_kind']:
+            st.write("Errors: " + ", ".join(f"{kind} ({count})" for kind, count in report['errors_by_kind'].items()))
+        transport = report.get('transport')
+        if transport and transport['requests']:
+            st.write(f"HTTP: {transport['requests']} requests over {transport['connections_opened']} new connections "
+                     f"({transport['connections_reused']} reused), {transport['retries']} retries"
+                     + "".join(f", {reason} {count}" for reason, count in transport['retries_by_reason'].items()))
+        if report.get('throttle'):
+            st.write("Adaptive concurrency per host")
+            st.dataframe([{'host': host, **host_summary} for host, host_summary in report['throttle']['hosts'].items()],
+                         hide_index=True)
+            if report['throttle']['decisions']:
+                st.dataframe(report['throttle']['decisions'], hide_index=True)
+        st.download_button(
+            label="Download Run Report (JSON)",
+            data=json.dumps(report, indent=2),
+            file_name='run_report.json',
+            mime='application/json',
+            key=download_key
+        )
 
-def process_single_url_for_all_keywords(url, keyword_url_pairs, session):
-    try:
-        headers = {
-            'User-Agent': "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36"
-        }
-        response = session.get(url, headers=headers, timeout=20, verify=False)
-        response.raise_for_status()
-        html_content = response.text
-        
-        full_soup = BeautifulSoup(html_content, 'lxml')
-        clean_soup = extract_text_from_html(html_content)
-        
-        results_for_this_url = []
-        for keyword, target_url in keyword_url_pairs:
-            if check_existing_links(full_soup, keyword, url, target_url):
-                continue
-            unlinked_matches = find_unlinked_keywords(clean_soup, keyword, target_url)
-            if unlinked_matches:
-                results_for_this_url.extend(unlinked_matches)
-        
-        return {'url': url, 'unlinked_matches': results_for_this_url} if results_for_this_url else None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Request failed for {url}: {str(e)}")
-        return None
-    except Exception as e:
-        logger.error(f"An unexpected error occurred while processing {url}: {str(e)}")
-        return None
+def show_opportunities(summary, download_key):
+    if not summary or not summary['num_opportunities']:
+        st.info("No interlinking opportunities found.")
+        return
+    st.success(f"Found {summary['num_opportunities']} opportunities across {summary['matched_urls']} URLs")
 
-@st.cache_data
-def convert_df_to_csv(download_data):
-    download_df = pd.DataFrame(download_data)
-    return download_df.to_csv(index=False).encode('utf-8')
+    with st.expander("View Opportunities", expanded=True):
+        for url, items in iter_grouped(summary['path']):
+            st.write("---")
+            st.markdown(f"🔗 **Source URL:** [{url}]({url})")
+            st.write("Unlinked Keyword Occurrences:")
+            for match_info in items:
+                st.markdown(f"- *{match_info['keyword']}* → [{match_info['target_url']}]({match_info['target_url']})")
+                st.markdown(f"Context: *{match_info['context']}*")
+                st.write("") # Adds a small space for readability
+
+    with open(summary['path'], 'rb') as csv_file:
+        st.download_button(
+            label="Download Opportunities CSV",
+            data=csv_file,
+            file_name='unlinked_keyword_opportunities.csv',
+            mime='text/csv',
+            key=download_key
+        )
 
 def manual_input_internal_linking():
     session_vars = [
@@ -169,7 +169,7 @@ def manual_input_internal_linking():
                                         key="url_file_uploader_manual")
         if uploaded_file:
             try:
-                df = pd.read_csv(uploaded_file) if uploaded_file.name.endswith(".csv") else pd.read_excel(uploaded_file)
+                df = read_table(uploaded_file, uploaded_file.name)
                 df.columns = df.columns.str.strip().str.lower()
                 st.write("Loaded data:", df.head())
                 st.session_state.uploaded_df_manual = df
@@ -200,8 +200,8 @@ def manual_input_internal_linking():
         if keyword.strip() and target_url.strip():
             keyword_url_pairs.append((keyword.strip(), target_url.strip()))
 
-    max_workers = st.slider("Concurrent searches", min_value=1, max_value=20, value=15,
-                            help="Number of URLs to process simultaneously", key="slider_manual")
+    fetch_mode, max_workers, per_host_limit, parse_workers, incremental, adaptive, resume = concurrency_controls(
+        "manual", "slider_manual")
 
     if st.button("Process URLs", key="process_button_manual"):
         if df is not None and keyword_url_pairs:
@@ -210,36 +210,17 @@ def manual_input_internal_linking():
                     st.error("File must contain a 'source_url' column")
                     return
                 source_urls = df['source_url'].dropna().astype(str).str.strip().unique()
-                target_urls_set = {standardize_url(u) for k, u in keyword_url_pairs}
-                urls_to_process = [standardize_url(url) for url in source_urls if standardize_url(url) not in target_urls_set]
+                urls_to_process = urls_to_scan(source_urls, keyword_url_pairs)
                 if not urls_to_process:
                     st.warning("All source URLs are also target URLs. Nothing to process.")
                     return
                 st.info(f"Processing {len(urls_to_process)} URLs...")
                 start_time = time.time()
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                processed = 0
-                results = []
-                with requests.Session() as session:
-                    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                        future_to_url = {
-                            executor.submit(process_single_url_for_all_keywords, url, keyword_url_pairs, session): url
-                            for url in urls_to_process
-                        }
-                        total_tasks = len(future_to_url)
-                        for future in concurrent.futures.as_completed(future_to_url):
-                            processed += 1
-                            progress_bar.progress(processed / total_tasks)
-                            status_text.text(f"Processed {processed}/{total_tasks} URLs...")
-                            result = future.result()
-                            if result:
-                                results.append(result)
-                progress_bar.empty()
-                status_text.empty()
+                run_search(urls_to_process, keyword_url_pairs, 'processed_results_manual', fetch_mode=fetch_mode,
+                           max_workers=max_workers, per_host_limit=per_host_limit, parse_workers=parse_workers,
+                           incremental=incremental, adaptive=adaptive, resume=resume)
                 duration = time.time() - start_time
                 st.info(f"Search completed in {duration:.2f} seconds")
-                st.session_state.processed_results_manual = results if results else []
                 st.session_state.processing_done_manual = True
             except Exception as e:
                 st.error(f"An error occurred: {str(e)}")
@@ -247,48 +228,8 @@ def manual_input_internal_linking():
             st.warning("Please provide all inputs and ensure valid data is available.")
             
     if st.session_state.processing_done_manual:
-        results = st.session_state.processed_results_manual
-        if results:
-            download_data = []
-            for result in results:
-                if result.get('unlinked_matches'):
-                    for match in result['unlinked_matches']:
-                        download_data.append({
-                            'source_url': result['url'],
-                            'keyword': match['keyword'],
-                            'target_url': match['target_url'],
-                            'context': match['context']
-                        })
-            num_opportunities = len(download_data)
-            matched_urls = len(set(item['source_url'] for item in download_data))
-            st.success(f"Found {num_opportunities} opportunities across {matched_urls} URLs")
-
-            # UPDATED DISPLAY LOGIC
-            with st.expander("View Opportunities", expanded=True):
-                grouped_data = defaultdict(list)
-                for item in download_data:
-                    grouped_data[item['source_url']].append(item)
-                for url, items in grouped_data.items():
-                    st.write("---")
-                    st.markdown(f"🔗 **Source URL:** [{url}]({url})")
-                    st.write("Unlinked Keyword Occurrences:")
-                    for match_info in items:
-                        st.markdown(f"- *{match_info['keyword']}* → [{match_info['target_url']}]({match_info['target_url']})")
-                        st.markdown(f"Context: *{match_info['context']}*")
-                        st.write("") # Adds a small space for readability
-            # END UPDATED BLOCK
-
-            if download_data:
-                csv = convert_df_to_csv(download_data)
-                st.download_button(
-                    label="Download Opportunities CSV",
-                    data=csv,
-                    file_name='unlinked_keyword_opportunities.csv',
-                    mime='text/csv',
-                    key='download_opportunities_csv_manual'
-                )
-        else:
-            st.info("No interlinking opportunities found.")
+        show_opportunities(st.session_state.processed_results_manual, 'download_opportunities_csv_manual')
+        show_run_metrics(st.session_state.processed_results_manual, 'download_run_report_manual')
 
 def file_upload_internal_linking():
     session_vars = ['uploaded_urls_file', 'search_results_file', 'completed_processing_file', 'keyword_target_pairs_file']
@@ -309,7 +250,7 @@ def file_upload_internal_linking():
         )
         if uploaded_urls_file:
             try:
-                df_urls = pd.read_csv(uploaded_urls_file) if uploaded_urls_file.name.endswith('.csv') else pd.read_excel(uploaded_urls_file)
+                df_urls = read_table(uploaded_urls_file, uploaded_urls_file.name)
                 df_urls.columns = df_urls.columns.str.strip().str.lower()
                 if 'source_url' not in df_urls.columns:
                     st.error("File must contain a 'source_url' column.")
@@ -327,7 +268,7 @@ def file_upload_internal_linking():
     )
     if keyword_url_file:
         try:
-            df_keywords = pd.read_csv(keyword_url_file) if keyword_url_file.name.endswith('.csv') else pd.read_excel(keyword_url_file)
+            df_keywords = read_table(keyword_url_file, keyword_url_file.name)
             df_keywords.columns = df_keywords.columns.str.strip().str.lower()
             if not {'keyword', 'target_url'}.issubset(df_keywords.columns):
                 st.error("File must contain both 'keyword' and 'target_url' columns.")
@@ -339,8 +280,8 @@ def file_upload_internal_linking():
     elif 'keyword_target_pairs_file' in st.session_state and st.session_state.keyword_target_pairs_file is not None:
         df_keywords = st.session_state.keyword_target_pairs_file
 
-    max_workers = st.slider("Concurrent searches", min_value=1, max_value=20, value=15,
-        help="Number of URLs to process simultaneously", key="slider_file")
+    fetch_mode, max_workers, per_host_limit, parse_workers, incremental, adaptive, resume = concurrency_controls(
+        "file", "slider_file")
 
     if st.button("Process URLs", key="process_files"):
         if df_urls is None or df_keywords is None:
@@ -348,85 +289,25 @@ def file_upload_internal_linking():
             return
         try:
             source_urls = df_urls['source_url'].dropna().astype(str).str.strip().unique()
-            df_keywords.dropna(subset=['keyword', 'target_url'], inplace=True)
-            keyword_url_pairs = list(df_keywords[['keyword', 'target_url']].itertuples(index=False, name=None))
-            target_urls_set = {standardize_url(u) for k, u in keyword_url_pairs}
-            urls_to_process = [standardize_url(url) for url in source_urls if standardize_url(url) not in target_urls_set]
+            keyword_url_pairs = keyword_pairs_from_frame(df_keywords)
+            urls_to_process = urls_to_scan(source_urls, keyword_url_pairs)
             if not urls_to_process:
                 st.warning("All provided source URLs are also target URLs. Nothing to process.")
                 return
             st.info(f"Processing {len(urls_to_process)} URLs against {len(keyword_url_pairs)} keyword pairs...")
             start_time = time.time()
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            processed = 0
-            results = []
-            with requests.Session() as session:
-                with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                    future_to_url = {
-                        executor.submit(process_single_url_for_all_keywords, url, keyword_url_pairs, session): url
-                        for url in urls_to_process
-                    }
-                    total_tasks = len(future_to_url)
-                    for future in concurrent.futures.as_completed(future_to_url):
-                        processed += 1
-                        progress_bar.progress(processed / total_tasks)
-                        status_text.text(f"Processed {processed}/{total_tasks} URLs...")
-                        result = future.result()
-                        if result:
-                            results.append(result)
-            progress_bar.empty()
-            status_text.empty()
+            run_search(urls_to_process, keyword_url_pairs, 'search_results_file', fetch_mode=fetch_mode,
+                       max_workers=max_workers, per_host_limit=per_host_limit, parse_workers=parse_workers,
+                       incremental=incremental, adaptive=adaptive, resume=resume)
             duration = time.time() - start_time
             st.info(f"Search completed in {duration:.2f} seconds")
-            st.session_state.search_results_file = results if results else []
             st.session_state.completed_processing_file = True
         except Exception as e:
             st.error(f"An error occurred: {e}")
 
     if st.session_state.completed_processing_file:
-        results = st.session_state.search_results_file
-        if results:
-            download_data = []
-            for result in results:
-                if result.get('unlinked_matches'):
-                    for match in result['unlinked_matches']:
-                        download_data.append({
-                            'source_url': result['url'],
-                            'keyword': match['keyword'],
-                            'target_url': match['target_url'],
-                            'context': match['context']
-                        })
-            num_opportunities = len(download_data)
-            matched_urls = len({item['source_url'] for item in download_data})
-            st.success(f"Found {num_opportunities} opportunities across {matched_urls} URLs")
-
-            if num_opportunities > 0:
-                # UPDATED DISPLAY LOGIC
-                with st.expander("View Opportunities", expanded=True):
-                    grouped_data = defaultdict(list)
-                    for item in download_data:
-                        grouped_data[item['source_url']].append(item)
-                    for url, items in grouped_data.items():
-                        st.write("---")
-                        st.markdown(f"🔗 **Source URL:** [{url}]({url})")
-                        st.write("Unlinked Keyword Occurrences:")
-                        for match_info in items:
-                            st.markdown(f"- *{match_info['keyword']}* → [{match_info['target_url']}]({match_info['target_url']})")
-                            st.markdown(f"Context: *{match_info['context']}*")
-                            st.write("") # Adds a small space for readability
-                # END UPDATED BLOCK
-                
-                csv = convert_df_to_csv(download_data)
-                st.download_button(
-                    label="Download Opportunities CSV",
-                    data=csv,
-                    file_name='unlinked_keyword_opportunities.csv',
-                    mime='text/csv',
-                    key='download_csv_file'
-                )
-        else:
-            st.info("No interlinking opportunities found.")
+        show_opportunities(st.session_state.search_results_file, 'download_csv_file')
+        show_run_metrics(st.session_state.search_results_file, 'download_run_report_file')
 
 def internal_linking_opportunities_finder():
     st.set_page_config(page_title="Internal Linking Finder", layout="wide")
@@ -0,0 +1,64 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+import requests.compat
+from modules.utils import clean_text, standardize_url
+
+BOILERPLATE_TAGS = ['script', 'style', 'nav', 'header', 'footer', 'meta', 'link',
+                    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'strong', 'a']
+BOILERPLATE_CLASSES = [
+    "position-relative mt-5 related-blog-post__swiper-container", "nav-red", "nav-label",
+    "row left-zero__without-shape position-relative z-1 mt-4 mt-md-5 px-0", "footer pt-lg-9 pb-lg-10 pb-8 pt-7",
+    "related-blog-post related-blog-post--bottom-pattern position-relative overflow-hidden z-1 ps-3 px-sm-0 py-5 py-lg-7 bg-cool",
+    "section-content", "row banner ",
+    "contact-form position-relative generic-form gravity-form py-6 dark__form",
+]
+
+@dataclass
+class PageModel:
+    """Everything keyword matching needs from a page, without the parse tree.
+
+    `anchors` holds (standardized_href, cleaned_text) for every linked anchor
+    with text, taken before boilerplate removal. `paragraphs` holds
+    (original_text, cleaned_text) for every non-empty <p> left after
+    boilerplate removal, in document order.
+    """
+    url: str
+    anchors: list = field(default_factory=list)
+    paragraphs: list = field(default_factory=list)
+
+    def anchor_index(self):
+        """Map each standardized href on the page to the cleaned texts of its anchors."""
+        index = defaultdict(set)
+        for standardized_href, link_text in self.anchors:
+            index[standardized_href].add(link_text)
+        return index
+
+def extract_anchors(soup, source_url):
+    anchors = []
+    for a_tag in soup.find_all('a', href=True):
+        link_text = a_tag.get_text(strip=True)
+        if not link_text:
+            continue
+        href = a_tag.get('href', '')
+        try:
+            absolute_href = requests.compat.urljoin(source_url, href)
+            standardized_href = standardize_url(absolute_href)
+        except ValueError:
+            continue
+        anchors.append((standardized_href, clean_text(link_text)))
+    return anchors
+
+def remove_boilerplate(soup):
+    for element in soup.find_all(BOILERPLATE_TAGS):
+        element.decompose()
+    for element in soup.find_all(class_=BOILERPLATE_CLASSES):
+        element.decompose()
+    return soup
+
+def extract_paragraphs(soup):
+    paragraphs = []
+    for p_tag in soup.find_all('p'):
+        original_paragraph_text = p_tag.get_text(strip=True)
+        if original_paragraph_text:
+            paragraphs.append((original_paragraph_text, clean_text(original_paragraph_text)))
+    return paragraphs
@@ -0,0 +1,66 @@
+"""Silo analysis PDF reports, rendered off the Streamlit script thread.
+
+Reports are rendered by at most PDF_RENDER_WORKERS wkhtmltopdf runs at a
+time; requests beyond that wait their turn. Each report is kept under a
+hash of the analysis it shows (pages, matrix, links and theme), so asking
+again for an unchanged analysis returns the same render, finished or
+still running. The last PDF_CACHE_SIZE reports are kept; a render that
+failed is replaced by the next request for it.
+"""
+import concurrent.futures
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+import pandas as pd
+from modules.silos import generate_pdf_report, render_report_html, style_matrix
+
+PDF_RENDER_WORKERS = 2
+PDF_CACHE_SIZE = 32
+
+def analysis_key(data, matrix_df, all_links, url_to_type, theme=None):
+    """Return a hex digest identifying the report of this analysis with this `theme`."""
+    digest = hashlib.sha256()
+    for frame in (data, matrix_df):
+        digest.update(json.dumps([list(map(str, frame.columns)), list(map(str, frame.index))]).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    digest.update(json.dumps([all_links, url_to_type, theme or {}], ensure_ascii=False, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+def build_pdf_report(data, matrix_df, all_links, url_to_type, theme=None):
+    """Style the matrix, render the report HTML and convert it to PDF bytes."""
+    # Hover tooltips never show in a PDF, so the matrix is styled without them.
+    matrix_html = style_matrix(matrix_df, **(theme or {})).to_html()
+    return generate_pdf_report(render_report_html(data, matrix_html, all_links, url_to_type))
+
+class PdfReports:
+    """Background PDF renders, cached by analysis key."""
+    def __init__(self, max_workers=PDF_RENDER_WORKERS, cache_size=PDF_CACHE_SIZE):
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                               thread_name_prefix='pdf-report')
+        self._cache_size = cache_size
+        self._reports = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the Future of the latest render for `key`, or None if none is kept."""
+        with self._lock:
+            if key in self._reports:
+                self._reports.move_to_end(key)
+            return self._reports.get(key)
+
+    def submit(self, key, *args, **kwargs):
+        """Start rendering build_pdf_report(*args, **kwargs) for `key` unless a render is cached or running."""
+        with self._lock:
+            future = self._reports.get(key)
+            if future is not None and not (future.done() and future.exception() is not None):
+                self._reports.move_to_end(key)
+                return future
+            future = self._executor.submit(build_pdf_report, *args, **kwargs)
+            self._reports[key] = future
+            self._reports.move_to_end(key)
+            while len(self._reports) > self._cache_size:
+                self._reports.popitem(last=False)
+            return future
+
+pdf_reports = PdfReports()
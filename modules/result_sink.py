@@ -0,0 +1,75 @@
+"""On-disk sinks for opportunity results.
+
+Results are written one row per unlinked match as pages finish, so a run
+never holds more than one page's matches in memory. CSV and JSON Lines
+are supported and chosen by file extension; both are read back row by row.
+"""
+import csv
+import json
+import os
+import tempfile
+from itertools import groupby
+
+FIELDNAMES = ['source_url', 'keyword', 'target_url', 'context']
+
+class ResultSink:
+    """Append per-page results to a CSV (.csv) or JSON Lines (.jsonl) file."""
+    def __init__(self, path):
+        self.path = path
+        self.format = 'jsonl' if path.endswith('.jsonl') else 'csv'
+        self.num_opportunities = 0
+        self.matched_urls = 0
+        self._file = open(path, 'w', encoding='utf-8', newline='')
+        if self.format == 'csv':
+            self._writer = csv.DictWriter(self._file, fieldnames=FIELDNAMES, lineterminator='\n')
+            self._writer.writeheader()
+
+    def write(self, result):
+        rows = [
+            {'source_url': result['url'], 'keyword': match['keyword'],
+             'target_url': match['target_url'], 'context': match['context']}
+            for match in result.get('unlinked_matches') or []
+        ]
+        if not rows:
+            return
+        if self.format == 'csv':
+            self._writer.writerows(rows)
+        else:
+            self._file.writelines(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+        self._file.flush()
+        self.num_opportunities += len(rows)
+        self.matched_urls += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def temporary_sink(suffix='.csv'):
+    """Create a ResultSink on a new file in the temp directory."""
+    fd, path = tempfile.mkstemp(prefix='link_opportunities_', suffix=suffix)
+    os.close(fd)
+    return ResultSink(path)
+
+def iter_rows(path):
+    """Yield the rows of a sink file as dicts, in the order they were written."""
+    with open(path, encoding='utf-8', newline='') as f:
+        if path.endswith('.jsonl'):
+            for line in f:
+                yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+def iter_grouped(path):
+    """Yield (source_url, rows) for each page in a sink file."""
+    # A page's matches are always written together.
+    for source_url, rows in groupby(iter_rows(path), key=lambda row: row['source_url']):
+        yield source_url, list(rows)
+
+def remove_sink_file(path):
+    if path and os.path.exists(path):
+        os.remove(path)
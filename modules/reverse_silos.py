@@ -1,13 +1,11 @@
-import requests
-from bs4 import BeautifulSoup
+import io
 import pandas as pd
 import streamlit as st
-from urllib.parse import urljoin, urlparse
-import numpy as np
-import pdfkit
-import tempfile
-import platform
-import os
+from modules.link_graph import authority_scores, crawl_link_graph, silo_checks
+from modules.pdf_reports import analysis_key, pdf_reports
+from modules.silos import (MATRIX_PAGE_SIZE, analyze_silo, is_valid_url, link_index, render_matrix_html,
+                           validate_silo_data)
+from modules.utils import read_table
 
 default_keys = {
     "manual_homepage_url": "",
@@ -18,15 +16,16 @@ default_keys = {
     "manual_all_links": {},
     "manual_url_to_type": {},
     "manual_matrix_df": None,
-    "manual_tooltip_df": None,
-    "manual_styled_matrix_html": "",
     "file_data": None,
     "file_all_links": {},
     "file_url_to_type": {},
     "file_matrix_df": None,
-    "file_tooltip_df": None,
-    "file_styled_matrix_html": "",
-    "uploaded_file": None
+    "uploaded_file": None,
+    "graph_checks_df": None,
+    "graph_authority_df": None,
+    "graph_edges_csv": b"",
+    "graph_summary": "",
+    "graph_errors": []
 }
 
 for key, default_value in default_keys.items():
@@ -53,254 +52,58 @@ def inject_custom_css():
         unsafe_allow_html=True
     )
 
-def generate_pdf_report(html_content):
-    current_os = platform.system() 
-    if current_os == "Windows":
-        config = pdfkit.configuration(wkhtmltopdf=r"C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe")
-    else:
-        config = pdfkit.configuration(wkhtmltopdf="/usr/bin/wkhtmltopdf")
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmpfile:
-        pdfkit.from_string(html_content, tmpfile.name, configuration=config)
-        tmpfile.seek(0)
-        pdf_bytes = tmpfile.read()
-
-    os.remove(tmpfile.name)
-    return pdf_bytes
+PDF_POLL_SECONDS = 1
 
-def create_detailed_report_html(source="manual"):
+def report_inputs(source="manual"):
+    """Return the build_pdf_report arguments for the analysis of `source`."""
     if source == "manual":
         data = st.session_state.get("manual_data")
-        matrix_html = st.session_state.get("manual_styled_matrix_html", "")
+        matrix_df = st.session_state.get("manual_matrix_df")
         all_links = st.session_state.get("manual_all_links", {})
         url_to_type = st.session_state.get("manual_url_to_type", {})
     else:
         data = st.session_state.get("file_data")
-        matrix_html = st.session_state.get("file_styled_matrix_html", "")
+        matrix_df = st.session_state.get("file_matrix_df")
         all_links = st.session_state.get("file_all_links", {})
         url_to_type = st.session_state.get("file_url_to_type", {})
+    theme = {
+        'primary_color': st.get_option("theme.primaryColor"),
+        'secondary_background_color': st.get_option("theme.secondaryBackgroundColor"),
+        'text_color': st.get_option("theme.textColor")
+    }
+    return data, matrix_df, all_links, url_to_type, theme
+
+def show_pdf_report(future, polling):
+    if not future.done():
+        st.info("Generating the PDF report...")
+        return
+    if polling:
+        # Rerun the whole page once so this fragment stops polling.
+        st.rerun()
+    if future.exception() is not None:
+        st.error(f"Could not generate the PDF report: {future.exception()}")
+        return
+    st.download_button(
+        label="Download PDF Report",
+        data=future.result(),
+        file_name="internal_link_analysis.pdf",
+        mime="application/pdf"
+    )
 
-    homepage_url = data[data['type'] == 'Homepage']['url'].values[0]
-    target_url = data[data['type'] == 'Target Page']['url'].values[0]
-    homepage_section = ""
-    homepage_links_df = pd.DataFrame(all_links.get('Homepage', []))
-    if not homepage_links_df.empty:
-        ht = homepage_links_df[homepage_links_df['url'] == target_url]
-        if not ht.empty:
-            homepage_section += "<p class='success'>✓ Homepage links to Target Page</p>"
-        else:
-            homepage_section += "<p class='error'>✗ Homepage does not link to Target Page</p>"
-    else:
-        homepage_section += "<p>No internal links found on the Homepage.</p>"
-
-    target_section = ""
-    target_links_df = pd.DataFrame(all_links.get('Target Page', []))
-    if not target_links_df.empty:
-        th = target_links_df[target_links_df['url'] == homepage_url]
-        if not th.empty:
-            target_section += "<p class='success'>✓ Target Page links to Homepage</p>"
-        else:
-            target_section += "<p class='error'>✗ Target Page does not link to Homepage</p>"
-    else:
-        target_section += "<p>No internal links found on the Target Page.</p>"
-
-    blog_section = ""
-    blog_types = [typ for typ in data['type'] if typ.startswith('Blog')]
-    for blog_type in blog_types:
-        blog_section += f"<h3>{blog_type} Analysis</h3>"
-        blog_links_df = pd.DataFrame(all_links.get(blog_type, []))
-        if blog_links_df.empty:
-            blog_section += "<p class='warning'>No internal links found in this blog.</p>"
-            continue
-        blog_links_df['linked_type'] = blog_links_df['url'].map(url_to_type)
-
-        target_links = blog_links_df[blog_links_df['url'] == target_url]
-        if not target_links.empty:
-            blog_section += "<p class='success'>✓ Links to Target Page:</p>"
-            blog_section += target_links[['text', 'url']].to_html(index=False, border=1)
-        else:
-            blog_section += "<p class='error'>✗ Does not link to Target Page</p>"
-
-        other_blogs = [b for b in blog_types if b != blog_type]
-        other_blog_links = blog_links_df[blog_links_df['linked_type'].isin(other_blogs)]
-        if not other_blog_links.empty:
-            blog_section += "<p>Links to Other Blogs:</p>"
-            blog_section += other_blog_links[['text', 'url', 'linked_type']].to_html(index=False, border=1)
-
-        missing_blogs = [
-            b for b in other_blogs   
-            if data[data['type'] == b]['url'].values[0] not in other_blog_links['url'].tolist()
-        ]
-        if missing_blogs:
-            blog_section += f"<p class='error'>Missing links to: {', '.join(missing_blogs)}</p>"
-
-    full_html = f"""
-    <html>
-    <head>
-        <meta charset="utf-8">
-        <title>Internal Link Analysis Report</title>
-        <style>
-        body {{
-            font-family: "Helvetica Neue", Arial, sans-serif;
-            margin: 30px;
-            line-height: 1.6;
-            color: #333;
-        }}
-        
-        h1, h2, h3, h4 {{
-            color: black;
-            font-weight: bold;
-            margin-top: 1.2em;
-            margin-bottom: 0.8em;
-        }}
-        
-        .subtitle {{
-            font-size: 16px;
-            color: #555;
-            margin-bottom: 2em;
-        }}
-            
-        table {{
-            border-collapse: collapse;
-            margin-bottom: 1em;
-        }}
-        
-        table, th, td {{
-            border: 1px solid #999;
-            border: 2px solid black !important;
-        }}
-            
-        th, td {{
-            padding: 8px 12px;
-            text-align: center;
-            font-size: 14px;
-        }}
-            
-        .success {{
-            color: green;
-            font-weight: bold;
-        }}
-            
-        .error {{
-            color: #B71C1C;
-            font-weight: bold;
-        }}
-            
-        .warning {{
-            color: orange;
-            font-weight: bold;
-        }}
-            
-        .matrix-container {{
-            margin-bottom: 2em;
-        }}
-            
-        .analysis-container {{
-            margin-bottom: 2em;
-        }}
-            
-        .section-divider {{
-            margin: 2em 0;
-            border: 0;
-            border-top: 2px solid #ccc;
-        }}
-        </style>
-    </head>
-    <body>
-        <h1 style="text-align:center;">Internal Link Analysis Report</h1>
-        <p class="subtitle">
-        This report contains your complete interlinking matrix and detailed analysis 
-        of Homepage, Target Page, and Blog links.
-        </p>
-        
-        <div class="matrix-container">
-        <h2>Complete Interlinking Matrix</h2>
-        {matrix_html}
-        </div>
-        <hr class="section-divider" />
-
-        <div class="analysis-container">
-        <h2>Homepage Links Analysis</h2>
-        {homepage_section}
-        </div>
-        <hr class="section-divider" />
-
-        <div class="analysis-container">
-        <h2>Target Page Links Analysis</h2>
-        {target_section}
-        </div>
-        <hr class="section-divider" />
-
-        <div class="analysis-container">
-        <h2>Blog Interlinking Analysis</h2>
-        {blog_section}
-        </div>
-        <hr class="section-divider" />
-    </body>
-    </html>
-    """
-    return full_html
-
-def is_valid_url(url):
-    try:
-        result = urlparse(url)
-        return all([result.scheme, result.netloc])
-    except Exception:
-        return False
-
-def get_main_content_anchor_tags(url, page_type):
-    """Scrape main content area and extract internal anchor tags."""
-    try:
-        headers = {
-            'User-Agent': ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36"
-            )
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        for element in soup.find_all([
-            'script', 'style', 'nav', 'header', 'footer', 
-            'meta', 'link', 'sidebar', 'aside', '.nav', 
-            '.header', '.footer', '.sidebar', '.menu',
-            '[role="navigation"]', '[role="banner"]', 
-            '[role="contentinfo"]'
-        ]):
-            element.decompose()
-        
-        for element in soup.find_all(attrs={"class": ["d-none d-sm-flex align-items-center"]}):
-            element.decompose()
-
-        main_content = None
-        content_selectors = [
-            'main', 'article', '#content', '.content', 
-            '#main', '.main', '[role="main"]'
-        ]
-        for selector in content_selectors:
-            main_content = soup.select_one(selector)
-            if main_content:
-                break
-        if not main_content:
-            main_content = soup.body
-        
-        links = []
-        if main_content:
-            for link in main_content.find_all('a', href=True):
-                href = link.get('href')
-                text = ' '.join(link.get_text().strip().split())
-                if not text or text.isspace():
-                    continue
-                absolute_url = urljoin(url, href)
-                # Keep only internal links
-                if urlparse(absolute_url).netloc == urlparse(url).netloc:
-                    links.append({
-                        'text': text,
-                        'url': absolute_url
-                    })
-        return links
-    except Exception as e:
-        st.error(f"Error scraping {url}: {str(e)}")
-        return []
+def pdf_report_section(source="manual"):
+    """Render the PDF in the background and offer it for download once ready, without blocking the page."""
+    inputs = report_inputs(source)
+    key = analysis_key(*inputs)
+    future = pdf_reports.get(key)
+    failed = future is not None and future.done() and future.exception() is not None
+    if future is None or failed:
+        if failed:
+            st.error(f"Could not generate the PDF report: {future.exception()}")
+        if not st.button("Generate PDF Report", key=f"generate_pdf_{source}"):
+            return
+        future = pdf_reports.submit(key, *inputs)
+    polling = not future.done()
+    st.fragment(show_pdf_report, run_every=PDF_POLL_SECONDS if polling else None)(future, polling)
 
 def run_analysis(data, source="manual"):
     if source == "manual":
@@ -313,114 +116,13 @@ def run_analysis(data, source="manual"):
     progress_bar = st.progress(0)
     status_text = st.empty()
     
-    all_links = {}
-    url_to_type = dict(zip(data['url'], data['type']))
-    for idx, row in data.iterrows():
-        status_text.text(f"Analyzing {row['type']}...")
-        progress_bar.progress((idx + 1) / len(data))
-        page_links = get_main_content_anchor_tags(row['url'], row['type'])
-        all_links[row['type']] = page_links
-    
-    matrix_data = np.zeros((len(data), len(data)))
-    for i, source_row in data.iterrows():
-        source_links = all_links[source_row['type']]
-        for j, target_row in data.iterrows():
-            if i != j:
-                if any(link['url'] == target_row['url'] for link in source_links):
-                    matrix_data[i][j] = 1
-    
-    matrix_df = pd.DataFrame(
-        matrix_data,
-        columns=data['type'],
-        index=data['type']
-    ).rename_axis(None, axis=1).rename_axis(None, axis=0)
-    np.fill_diagonal(matrix_df.values, np.nan)
-
-    blog_types = [typ for typ in matrix_df.columns if typ.startswith('Blog')]
-    if blog_types:
-        matrix_df.loc['Homepage', blog_types] = np.nan
-        matrix_df.loc[blog_types, 'Homepage'] = np.nan
-
-    if len(blog_types) > 1:
-        for btype in blog_types[1:]:
-            matrix_df.loc['Target Page', btype] = np.nan
+    def show_progress(done, total, page_type):
+        status_text.text(f"Analyzed {page_type} ({done}/{total})")
+        progress_bar.progress(done / total)
 
-    tooltip_data = []
-    for i, source_type in enumerate(matrix_df.index):
-        tooltip_row = []
-        for j, target_type in enumerate(matrix_df.columns):
-            if i == j:
-                tooltip_row.append('')
-            else:
-                target_url = data[data['type'] == target_type]['url'].values[0]
-                source_links = all_links.get(source_type, [])
-                matching_links = [link for link in source_links if link['url'] == target_url]
-                tooltip_content = []
-                for link in matching_links:
-                    tooltip_content.append(f"Text: {link['text']}<br>URL: {link['url']}")
-                tooltip_row.append("<br>".join(tooltip_content))
-        tooltip_data.append(tooltip_row)
-    tooltip_df = pd.DataFrame(tooltip_data, index=matrix_df.index, columns=matrix_df.columns)
-    
-    # Style for the matrix (this styling is used to generate the HTML for both PDF and Streamlit)
-    tooltip_style = [
-        ('visibility', 'hidden'),
-        ('position', 'absolute'),
-        ('z-index', '100'),
-        ('background-color', st.get_option("theme.secondaryBackgroundColor")),
-        ('color', st.get_option("theme.textColor")),
-        ('border', f'2px solid {st.get_option("theme.primaryColor")}'),
-        ('padding', '10px'),
-        ('font-family', 'system-ui, -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif'),
-        ('font-size', '13px'),
-        ('box-shadow', '3px 3px 8px rgba(0, 0, 0, 0.5)'),
-        ('border-radius', '5px')
-    ]
-    
-    def color_cells(val):
-        if pd.isna(val):
-            return 'background-color: white; color: black'
-        elif val == 1:
-            return 'background-color: #C8E6C9; color: black'
-        else:
-            return 'background-color: #FA615A; color: white'
-
-    font_family = ('system-ui, -apple-system, BlinkMacSystemFont, "Segoe UI",'
-                   'Roboto, "Helvetica Neue", Arial, sans-serif')
-    
-    styled_matrix = (matrix_df
-        .style
-        .set_tooltips(tooltip_df, props=tooltip_style)
-        .format(na_rep="NA", precision=0)
-        .set_properties(**{
-            'text-align': 'center',
-            'min-width': '150px',
-            'font-weight': 'bold',
-            'background-color': 'white', 
-            'color': 'black', 
-            'border': f'1px solid {st.get_option("theme.primaryColor")}',
-            'font-family': font_family,
-            'font-size': '14px'
-        })
-        .applymap(color_cells)
-        .set_table_styles([{
-            'selector': 'th, td',
-            'props': [
-                ('border', f'1px solid {st.get_option("theme.primaryColor")}'),
-                ('padding', '8px 12px'),
-                ('font-family', font_family),
-                ('font-size', '14px')
-            ]}, 
-            {
-            'selector': 'th',
-            'props': [
-                ('background-color', 'white'), 
-                ('color','black !important'),
-                ('font-weight', 'bold'),
-                ('font-family', font_family),
-                ('font-size', '13px')
-            ]}])
-    )
+    analysis = analyze_silo(data, on_progress=show_progress, on_error=st.error)
+    all_links, url_to_type = analysis.all_links, analysis.url_to_type
+    matrix_df = analysis.matrix_df
     
     # Clear progress display
     progress_bar.empty()
@@ -431,14 +133,49 @@ def run_analysis(data, source="manual"):
         st.session_state["manual_all_links"] = all_links
         st.session_state["manual_url_to_type"] = url_to_type
         st.session_state["manual_matrix_df"] = matrix_df
-        st.session_state["manual_tooltip_df"] = tooltip_df
-        st.session_state["manual_styled_matrix_html"] = styled_matrix.to_html()
     else:
         st.session_state["file_all_links"] = all_links
         st.session_state["file_url_to_type"] = url_to_type
         st.session_state["file_matrix_df"] = matrix_df
-        st.session_state["file_tooltip_df"] = tooltip_df
-        st.session_state["file_styled_matrix_html"] = styled_matrix.to_html()
+
+def show_matrix(data, matrix_df, all_links, source="manual"):
+    """Show the matrix a page at a time, with the links behind a chosen cell on demand."""
+    size = len(matrix_df)
+    row_start = column_start = 0
+    if size > MATRIX_PAGE_SIZE:
+        pages = (size + MATRIX_PAGE_SIZE - 1) // MATRIX_PAGE_SIZE
+        col1, col2 = st.columns(2)
+        with col1:
+            row_page = st.number_input(f"Rows page (of {pages})", min_value=1, max_value=pages, value=1,
+                                       key=f"matrix_row_page_{source}")
+        with col2:
+            column_page = st.number_input(f"Columns page (of {pages})", min_value=1, max_value=pages, value=1,
+                                          key=f"matrix_column_page_{source}")
+        row_start, column_start = (int(row_page) - 1) * MATRIX_PAGE_SIZE, (int(column_page) - 1) * MATRIX_PAGE_SIZE
+    st.markdown(
+        render_matrix_html(
+            matrix_df,
+            rows=slice(row_start, row_start + MATRIX_PAGE_SIZE),
+            columns=slice(column_start, column_start + MATRIX_PAGE_SIZE),
+            primary_color=st.get_option("theme.primaryColor")
+        ),
+        unsafe_allow_html=True
+    )
+
+    with st.expander("Link details", expanded=False):
+        col1, col2 = st.columns(2)
+        with col1:
+            source_type = st.selectbox("Links from", data['type'], key=f"matrix_source_{source}")
+        with col2:
+            target_type = st.selectbox("Links to", data['type'], key=f"matrix_target_{source}")
+        target_url = data[data['type'] == target_type]['url'].values[0]
+        texts = link_index(all_links.get(source_type, [])).get(target_url, [])
+        if source_type == target_type:
+            st.write("Not applicable (self-link).")
+        elif texts:
+            st.dataframe(pd.DataFrame({'text': texts, 'url': target_url}))
+        else:
+            st.write(f"{source_type} does not link to {target_type}.")
 
 def display_analysis_results(source="manual"):
     inject_custom_css()
@@ -452,7 +189,6 @@ def display_analysis_results(source="manual"):
         all_links = st.session_state["manual_all_links"]
         url_to_type = st.session_state["manual_url_to_type"]
         matrix_df = st.session_state["manual_matrix_df"]
-        styled_matrix_html = st.session_state["manual_styled_matrix_html"]
     else:
         if (st.session_state.get("file_data") is None or
             st.session_state.get("file_matrix_df") is None):
@@ -462,13 +198,12 @@ def display_analysis_results(source="manual"):
         all_links = st.session_state["file_all_links"]
         url_to_type = st.session_state["file_url_to_type"]
         matrix_df = st.session_state["file_matrix_df"]
-        styled_matrix_html = st.session_state["file_styled_matrix_html"]
 
     # Full Matrix
     st.divider()
     st.subheader("Complete Interlinking Matrix")
     st.write("In the below matrix 1 indicates a link exists, 0 indicates no link, and NA indicates not applicable (self-link).")
-    st.markdown(styled_matrix_html, unsafe_allow_html=True)
+    show_matrix(data, matrix_df, all_links, source)
     
     st.divider()
     if ('Homepage' in data['type'].values and 'Target Page' in data['type'].values
@@ -591,15 +326,7 @@ def display_analysis_results(source="manual"):
                     st.error(f"Missing links to: {', '.join(missing_blogs)}")
                     
     st.divider()
-    if st.button("Generate PDF Report", key=f"generate_pdf_{source}"):
-        report_html = create_detailed_report_html(source=source)
-        pdf_bytes = generate_pdf_report(report_html)
-        st.download_button(
-            label="Download PDF Report",
-            data=pdf_bytes,
-            file_name="internal_link_analysis.pdf",
-            mime="application/pdf"
-        )
+    pdf_report_section(source)
 
 def manual_input_tab():
     col1, col2 = st.columns(2)
@@ -669,26 +396,11 @@ def file_upload_tab():
     if uploaded_file is not None:
         st.session_state["uploaded_file"] = uploaded_file
         try:
-            if uploaded_file.name.endswith('.csv'):
-                data = pd.read_csv(uploaded_file)
-            else:
-                data = pd.read_excel(uploaded_file)
-            
-            if 'type' not in data.columns or 'url' not in data.columns:
-                st.error("Uploaded file must contain 'type' and 'url' columns.")
-                return
-            
-            homepage_count = (data['type'] == 'Homepage').sum()
-            target_page_count = (data['type'] == 'Target Page').sum()
-            if homepage_count != 1:
-                st.error("Uploaded file must contain exactly one 'Homepage' entry.")
-                return
-            if target_page_count != 1:
-                st.error("Uploaded file must contain exactly one 'Target Page' entry.")
-                return
+            data = read_table(uploaded_file, uploaded_file.name)
             
-            if not data['url'].apply(is_valid_url).all():
-                st.error("Some URLs in the uploaded file are invalid.")
+            error = validate_silo_data(data)
+            if error:
+                st.error(error)
                 return
             
             if st.button("Start Analysis for the Uploaded File"):
@@ -698,6 +410,83 @@ def file_upload_tab():
         except Exception as e:
             st.error(f"Error reading file: {e}")
 
+def site_graph_tab():
+    st.subheader("Site-wide Link Graph")
+    st.info(
+        """Crawl every page in a list and check how each one links within its silo.
+        - Must be an Excel or CSV file with a 'url' column
+        - Optional 'silo' column to group pages, and 'type' column marking each silo's 'Target Page' and the 'Homepage'
+        """
+    )
+    uploaded_file = st.file_uploader("Upload the pages to crawl", type=['xlsx', 'csv'], key="graph_file")
+    if uploaded_file is not None:
+        try:
+            pages = read_table(uploaded_file, uploaded_file.name)
+        except Exception as e:
+            st.error(f"Error reading file: {e}")
+            return
+        pages.columns = pages.columns.str.strip().str.lower()
+        if 'url' not in pages.columns:
+            st.error("The file must contain a 'url' column")
+            return
+        pages = pages.dropna(subset=['url'])
+        if pages.empty:
+            st.error("The file does not list any URLs")
+            return
+
+        if st.button("Crawl Link Graph"):
+            progress_bar = st.progress(0)
+            status_text = st.empty()
+
+            def show_progress(done, total):
+                status_text.text(f"Crawled {done}/{total} pages")
+                progress_bar.progress(done / total)
+
+            # One box per failed page would flood the page on large crawls; they are listed below instead.
+            errors = []
+            graph = crawl_link_graph(pages, on_progress=show_progress, on_error=errors.append)
+            progress_bar.empty()
+            status_text.empty()
+            edges = io.StringIO()
+            graph.write_edge_list(edges)
+            st.session_state["graph_edges_csv"] = edges.getvalue().encode('utf-8')
+            st.session_state["graph_checks_df"] = silo_checks(graph)
+            st.session_state["graph_authority_df"] = authority_scores(graph)
+            st.session_state["graph_summary"] = f"{graph.num_links} links between {graph.num_pages} pages"
+            st.session_state["graph_errors"] = errors
+
+    checks_df = st.session_state.get("graph_checks_df")
+    if checks_df is not None:
+        st.success(st.session_state["graph_summary"])
+        errors = st.session_state["graph_errors"]
+        if errors:
+            st.warning(f"{len(errors)} pages could not be fetched; their links are missing from the graph.")
+            with st.expander("Pages that could not be fetched"):
+                st.dataframe(pd.DataFrame({'error': errors}), use_container_width=True)
+                st.download_button("Download Errors", "\n".join(errors).encode('utf-8'),
+                                   file_name="crawl_errors.txt", mime="text/plain")
+        authority_df = st.session_state["graph_authority_df"]
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Orphan pages", int(authority_df['orphan'].sum()))
+        col2.metric("Unreachable from the homepage", int(authority_df['click_depth'].isna().sum()))
+        deepest = authority_df['click_depth'].max()
+        col3.metric("Deepest page (clicks)", int(deepest) if pd.notna(deepest) else "-")
+
+        st.write("Internal authority:")
+        st.dataframe(authority_df.sort_values('pagerank_rank'), use_container_width=True)
+        st.write("Silo checks:")
+        st.dataframe(checks_df, use_container_width=True)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.download_button("Download Authority Scores", authority_df.to_csv(index=False).encode('utf-8'),
+                               file_name="authority.csv", mime="text/csv")
+        with col2:
+            st.download_button("Download Silo Checks", checks_df.to_csv(index=False).encode('utf-8'),
+                               file_name="silo_checks.csv", mime="text/csv")
+        with col3:
+            st.download_button("Download Edge List", st.session_state["graph_edges_csv"],
+                               file_name="edges.csv", mime="text/csv")
+
 def analyze_internal_links():
     st.header("Smart Internal Linking Analysis", divider='rainbow')
     
@@ -741,7 +530,7 @@ def analyze_internal_links():
         with col2:
             st.image(r"reverse_silos1.png", caption="Reverse Content Silos Analysis", width=600)
     
-    tab1, tab2 = st.tabs(["User Input", "File Upload"])
+    tab1, tab2, tab3 = st.tabs(["User Input", "File Upload", "Site Graph"])
     
     with tab1:
         manual_input_tab()
@@ -752,3 +541,6 @@ def analyze_internal_links():
         file_upload_tab()
         if st.session_state.get("file_data") is not None:
             display_analysis_results(source="file")
+
+    with tab3:
+        site_graph_tab()
@@ -0,0 +1,149 @@
+"""Persistent per-page keyword results for incremental re-scans.
+
+A page is identified by its URL and the hash of its content. For every
+page the store remembers which keyword-URL pairs were evaluated against
+that content and which of them produced an opportunity. Evaluated pairs
+are kept as fingerprint sets, stored once per distinct keyword sheet and
+shared by all pages, so only hits take one row each. Only the latest scan
+of each page is kept, and sets no page refers to any more are dropped when
+a new one is registered, so re-running with new keywords does not grow
+the store.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from modules.http_cache import DEFAULT_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Bump when matching rules change so earlier results are not reused.
+SCAN_VERSION = 1
+FINGERPRINT_SIZE = 8
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprint_sets (
+    set_id TEXT PRIMARY KEY,
+    fingerprints BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS page_scans (
+    url TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    set_id TEXT NOT NULL,
+    PRIMARY KEY (url, content_hash, set_id)
+);
+CREATE INDEX IF NOT EXISTS page_scans_set_id ON page_scans (set_id);
+CREATE TABLE IF NOT EXISTS page_hits (
+    url TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    fingerprint BLOB NOT NULL,
+    context TEXT NOT NULL,
+    PRIMARY KEY (url, content_hash, fingerprint)
+);
+"""
+
+def pair_fingerprint(keyword, target_url):
+    key = f"{SCAN_VERSION}\x00{keyword.strip()}\x00{target_url}".encode('utf-8')
+    return hashlib.sha1(key).digest()[:FINGERPRINT_SIZE]
+
+def page_content_hash(content, encoding=None):
+    digest = hashlib.sha256((encoding or '').encode('ascii', 'replace') + b'\x00')
+    digest.update(content)
+    return digest.hexdigest()
+
+class ScanStore:
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'scans.sqlite3')
+        self._lock = threading.Lock()
+        self._sets = {}
+        self._blobs = {}
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        # Parser processes open the store concurrently; only the first one
+        # needs the write lock that switching journal mode and creating the
+        # schema take.
+        if self._conn.execute('PRAGMA journal_mode').fetchone()[0] != 'wal':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        if self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'page_scans_set_id'").fetchone() is None:
+            self._conn.executescript(_SCHEMA)
+
+    def register_fingerprints(self, fingerprints):
+        """Store a set of pair fingerprints once and return its id."""
+        blob = b''.join(sorted(set(fingerprints)))
+        set_id = hashlib.sha1(blob).hexdigest()
+        with self._lock:
+            self._conn.execute("DELETE FROM fingerprint_sets WHERE set_id NOT IN (SELECT set_id FROM page_scans)")
+            self._conn.execute("INSERT OR IGNORE INTO fingerprint_sets (set_id, fingerprints) VALUES (?, ?)",
+                               (set_id, blob))
+            self._blobs[set_id] = blob
+            self._sets[set_id] = frozenset(blob[i:i + FINGERPRINT_SIZE] for i in range(0, len(blob), FINGERPRINT_SIZE))
+        return set_id
+
+    def _fingerprint_set(self, set_id):
+        if set_id not in self._sets:
+            row = self._conn.execute("SELECT fingerprints FROM fingerprint_sets WHERE set_id = ?", (set_id,)).fetchone()
+            blob = row[0] if row else b''
+            self._sets[set_id] = frozenset(blob[i:i + FINGERPRINT_SIZE] for i in range(0, len(blob), FINGERPRINT_SIZE))
+        return self._sets[set_id]
+
+    def lookup(self, url, content_hash):
+        """Return (evaluated fingerprints, {fingerprint: context}) for a page's content."""
+        with self._lock:
+            set_ids = [row[0] for row in self._conn.execute(
+                "SELECT set_id FROM page_scans WHERE url = ? AND content_hash = ?", (url, content_hash))]
+            if not set_ids:
+                return frozenset(), {}
+            evaluated = frozenset().union(*(self._fingerprint_set(set_id) for set_id in set_ids))
+            hits = dict(self._conn.execute(
+                "SELECT fingerprint, context FROM page_hits WHERE url = ? AND content_hash = ?", (url, content_hash)))
+        return evaluated, hits
+
+    def record(self, url, content_hash, set_id, hits):
+        """Record that every pair in `set_id` has been evaluated against this content.
+
+        This replaces the page's earlier scans, so only hits of pairs in
+        `set_id` are kept.
+        """
+        with self._lock:
+            evaluated = self._fingerprint_set(set_id)
+            self._conn.execute("BEGIN")
+            try:
+                # Another store may have dropped the set before any page referred to it.
+                if set_id in self._blobs:
+                    self._conn.execute("INSERT OR IGNORE INTO fingerprint_sets (set_id, fingerprints) VALUES (?, ?)",
+                                       (set_id, self._blobs[set_id]))
+                # Only the latest scan is kept; hits of earlier versions of the page can never be reused.
+                self._conn.execute("DELETE FROM page_scans WHERE url = ?", (url,))
+                self._conn.execute("DELETE FROM page_hits WHERE url = ? AND content_hash != ?", (url, content_hash))
+                stale = [(url, fingerprint) for (fingerprint,) in self._conn.execute(
+                    "SELECT fingerprint FROM page_hits WHERE url = ?", (url,)) if fingerprint not in evaluated]
+                self._conn.executemany("DELETE FROM page_hits WHERE url = ? AND fingerprint = ?", stale)
+                self._conn.execute("INSERT INTO page_scans (url, content_hash, set_id) VALUES (?, ?, ?)",
+                                   (url, content_hash, set_id))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO page_hits (url, content_hash, fingerprint, context) VALUES (?, ?, ?, ?)",
+                    [(url, content_hash, fingerprint, context) for fingerprint, context in hits.items()]
+                )
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+
+_default_store = None
+_default_store_pid = None
+_default_store_lock = threading.Lock()
+
+def open_scan_store():
+    """Return the process-wide ScanStore in the cache directory, or None if it cannot be opened."""
+    global _default_store, _default_store_pid
+    with _default_store_lock:
+        # Parser processes forked from this one open their own connection.
+        if _default_store is None or _default_store_pid != os.getpid():
+            try:
+                _default_store = ScanStore()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Incremental scans disabled, could not open {DEFAULT_CACHE_DIR}: {e}")
+                return None
+            _default_store_pid = os.getpid()
+        return _default_store
@@ -0,0 +1,442 @@
+"""Reverse content silo analysis, independent of the Streamlit UI."""
+import concurrent.futures
+import html
+import logging
+import os
+import platform
+import tempfile
+import time
+from dataclasses import dataclass
+from urllib.parse import urlparse
+import numpy as np
+import pandas as pd
+import pdfkit
+from modules.html_parser import extract_content_links, declared_encoding
+from modules.http_cache import cached_get
+from modules.metrics import record_error, record_response_timing, trace_url
+
+logger = logging.getLogger(__name__)
+
+SILO_FETCH_WORKERS = 8
+# Rows and columns of the matrix shown at a time in the app.
+MATRIX_PAGE_SIZE = 25
+MATRIX_FONT_FAMILY = ('system-ui, -apple-system, BlinkMacSystemFont, "Segoe UI",'
+                      'Roboto, "Helvetica Neue", Arial, sans-serif')
+
+@dataclass
+class SiloAnalysis:
+    """Links found on each page of a silo and the resulting interlinking matrix.
+
+    `all_links` maps each page type to the {'url', 'text'} links in its main
+    content; `matrix_df` holds 1/0 for linked/not linked and NaN where a link
+    is not applicable. `tooltip_frame` builds the anchor details for each
+    cell when a report needs them.
+    """
+    data: pd.DataFrame
+    all_links: dict
+    url_to_type: dict
+    matrix_df: pd.DataFrame
+
+def generate_pdf_report(html_content):
+    current_os = platform.system() 
+    if current_os == "Windows":
+        config = pdfkit.configuration(wkhtmltopdf=r"C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe")
+    else:
+        config = pdfkit.configuration(wkhtmltopdf="/usr/bin/wkhtmltopdf")
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmpfile:
+        pdfkit.from_string(html_content, tmpfile.name, configuration=config)
+        tmpfile.seek(0)
+        pdf_bytes = tmpfile.read()
+
+    os.remove(tmpfile.name)
+    return pdf_bytes
+
+def render_report_html(data, matrix_html, all_links, url_to_type):
+    homepage_url = data[data['type'] == 'Homepage']['url'].values[0]
+    target_url = data[data['type'] == 'Target Page']['url'].values[0]
+    homepage_section = ""
+    homepage_links_df = pd.DataFrame(all_links.get('Homepage', []))
+    if not homepage_links_df.empty:
+        ht = homepage_links_df[homepage_links_df['url'] == target_url]
+        if not ht.empty:
+            homepage_section += "<p class='success'>✓ Homepage links to Target Page</p>"
+        else:
+            homepage_section += "<p class='error'>✗ Homepage does not link to Target Page</p>"
+    else:
+        homepage_section += "<p>No internal links found on the Homepage.</p>"
+
+    target_section = ""
+    target_links_df = pd.DataFrame(all_links.get('Target Page', []))
+    if not target_links_df.empty:
+        th = target_links_df[target_links_df['url'] == homepage_url]
+        if not th.empty:
+            target_section += "<p class='success'>✓ Target Page links to Homepage</p>"
+        else:
+            target_section += "<p class='error'>✗ Target Page does not link to Homepage</p>"
+    else:
+        target_section += "<p>No internal links found on the Target Page.</p>"
+
+    blog_section = ""
+    blog_types = [typ for typ in data['type'] if typ.startswith('Blog')]
+    for blog_type in blog_types:
+        blog_section += f"<h3>{blog_type} Analysis</h3>"
+        blog_links_df = pd.DataFrame(all_links.get(blog_type, []))
+        if blog_links_df.empty:
+            blog_section += "<p class='warning'>No internal links found in this blog.</p>"
+            continue
+        blog_links_df['linked_type'] = blog_links_df['url'].map(url_to_type)
+
+        target_links = blog_links_df[blog_links_df['url'] == target_url]
+        if not target_links.empty:
+            blog_section += "<p class='success'>✓ Links to Target Page:</p>"
+            blog_section += target_links[['text', 'url']].to_html(index=False, border=1)
+        else:
+            blog_section += "<p class='error'>✗ Does not link to Target Page</p>"
+
+        other_blogs = [b for b in blog_types if b != blog_type]
+        other_blog_links = blog_links_df[blog_links_df['linked_type'].isin(other_blogs)]
+        if not other_blog_links.empty:
+            blog_section += "<p>Links to Other Blogs:</p>"
+            blog_section += other_blog_links[['text', 'url', 'linked_type']].to_html(index=False, border=1)
+
+        missing_blogs = [
+            b for b in other_blogs   
+            if data[data['type'] == b]['url'].values[0] not in other_blog_links['url'].tolist()
+        ]
+        if missing_blogs:
+            blog_section += f"<p class='error'>Missing links to: {', '.join(missing_blogs)}</p>"
+
+    full_html = f"""
+    <html>
+    <head>
+        <meta charset="utf-8">
+        <title>Internal Link Analysis Report</title>
+        <style>
+        body {{
+            font-family: "Helvetica Neue", Arial, sans-serif;
+            margin: 30px;
+            line-height: 1.6;
+            color: #333;
+        }}
+        
+        h1, h2, h3, h4 {{
+            color: black;
+            font-weight: bold;
+            margin-top: 1.2em;
+            margin-bottom: 0.8em;
+        }}
+        
+        .subtitle {{
+            font-size: 16px;
+            color: #555;
+            margin-bottom: 2em;
+        }}
+            
+        table {{
+            border-collapse: collapse;
+            margin-bottom: 1em;
+        }}
+        
+        table, th, td {{
+            border: 1px solid #999;
+            border: 2px solid black !important;
+        }}
+            
+        th, td {{
+            padding: 8px 12px;
+            text-align: center;
+            font-size: 14px;
+        }}
+            
+        .success {{
+            color: green;
+            font-weight: bold;
+        }}
+            
+        .error {{
+            color: #B71C1C;
+            font-weight: bold;
+        }}
+            
+        .warning {{
+            color: orange;
+            font-weight: bold;
+        }}
+            
+        .matrix-container {{
+            margin-bottom: 2em;
+        }}
+            
+        .analysis-container {{
+            margin-bottom: 2em;
+        }}
+            
+        .section-divider {{
+            margin: 2em 0;
+            border: 0;
+            border-top: 2px solid #ccc;
+        }}
+        </style>
+    </head>
+    <body>
+        <h1 style="text-align:center;">Internal Link Analysis Report</h1>
+        <p class="subtitle">
+        This report contains your complete interlinking matrix and detailed analysis 
+        of Homepage, Target Page, and Blog links.
+        </p>
+        
+        <div class="matrix-container">
+        <h2>Complete Interlinking Matrix</h2>
+        {matrix_html}
+        </div>
+        <hr class="section-divider" />
+
+        <div class="analysis-container">
+        <h2>Homepage Links Analysis</h2>
+        {homepage_section}
+        </div>
+        <hr class="section-divider" />
+
+        <div class="analysis-container">
+        <h2>Target Page Links Analysis</h2>
+        {target_section}
+        </div>
+        <hr class="section-divider" />
+
+        <div class="analysis-container">
+        <h2>Blog Interlinking Analysis</h2>
+        {blog_section}
+        </div>
+        <hr class="section-divider" />
+    </body>
+    </html>
+    """
+    return full_html
+
+def is_valid_url(url):
+    try:
+        result = urlparse(url)
+        return all([result.scheme, result.netloc])
+    except Exception:
+        return False
+
+def validate_silo_data(data):
+    """Return a message describing why `data` cannot be analyzed, or None."""
+    if 'type' not in data.columns or 'url' not in data.columns:
+        return "Uploaded file must contain 'type' and 'url' columns."
+    if (data['type'] == 'Homepage').sum() != 1:
+        return "Uploaded file must contain exactly one 'Homepage' entry."
+    if (data['type'] == 'Target Page').sum() != 1:
+        return "Uploaded file must contain exactly one 'Target Page' entry."
+    if not data['url'].apply(is_valid_url).all():
+        return "Some URLs in the uploaded file are invalid."
+    return None
+
+def get_main_content_anchor_tags(url, page_type, on_error=None, session=None):
+    """Scrape main content area and extract internal anchor tags."""
+    with trace_url(url):
+        try:
+            headers = {
+                'User-Agent': ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36"
+                )
+            }
+            start = time.perf_counter()
+            # Always revalidated: a link fixed since the last check must show up in the matrix.
+            response = cached_get(url, session=session, headers=headers, timeout=10, revalidate=True)
+            record_response_timing(response, time.perf_counter() - start)
+            response.raise_for_status()
+
+            links = extract_content_links(url, response.content, encoding=declared_encoding(response.headers.get('Content-Type')))
+            return links
+        except Exception as e:
+            logger.error(f"Error scraping {url}: {str(e)}")
+            record_error(e)
+            if on_error:
+                on_error(f"Error scraping {url}: {str(e)}")
+            return []
+
+def link_index(links):
+    """Map each URL linked from a page to the anchor texts of its links, in page order."""
+    index = {}
+    for link in links:
+        index.setdefault(link['url'], []).append(link['text'])
+    return index
+
+def _fetch_silo_page(url, page_type):
+    errors = []
+    return get_main_content_anchor_tags(url, page_type, errors.append), errors
+
+def analyze_silo(data, on_progress=None, on_error=None, max_workers=SILO_FETCH_WORKERS):
+    """Fetch every page in `data` (columns 'type' and 'url') and build the interlinking matrix.
+
+    Pages are fetched on up to `max_workers` threads. `on_progress(done,
+    total, page_type)` and `on_error(message)` are called on the calling
+    thread as each page finishes.
+    """
+    url_to_type = dict(zip(data['url'], data['type']))
+    pages = list(zip(data['type'], data['url']))
+    page_links = [None] * len(pages)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pages)))) as executor:
+        futures = {executor.submit(_fetch_silo_page, url, page_type): i for i, (page_type, url) in enumerate(pages)}
+        for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            i = futures[future]
+            page_links[i], errors = future.result()
+            if on_error:
+                for message in errors:
+                    on_error(message)
+            if on_progress:
+                on_progress(done, len(pages), pages[i][0])
+    # Filled in input order, so all_links is the same as when pages were fetched one by one.
+    all_links = {}
+    for (page_type, _), links in zip(pages, page_links):
+        all_links[page_type] = links
+    
+    types = data['type'].tolist()
+    url_columns = {}
+    for j, url in enumerate(data['url']):
+        url_columns.setdefault(url, []).append(j)
+
+    rows, columns = [], []
+    for i, source_type in enumerate(types):
+        for url in link_index(all_links[source_type]):
+            linked = url_columns.get(url, ())
+            rows += [i] * len(linked)
+            columns += linked
+    matrix_data = np.zeros((len(types), len(types)))
+    matrix_data[rows, columns] = 1
+    np.fill_diagonal(matrix_data, np.nan)
+    
+    matrix_df = pd.DataFrame(
+        matrix_data,
+        columns=data['type'],
+        index=data['type']
+    ).rename_axis(None, axis=1).rename_axis(None, axis=0)
+
+    blog_types = [typ for typ in matrix_df.columns if typ.startswith('Blog')]
+    if blog_types:
+        matrix_df.loc['Homepage', blog_types] = np.nan
+        matrix_df.loc[blog_types, 'Homepage'] = np.nan
+
+    if len(blog_types) > 1:
+        for btype in blog_types[1:]:
+            matrix_df.loc['Target Page', btype] = np.nan
+
+    return SiloAnalysis(data, all_links, url_to_type, matrix_df)
+
+def tooltip_frame(analysis):
+    """Return the anchor texts and URL behind every cell of the matrix, for hover tooltips.
+
+    Cells use the first URL of their column's type and are empty where the
+    row's page does not link to it.
+    """
+    types = analysis.data['type'].tolist()
+    tooltip_columns, first_urls = {}, {}
+    for j, (page_type, url) in enumerate(zip(types, analysis.data['url'])):
+        tooltip_columns.setdefault(first_urls.setdefault(page_type, url), []).append(j)
+
+    tooltip_data = np.full((len(types), len(types)), '', dtype=object)
+    for i, source_type in enumerate(types):
+        for url, texts in link_index(analysis.all_links[source_type]).items():
+            tooltip = "<br>".join(f"Text: {text}<br>URL: {url}" for text in texts)
+            for j in tooltip_columns.get(url, ()):
+                if j != i:
+                    tooltip_data[i, j] = tooltip
+    return pd.DataFrame(tooltip_data, index=analysis.matrix_df.index, columns=analysis.matrix_df.columns)
+
+def render_matrix_html(matrix_df, rows=slice(None), columns=slice(None), primary_color=None):
+    """Return the block of the matrix at positions `rows` x `columns` as a compact HTML table.
+
+    It looks like the style_matrix table, but cells are colored by three CSS
+    classes instead of a rule per cell and link details are left out, so
+    the HTML grows only with the number of cells shown.
+    """
+    block = matrix_df.iloc[rows, columns]
+    values = block.to_numpy(dtype=float)
+    missing = np.isnan(values)
+    classes = np.where(missing, 'na', np.where(values == 1, 'yes', 'no'))
+    labels = np.where(missing, 'NA', np.where(values == 1, '1', '0'))
+    border = f"1px solid {primary_color or 'black'}"
+    style = (
+        f".silo-matrix th, .silo-matrix td {{border: {border}; padding: 8px 12px; font-family: {MATRIX_FONT_FAMILY};}}"
+        ".silo-matrix th {background-color: white; color: black !important; font-weight: bold; font-size: 13px;}"
+        ".silo-matrix td {text-align: center; min-width: 150px; font-weight: bold; font-size: 14px;}"
+        ".silo-matrix .yes {background-color: #C8E6C9; color: black;}"
+        ".silo-matrix .no {background-color: #FA615A; color: white;}"
+        ".silo-matrix .na {background-color: white; color: black;}"
+    )
+    header = ''.join(f"<th>{html.escape(str(column))}</th>" for column in block.columns)
+    body = ''.join(
+        f"<tr><th>{html.escape(str(index))}</th>"
+        + ''.join(f'<td class="{cls}">{label}</td>' for cls, label in zip(row_classes, row_labels))
+        + "</tr>"
+        for index, row_classes, row_labels in zip(block.index, classes, labels)
+    )
+    return f'<style>{style}</style><table class="silo-matrix"><thead><tr><th></th>{header}</tr></thead><tbody>{body}</tbody></table>'
+
+def style_matrix(matrix_df, tooltip_df=None, primary_color=None, secondary_background_color=None, text_color=None):
+    """Return a pandas Styler for the matrix, with link details as hover tooltips if `tooltip_df` is given.
+
+    Tooltips are hidden until hovered, so reports for print or PDF leave
+    them out: they look the same and render much faster.
+    """
+    # Style for the matrix (this styling is used to generate the HTML for both PDF and Streamlit)
+    tooltip_style = [
+        ('visibility', 'hidden'),
+        ('position', 'absolute'),
+        ('z-index', '100'),
+        ('background-color', secondary_background_color),
+        ('color', text_color),
+        ('border', f'2px solid {primary_color}'),
+        ('padding', '10px'),
+        ('font-family', 'system-ui, -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif'),
+        ('font-size', '13px'),
+        ('box-shadow', '3px 3px 8px rgba(0, 0, 0, 0.5)'),
+        ('border-radius', '5px')
+    ]
+    
+    def color_cells(val):
+        if pd.isna(val):
+            return 'background-color: white; color: black'
+        elif val == 1:
+            return 'background-color: #C8E6C9; color: black'
+        else:
+            return 'background-color: #FA615A; color: white'
+
+    font_family = MATRIX_FONT_FAMILY
+    
+    styled_matrix = matrix_df.style
+    if tooltip_df is not None:
+        styled_matrix = styled_matrix.set_tooltips(tooltip_df, props=tooltip_style)
+    styled_matrix = (styled_matrix
+        .format(na_rep="NA", precision=0)
+        .set_properties(**{
+            'text-align': 'center',
+            'min-width': '150px',
+            'font-weight': 'bold',
+            'background-color': 'white', 
+            'color': 'black', 
+            'border': f'1px solid {primary_color}',
+            'font-family': font_family,
+            'font-size': '14px'
+        })
+        .map(color_cells)
+        .set_table_styles([{
+            'selector': 'th, td',
+            'props': [
+                ('border', f'1px solid {primary_color}'),
+                ('padding', '8px 12px'),
+                ('font-family', font_family),
+                ('font-size', '14px')
+            ]}, 
+            {
+            'selector': 'th',
+            'props': [
+                ('background-color', 'white'), 
+                ('color','black !important'),
+                ('font-weight', 'bold'),
+                ('font-family', font_family),
+                ('font-size', '13px')
+            ]}])
+    )
+    return styled_matrix
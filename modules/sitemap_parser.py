@@ -0,0 +1,66 @@
+"""Streaming sitemap parser.
+
+Sitemaps are read incrementally with lxml's iterparse: every <url> or
+<sitemap> entry is turned into a SitemapRecord and then cleared from the
+tree, so memory stays flat however many entries a sitemap has. Gzipped
+sitemaps (``.xml.gz``) are recognised by their magic bytes and
+decompressed on the fly.
+"""
+import gzip
+import io
+from dataclasses import dataclass
+from lxml import etree
+
+GZIP_MAGIC = b'\x1f\x8b'
+# Entry elements in any namespace, or none.
+ENTRY_TAGS = ('{*}url', '{*}sitemap')
+
+@dataclass
+class SitemapRecord:
+    """One entry of a sitemap: a page (`kind` 'url') or a child sitemap (`kind` 'sitemap')."""
+    kind: str
+    loc: str
+    lastmod: str = None
+    changefreq: str = None
+    priority: str = None
+
+def open_sitemap(source):
+    """Return a readable binary stream for `source`, decompressing gzip if needed.
+
+    `source` may be bytes or any binary file-like object, such as the raw
+    body of a streamed requests response.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    if not hasattr(source, 'peek'):
+        source = io.BufferedReader(source)
+    if source.peek(len(GZIP_MAGIC))[:len(GZIP_MAGIC)] == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=source)
+    return source
+
+def _local_name(tag):
+    return tag.rpartition('}')[2] if isinstance(tag, str) else None
+
+def iter_sitemap_records(source):
+    """Yield a SitemapRecord for every <url> and <sitemap> entry in a sitemap or sitemap index.
+
+    Raises etree.XMLSyntaxError or OSError if the stream cannot be parsed;
+    records before the error have already been yielded.
+    """
+    stream = open_sitemap(source)
+    if not stream.peek(1):
+        return
+    for _, element in etree.iterparse(stream, events=('end',), tag=ENTRY_TAGS, recover=True, huge_tree=True,
+                                      resolve_entities=False, no_network=True):
+        fields = {}
+        for child in element:
+            name = _local_name(child.tag)
+            if name and name not in fields:
+                fields[name] = ''.join(child.itertext()).strip()
+        if fields.get('loc'):
+            yield SitemapRecord(_local_name(element.tag), fields['loc'], fields.get('lastmod'),
+                                fields.get('changefreq'), fields.get('priority'))
+        # Drop the entry and everything before it so the tree never grows.
+        element.clear(keep_tail=True)
+        while element.getprevious() is not None:
+            del element.getparent()[0]
@@ -0,0 +1,298 @@
+"""Sitemap discovery and URL classification, independent of the Streamlit UI."""
+import concurrent.futures
+import logging
+import re
+import threading
+from urllib.parse import urljoin, urlparse
+import pandas as pd
+import requests
+import urllib3
+from lxml import etree
+from modules.http_cache import cached_get
+from modules.sitemap_parser import iter_sitemap_records
+from modules.transport import create_session
+
+logger = logging.getLogger(__name__)
+
+SITEMAP_PATHS = ["/sitemap.xml", "/sitemap-index.xml", "/sitemap_index.xml", "/sitemap-1.xml",
+                 "/sitemaps/sitemap.xml", "/sitemaps/sitemap_index.xml"]
+SITEMAP_HEADERS = {'User-Agent': 'Mozilla/5.0'}
+SITEMAP_TIMEOUT = 10
+DEFAULT_CONCURRENCY = 16
+DEFAULT_PER_HOST_LIMIT = 8
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp', '.svg', '.tiff', '.ico')
+ROBOTS_SITEMAP_RE = re.compile(r'^\s*sitemap\s*:\s*(\S+)', re.IGNORECASE | re.MULTILINE)
+
+COUNTRY_LANG_MAP = {
+    '.cn': 'zh',    # China
+    '.jp': 'ja',    # Japan
+    '.kr': 'ko',    # Korea
+    '.tw': 'zh',    # Taiwan
+    '.hk': 'zh',    # Hong Kong
+    '.it': 'it',    # Italy
+    '.es': 'es',    # Spain
+    '.fr': 'fr',    # France
+    '.de': 'de',    # Germany
+    '.pt': 'pt',    # Portugal
+    '.nl': 'nl',    # Netherlands
+    '.pl': 'pl',    # Poland
+    '.se': 'sv',    # Sweden
+    '.no': 'no',    # Norway
+    '.fi': 'fi',    # Finland
+    '.dk': 'da',    # Denmark
+    '.cz': 'cs',    # Czech Republic
+    '.hu': 'hu',    # Hungary
+    '.ro': 'ro',    # Romania
+    '.hr': 'hr',    # Croatia
+    '.rs': 'sr',    # Serbia
+    '.bg': 'bg',    # Bulgaria
+    '.sk': 'sk',    # Slovakia
+    '.si': 'sl'     # Slovenia
+}
+
+LANGUAGE_PATTERNS = {
+    'en-uk':[r'/uk/',r'/uk-',r'/uk'],
+    'en': [r'/en/', r'/en-', r'/english/', r'/us/', r'/uk/', r'/au/', r'/international/'],
+    'it': [r'/it/', r'/it-', r'/italiano/', r'/italian/', r'/ch/'],
+    'es': [r'/es/', r'/es-', r'/espanol/', r'/spanish/', r'/mx/', r'/cl/', r'/co/', r'/latam/',r'lat',r'/lat/'],
+    'fr': [r'/fr/', r'/fr-', r'/french/', r'/ca/', r'/ch/', r'/be/'],
+    'de': [r'/de/', r'/de-', r'/deutsch/', r'/german/', r'/at/', r'/ch/'],
+    'pt': [r'/pt/', r'/pt-', r'/portuguese/', r'/br/', r'/pt/', r'/ao/'],
+    'ru': [r'/ru/', r'/ru-', r'/russian/', r'/by/', r'/kz/'],
+    'nl': [r'/nl/', r'/nl-', r'/dutch/', r'/netherlands/'],
+    'vi': [r'/vi/', r'/vi-', r'/vietnamese/'],
+    'pl': [r'/pl/', r'/pl-', r'/polish/'],
+    'hu': [r'/hu/', r'/hu-', r'/hungarian/'],
+    'tr': [r'/tr/', r'/tr-', r'/turkish/'],
+    'th': [r'/th/', r'/th-', r'/thai/'],
+    'cs': [r'/cs/', r'/cs-', r'/czech/'],
+    'el': [r'/el/', r'/el-', r'/greek/'],
+    'ja': [r'/ja/', r'/ja-', r'/japanese/', r'/jp/'],
+    'zh': [r'/zh/', r'/zh-', r'/zhs/', r'/chinese/', r'/cn/', r'/hk/', r'/tw/', r'/zh-cn/', r'/zh-tw/', r'/zh-hk/', r'/zht/'],
+    'ko': [r'/ko/', r'/ko-', r'/korean/', r'/kr/'],
+    'ar': [r'/ar/', r'/ar-', r'/arabic/', r'/sa/', r'/ae/'],
+    # Categories 
+    'blogs': [r'/blogs/', r'/blogs-', r'/en/blogs/', r'/blog/',r'/insights/'],
+    'corporate': [r'/corporate/', r'/corporate-', r'/en/corporate/', r'/corp/'],
+    'how-to': [r'/how-to/', r'/how-to-', r'/en/how-to/', r'/howto/'],
+    'products': [r'/products/', r'/products-'],
+    'resources': [r'/resources/', r'/resources-'],
+    'company': [r'/company/', r'/company-'],
+    'partners': [r'/partners/', r'/partners-'],
+    'solutions': [r'/solutions/', r'/solutions-'],
+}
+
+SPECIFIC_DOMAIN_PATTERNS = {
+    'zh': [r'teamviewer\.cn', r'teamviewer\.com\.cn'],
+    'ja': [r'teamviewer\.com/ja'],
+    'it': [r'teamviewer\.com/it'],
+    'es': [r'teamviewer\.com/latam']
+}
+
+PRODUCT_LANG_PATTERNS = {
+    'es': [r'/distribucion-de-licencias-tensor'],
+    'zh': [r'/anydesk\.com/zhs/solutions/']
+}
+
+class _OrderedPatterns:
+    """Find the first language, in dictionary order, with a pattern anywhere in a URL.
+
+    One combined alternation rejects most URLs in a single scan; only URLs
+    it matches are checked language by language.
+    """
+    def __init__(self, patterns_by_lang):
+        self.any_pattern = re.compile('|'.join(p for patterns in patterns_by_lang.values() for p in patterns), re.IGNORECASE)
+        self.by_lang = [(lang, re.compile('|'.join(patterns), re.IGNORECASE)) for lang, patterns in patterns_by_lang.items()]
+
+    def first_lang(self, url):
+        if not self.any_pattern.search(url):
+            return None
+        return next((lang for lang, regex in self.by_lang if regex.search(url)), None)
+
+def _segment_table(patterns_by_lang):
+    """Map each path segment to (priority, language) for the first language whose patterns name it."""
+    table = {}
+    for priority, (lang, patterns) in enumerate(patterns_by_lang.items()):
+        for pattern in patterns:
+            table.setdefault(pattern.strip('/'), (priority, lang))
+    return table
+
+SPECIFIC_DOMAIN_LANGS = _OrderedPatterns(SPECIFIC_DOMAIN_PATTERNS)
+PRODUCT_LANGS = _OrderedPatterns(PRODUCT_LANG_PATTERNS)
+PATH_SEGMENT_LANG = _segment_table(LANGUAGE_PATTERNS)
+# Plain http(s) URLs without userinfo, port, IPv6 host, ;params or characters
+# urlparse strips; anything else goes through urlparse itself.
+SIMPLE_URL_RE = re.compile(
+    r"https?://(?P<host>[A-Za-z0-9.\-_~%!$&'()*+,=]*)(?P<path>/[^?#;\t\r\n]*)?"
+    r"(?:\?(?P<query>[^#\t\r\n]*))?(?:#[^\t\r\n]*)?\Z",
+    re.IGNORECASE
+)
+LANG_PARAM_RE = re.compile(r'(?:^|&)lang=([a-zA-Z]{2})')
+
+def _split_url(url):
+    """Return (hostname, path, query) the way urlparse would."""
+    match = SIMPLE_URL_RE.match(url)
+    if match:
+        return match.group('host').lower(), match.group('path') or '', match.group('query') or ''
+    parsed_url = urlparse(url)
+    return (parsed_url.hostname.lower() if parsed_url.hostname else ''), parsed_url.path, parsed_url.query
+
+def detect_url_language(url):
+    lang = SPECIFIC_DOMAIN_LANGS.first_lang(url)
+    if lang:
+        return lang
+
+    hostname, path, query = _split_url(url)
+    # Every country suffix is a dot and a two-letter TLD, so the last three
+    # characters of the hostname are enough to look one up.
+    lang = COUNTRY_LANG_MAP.get(hostname[-3:])
+    if lang:
+        return lang
+
+    best = None
+    for part in path.lower().split('/'):
+        entry = PATH_SEGMENT_LANG.get(part)
+        if entry and (best is None or entry < best):
+            best = entry
+    if best:
+        return best[1]
+
+    if query:
+        lang_param = LANG_PARAM_RE.search(query)
+        if lang_param and lang_param.group(1).lower() in LANGUAGE_PATTERNS:
+            return lang_param.group(1).lower()
+
+    return PRODUCT_LANGS.first_lang(url) or 'en'
+
+def detect_url_languages(urls):
+    """Classify a Series of URLs at once; labels are the same as detect_url_language's.
+
+    Each distinct URL is classified once and the labels are mapped back onto
+    the Series, keeping its index.
+    """
+    urls = pd.Series(urls, dtype=object)
+    unique_urls = urls.unique()
+    return urls.map(dict(zip(unique_urls, map(detect_url_language, unique_urls))))
+
+def classify_urls(urls):
+    """Return a DataFrame of unique URLs with their detected language or category."""
+    lang_df = pd.DataFrame({'source_url': pd.Series(list(urls), dtype=object)})
+    lang_df['Language/Category'] = detect_url_languages(lang_df['source_url'])
+    return lang_df.drop_duplicates(subset=['source_url'])
+
+def _warn(message, on_warning):
+    logger.warning(message)
+    if on_warning:
+        on_warning(message)
+
+class _HostLimiter:
+    """Bound the number of simultaneous requests to each host."""
+    def __init__(self, per_host_limit):
+        self.per_host_limit = per_host_limit
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, url):
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._semaphores[host]
+
+def robots_sitemaps(robots_txt):
+    """Return the URLs of the `Sitemap:` lines in a robots.txt body."""
+    return [match.group(1) for match in ROBOTS_SITEMAP_RE.finditer(robots_txt)]
+
+def _read_robots(robots_url, session, limiter):
+    with limiter(robots_url):
+        response = cached_get(robots_url, session=session, timeout=SITEMAP_TIMEOUT)
+    if response.status_code != 200:
+        return []
+    return robots_sitemaps(response.text)
+
+def _is_image(url):
+    return url.lower().endswith(IMAGE_EXTENSIONS)
+
+def _read_sitemap(sitemap_url, session, limiter, on_warning):
+    """Return (child sitemap URLs, page URLs) for one sitemap, or None if it could not be fetched.
+
+    The body is parsed as it arrives instead of being loaded into memory.
+    """
+    children, urls = [], []
+    with limiter(sitemap_url):
+        with session.get(sitemap_url, timeout=SITEMAP_TIMEOUT, stream=True) as response:
+            if response.status_code != 200:
+                return None
+            response.raw.decode_content = True
+            # Let the buffered reader see EOF instead of a closed file.
+            response.raw.auto_close = False
+            try:
+                for record in iter_sitemap_records(response.raw):
+                    if record.kind == 'sitemap':
+                        children.append(urljoin(sitemap_url, record.loc))
+                    elif not _is_image(record.loc):
+                        urls.append(record.loc)
+            except (etree.XMLSyntaxError, OSError, EOFError, urllib3.exceptions.HTTPError) as e:
+                _warn(f"Error parsing sitemap {sitemap_url}: {e}", on_warning)
+    return children, urls
+
+def fetch_sitemap_urls(website_url, on_warning=None, concurrency=DEFAULT_CONCURRENCY, per_host_limit=DEFAULT_PER_HOST_LIMIT):
+    """Collect the page URLs listed in a website's sitemaps.
+
+    Sitemaps come from the `Sitemap:` lines of robots.txt and from the
+    usual sitemap locations, which are all requested in parallel. Sitemap
+    indexes are followed to any depth; every sitemap is fetched once, so
+    indexes that refer to each other do not loop. At most `concurrency`
+    requests run at a time, and at most `per_host_limit` against one host,
+    over one keep-alive connection pool.
+    """
+    base_url = website_url.rstrip('/')
+    limiter = _HostLimiter(per_host_limit)
+    seen_sitemaps = set()
+    page_urls = {}
+
+    # Sitemaps are streamed, which HTTP/2 sessions cannot do.
+    with create_session(pool_size=concurrency, headers=SITEMAP_HEADERS, http2=False) as session, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = {}
+
+        def submit_sitemap(sitemap_url):
+            if sitemap_url in seen_sitemaps:
+                return
+            seen_sitemaps.add(sitemap_url)
+            pending[executor.submit(_read_sitemap, sitemap_url, session, limiter, on_warning)] = ('sitemap', sitemap_url)
+
+        robots_url = base_url + '/robots.txt'
+        pending[executor.submit(_read_robots, robots_url, session, limiter)] = ('robots', robots_url)
+        for path in SITEMAP_PATHS:
+            submit_sitemap(base_url + path)
+
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                kind, url = pending.pop(future)
+                try:
+                    result = future.result()
+                except requests.exceptions.RequestException as e:
+                    _warn(f"Error accessing {url}: {e}", on_warning)
+                    continue
+                if kind == 'robots':
+                    for sitemap_url in result:
+                        submit_sitemap(sitemap_url)
+                elif result is not None:
+                    children, urls = result
+                    for child in children:
+                        submit_sitemap(child)
+                    page_urls.update(dict.fromkeys(urls))
+    return list(page_urls)
+
+def parse_sitemap(sitemap_content, on_warning=None):
+    """Return the page URLs of a sitemap body, leaving out images."""
+    urls = []
+    try:
+        for record in iter_sitemap_records(sitemap_content):
+            if record.kind == 'url' and not _is_image(record.loc):
+                urls.append(record.loc)
+    except (etree.XMLSyntaxError, OSError, EOFError) as e:
+        _warn(f"Error parsing sitemap: {e}", on_warning)
+    return urls
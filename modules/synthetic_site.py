@@ -0,0 +1,258 @@
+"""A generated website served over local HTTP, for benchmarks.
+
+The site is built from a SiteConfig with a fixed seed, so every run serves
+the same pages: each page has paragraphs of pseudo-words with keyword
+phrases mixed in, anchors to other pages inside its main content, and
+navigation links around it. Pages are listed in a sitemap tree of the
+configured depth, optionally gzipped, and robots.txt points at its root.
+The server can add latency to every response and fail a share of requests
+with HTTP 500.
+"""
+import gzip
+import html
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+SYLLABLES = [c + v for c in 'bdfgklmnprstvz' for v in 'aeiou']
+VOCABULARY_SIZE = 5000
+# Distinct keyword phrases that occur in page text; keyword_pairs() draws from these.
+KEYWORD_POOL_SIZE = 10000
+WORDS_PER_PARAGRAPH = 60
+PHRASES_PER_PARAGRAPH = 3
+NAV_LINKS = 10
+
+@dataclass
+class SiteConfig:
+    """Shape of the generated site and how the server behaves.
+
+    `sitemap_depth` 0 lists every page in /sitemap.xml; each extra level adds
+    a layer of sitemap indexes above sitemaps of `sitemap_size` URLs.
+    `latency` seconds (plus up to `latency_jitter`) are added to every
+    response and `error_rate` of all requests fail with HTTP 500. With
+    `max_in_flight`, requests beyond that many at once are answered with
+    429 and `Retry-After: retry_after`, like a rate-limiting CDN.
+    `crawl_delay` adds a Crawl-delay line to robots.txt.
+    """
+    pages: int = 500
+    paragraphs: int = 8
+    anchors: int = 20
+    sitemap_depth: int = 1
+    sitemap_size: int = 100
+    gzip: bool = False
+    latency: float = 0.0
+    latency_jitter: float = 0.0
+    error_rate: float = 0.0
+    max_in_flight: int = 0
+    retry_after: int = 1
+    crawl_delay: float = 0.0
+    seed: int = 1
+
+def _word(index):
+    syllables = []
+    for _ in range(3):
+        index, syllable = divmod(index, len(SYLLABLES))
+        syllables.append(SYLLABLES[syllable])
+    return ''.join(syllables)
+
+VOCABULARY = [_word(i * 7919 % len(SYLLABLES) ** 3) for i in range(VOCABULARY_SIZE)]
+
+def keyword_phrase(index):
+    """Return the index-th keyword phrase of the pool, a pair of vocabulary words."""
+    first, second = divmod(index * 2654435761 % (VOCABULARY_SIZE * VOCABULARY_SIZE), VOCABULARY_SIZE)
+    return f"{VOCABULARY[first]} {VOCABULARY[second]}"
+
+class SyntheticSite:
+    """The URLs, inputs and responses of the site described by `config` at `base_url`."""
+    def __init__(self, config, base_url):
+        self.config = config
+        self.base_url = base_url.rstrip('/')
+
+    def page_url(self, index):
+        return f"{self.base_url}/" if index == 0 else f"{self.base_url}/pages/{index}"
+
+    def page_urls(self):
+        return [self.page_url(i) for i in range(self.config.pages)]
+
+    def keyword_pairs(self, count):
+        """Return `count` (keyword, target_url) pairs whose keywords appear on the site."""
+        rng = random.Random(self.config.seed + count)
+        return [(keyword_phrase(i % KEYWORD_POOL_SIZE), self.page_url(rng.randrange(self.config.pages)))
+                for i in range(count)]
+
+    def silo_frame(self, size):
+        """Return silo input ('type', 'url') for the homepage, a target page and size - 2 blogs."""
+        size = min(max(size, 2), self.config.pages)
+        types = ['Homepage', 'Target Page'] + [f"Blog {i}" for i in range(1, size - 1)]
+        return pd.DataFrame({'type': types, 'url': [self.page_url(i) for i in range(size)]})
+
+    def _render_page(self, index):
+        config = self.config
+        rng = random.Random(config.seed * 1000003 + index)
+        anchors = [(self.page_url(rng.randrange(config.pages)), rng.choice(VOCABULARY))
+                   for _ in range(config.anchors)]
+        paragraphs = []
+        for p in range(config.paragraphs):
+            words = rng.choices(VOCABULARY, k=WORDS_PER_PARAGRAPH)
+            for _ in range(PHRASES_PER_PARAGRAPH):
+                words.insert(rng.randrange(len(words)), keyword_phrase(rng.randrange(KEYWORD_POOL_SIZE)))
+            # Spread the content anchors over the paragraphs.
+            for href, text in anchors[p::config.paragraphs]:
+                words.insert(rng.randrange(len(words)), f'<a href="{html.escape(href)}">{text}</a>')
+            paragraphs.append(f"<p>{' '.join(words).capitalize()}.</p>")
+        nav = ''.join(f'<li><a href="{self.page_url(i)}">{VOCABULARY[i]}</a></li>'
+                      for i in range(min(NAV_LINKS, config.pages)))
+        return (
+            f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Page {index}</title></head><body>"
+            f"<header><nav><ul>{nav}</ul></nav></header>"
+            f"<main><article><h1>{' '.join(rng.choices(VOCABULARY, k=4))}</h1>{''.join(paragraphs)}</article></main>"
+            f"<footer><p>Synthetic site footer</p></footer></body></html>"
+        ).encode('utf-8')
+
+    def _sitemap_tree(self):
+        config = self.config
+        suffix = '.xml.gz' if config.gzip else '.xml'
+        entries = self.page_urls()
+        documents = {}
+        kind = 'urlset'
+        for level in range(config.sitemap_depth, 0, -1):
+            chunks = [entries[i:i + config.sitemap_size] for i in range(0, len(entries), config.sitemap_size)] or [[]]
+            names = [f"/sitemaps/{kind}-{level}-{n}{suffix}" for n in range(len(chunks))]
+            for name, chunk in zip(names, chunks):
+                documents[name] = (kind, chunk)
+            entries = [self.base_url + name for name in names]
+            kind = 'sitemapindex'
+        documents['/sitemap.xml'] = (kind, entries)
+        return documents
+
+    def responses(self):
+        """Render the whole site as {path: (body, content_type)}."""
+        site = {}
+        for index in range(self.config.pages):
+            path = self.page_url(index)[len(self.base_url):]
+            site[path] = (self._render_page(index), 'text/html; charset=utf-8')
+        for path, (kind, locs) in self._sitemap_tree().items():
+            entry = 'url' if kind == 'urlset' else 'sitemap'
+            body = (f'<?xml version="1.0" encoding="UTF-8"?><{kind} xmlns="{SITEMAP_NS}">'
+                    + ''.join(f'<{entry}><loc>{html.escape(loc)}</loc></{entry}>' for loc in locs)
+                    + f'</{kind}>').encode('utf-8')
+            if path.endswith('.gz'):
+                site[path] = (gzip.compress(body), 'application/x-gzip')
+            else:
+                site[path] = (body, 'application/xml')
+        crawl_delay = f"Crawl-delay: {self.config.crawl_delay:g}\n" if self.config.crawl_delay else ''
+        site['/robots.txt'] = (f"User-agent: *\nAllow: /\n{crawl_delay}Sitemap: {self.base_url}/sitemap.xml\n"
+                               .encode('utf-8'), 'text/plain')
+        return site
+
+class _SiteRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are separate writes; with Nagle on, keep-alive clients wait on delayed ACKs.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        config = server.config
+        if not server.enter():
+            self._respond(429, b'Too many requests', 'text/plain', {'Retry-After': str(config.retry_after)})
+            return
+        try:
+            if config.latency or config.latency_jitter:
+                time.sleep(config.latency + server.random(config.latency_jitter))
+            found = server.site.get(self.path.split('?', 1)[0])
+            if config.error_rate and server.random(1) < config.error_rate:
+                self._respond(500, b'Injected error', 'text/plain')
+            elif found is None:
+                self._respond(404, b'Not found', 'text/plain')
+            else:
+                self._respond(200, *found)
+        finally:
+            server.leave()
+
+    def _respond(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class _SiteHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, config):
+        super().__init__(('127.0.0.1', 0), _SiteRequestHandler)
+        self.config = config
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+        self.base_url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.site = SyntheticSite(config, self.base_url).responses()
+
+    def enter(self):
+        """Count a request in, or return False when it is over `max_in_flight`."""
+        with self._lock:
+            if self.config.max_in_flight and self.in_flight >= self.config.max_in_flight:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def random(self, scale):
+        with self._lock:
+            return self._rng.random() * scale
+
+class SyntheticSiteServer:
+    """Serve the site for `config` on a free localhost port while the context is open.
+
+        with SyntheticSiteServer(SiteConfig(pages=1000)) as site:
+            fetch_sitemap_urls(site.base_url)
+    """
+    def __init__(self, config=None):
+        self.config = config or SiteConfig()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return self._server.base_url
+
+    @property
+    def rejected(self):
+        """Requests answered with 429 for exceeding `max_in_flight`."""
+        return self._server.rejected
+
+    @property
+    def site(self):
+        return SyntheticSite(self.config, self.base_url)
+
+    def start(self):
+        self._server = _SiteHTTPServer(self.config)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,337 @@
+"""Adaptive per-host concurrency for page downloads.
+
+AdaptiveThrottle decides how many requests may be in flight to each host.
+Every host starts at a small limit that grows by about one request per
+round of successful responses (additive increase) and is cut in half when
+the host answers 429/502/503/504 or the connection fails (multiplicative
+decrease). It is also cut, more gently, when the host's smoothed latency
+climbs well above the best latency seen. Once a host has pushed back, the
+limit stays below the level where it did for half a minute. A 429 or 503
+pauses the host for its Retry-After (or a second when none is given), and
+a robots.txt Crawl-delay limits the host to one request at a time, that
+many seconds apart. Throttled responses are retried by the callers, so
+pages are no longer dropped for being rate limited.
+
+The same throttle works from threads (`acquire`) and from asyncio
+(`acquire_async`); `report()` summarizes the throughput of each host and
+the decisions taken.
+"""
+import asyncio
+import email.utils
+import logging
+import threading
+import time
+from collections import deque
+from datetime import timezone
+from urllib.parse import urlsplit
+from modules.http_cache import cached_get
+from modules.metrics import record_stage
+
+logger = logging.getLogger(__name__)
+
+# Responses asking us to slow down; they pause the host and are retried.
+THROTTLE_STATUSES = frozenset({429, 503})
+# Responses that mean the host or its gateway is overloaded.
+OVERLOAD_STATUSES = THROTTLE_STATUSES | {502, 504}
+DEFAULT_INITIAL_LIMIT = 2
+DEFAULT_MAX_LIMIT = 16
+MIN_LIMIT = 1
+DECREASE_FACTOR = 0.5
+LATENCY_DECREASE_FACTOR = 0.8
+# Back off when the smoothed latency exceeds ratio * best + slack seconds.
+LATENCY_BACKOFF_RATIO = 3.0
+LATENCY_BACKOFF_SLACK = 0.1
+LATENCY_SMOOTHING = 0.3
+# Seconds the limit stays below the level where a host last pushed back.
+PROBE_INTERVAL = 30.0
+DEFAULT_THROTTLE_PAUSE = 1.0
+MAX_RETRY_AFTER = 120.0
+MAX_ATTEMPTS = 4
+ROBOTS_TIMEOUT = 10
+DECISION_LOG_SIZE = 200
+
+def parse_retry_after(value, now=None):
+    """Return the seconds to wait for a Retry-After header value, or None if it cannot be parsed."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        seconds = float(value)
+    else:
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        seconds = retry_at.timestamp() - (now if now is not None else time.time())
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+def robots_crawl_delay(robots_txt, user_agent='*'):
+    """Return the Crawl-delay robots.txt asks of `user_agent`, or None.
+
+    A group naming the agent's product token (compared whole and ignoring
+    case) wins over the `*` group. Fractional delays are accepted, unlike
+    urllib.robotparser.
+    """
+    agent = user_agent.split('/')[0].strip().lower()
+    delays = {}
+    group_agents, in_rules = [], False
+    for line in robots_txt.splitlines():
+        name, _, value = line.split('#', 1)[0].partition(':')
+        name, value = name.strip().lower(), value.strip()
+        if name == 'user-agent':
+            if in_rules:
+                group_agents, in_rules = [], False
+            group_agent = value.split('/')[0].strip().lower()
+            if group_agent:
+                group_agents.append(group_agent)
+        elif name:
+            in_rules = True
+            if name == 'crawl-delay':
+                try:
+                    delay = float(value)
+                except ValueError:
+                    continue
+                for group_agent in group_agents:
+                    delays.setdefault(group_agent, delay)
+    delay = next((delay for group_agent, delay in delays.items() if group_agent == agent),
+                 delays.get('*'))
+    return delay if delay and delay > 0 else None
+
+class Ticket:
+    """A reserved request slot; hand it back with AdaptiveThrottle.release()."""
+    __slots__ = ('host', 'started')
+
+    def __init__(self, host, started):
+        self.host = host
+        self.started = started
+
+class _HostState:
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.next_start = 0.0
+        self.crawl_delay = None
+        self.robots_checked = threading.Event()
+        self.robots_claimed = False
+        self.smoothed_latency = None
+        self.best_latency = None
+        self.last_decrease = 0.0
+        self.ceiling = None
+        self.last_pushback = 0.0
+        self.requests = 0
+        self.completed = 0
+        self.throttled = 0
+        self.errors = 0
+        self.paused_seconds = 0.0
+        self.increases = 0
+        self.decreases = 0
+        self.peak_limit = limit
+        self.lowest_limit = limit
+        self.first_start = None
+        self.last_end = None
+        self.async_waiters = []
+
+    @property
+    def slots(self):
+        return 1 if self.crawl_delay else max(MIN_LIMIT, int(self.limit))
+
+class AdaptiveThrottle:
+    """AIMD control of the requests in flight to each host.
+
+    `max_limit` caps the requests in flight to one host. `user_agent` is
+    matched against robots.txt when looking for a Crawl-delay; set
+    `respect_robots` to False to skip fetching robots.txt.
+    """
+    def __init__(self, initial_limit=DEFAULT_INITIAL_LIMIT, max_limit=DEFAULT_MAX_LIMIT, user_agent='*',
+                 respect_robots=True, headers=None):
+        self.max_limit = max(MIN_LIMIT, max_limit)
+        self.initial_limit = min(max(MIN_LIMIT, initial_limit), self.max_limit)
+        self.user_agent = user_agent
+        self.respect_robots = respect_robots
+        self.headers = headers
+        self.started = time.monotonic()
+        self.decisions = deque(maxlen=DECISION_LOG_SIZE)
+        self._hosts = {}
+        self._condition = threading.Condition()
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.initial_limit)
+        return state
+
+    def _decide(self, host, state, action, reason):
+        self.decisions.append({
+            'time': round(time.monotonic() - self.started, 3), 'host': host, 'action': action,
+            'limit': state.slots, 'reason': reason,
+        })
+        logger.debug(f"{host}: {action} to {state.slots} ({reason})")
+
+    def prepare(self, url):
+        """Read the host's robots.txt Crawl-delay once; blocks until another caller has done so."""
+        parts = urlsplit(url)
+        host = parts.netloc.lower()
+        with self._condition:
+            state = self._state(host)
+            claimed = not state.robots_claimed
+            state.robots_claimed = True
+        if not claimed:
+            state.robots_checked.wait()
+            return
+        delay = None
+        if self.respect_robots:
+            try:
+                response = cached_get(f"{parts.scheme}://{parts.netloc}/robots.txt", headers=self.headers,
+                                      timeout=ROBOTS_TIMEOUT)
+                if response.status_code == 200:
+                    delay = robots_crawl_delay(response.text, self.user_agent)
+            except Exception as e:
+                logger.debug(f"Could not read robots.txt for {host}: {e}")
+        if delay:
+            with self._condition:
+                state.crawl_delay = delay
+                self._decide(host, state, 'crawl-delay', f"robots.txt asks for {delay:g}s between requests")
+        state.robots_checked.set()
+
+    def _try_reserve(self, host, now):
+        """Reserve a slot for `host`, returning a Ticket, or the seconds to wait (None until a release)."""
+        state = self._state(host)
+        if now < state.next_start:
+            return state.next_start - now
+        if state.in_flight >= state.slots:
+            return None
+        state.in_flight += 1
+        state.requests += 1
+        if state.crawl_delay:
+            state.next_start = now + state.crawl_delay
+        if state.first_start is None:
+            state.first_start = now
+        return Ticket(host, now)
+
+    def acquire(self, url):
+        """Wait for a request slot for the host of `url` and return its Ticket."""
+        host = urlsplit(url).netloc.lower()
+        start = time.monotonic()
+        with self._condition:
+            while True:
+                outcome = self._try_reserve(host, time.monotonic())
+                if isinstance(outcome, Ticket):
+                    break
+                self._condition.wait(outcome)
+        record_stage('wait', time.monotonic() - start)
+        return outcome
+
+    async def acquire_async(self, url):
+        """acquire() for coroutines; waits without blocking the event loop."""
+        host = urlsplit(url).netloc.lower()
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        while True:
+            with self._condition:
+                outcome = self._try_reserve(host, time.monotonic())
+                if isinstance(outcome, Ticket):
+                    break
+                waiter = loop.create_future()
+                self._state(host).async_waiters.append((loop, waiter))
+            try:
+                await asyncio.wait_for(waiter, outcome)
+            except asyncio.TimeoutError:
+                pass
+        record_stage('wait', time.monotonic() - start)
+        return outcome
+
+    def release(self, ticket, status=None, retry_after=None):
+        """Hand back a slot with the response status (None if the request failed) and its Retry-After."""
+        now = time.monotonic()
+        latency = now - ticket.started
+        host = ticket.host
+        with self._condition:
+            state = self._state(host)
+            state.in_flight -= 1
+            state.completed += 1
+            state.last_end = now
+            # Signals from requests sent before the last cut describe the old limit.
+            fresh_signal = ticket.started >= state.last_decrease
+            if status in THROTTLE_STATUSES:
+                state.throttled += 1
+                pause = parse_retry_after(retry_after)
+                pause = DEFAULT_THROTTLE_PAUSE if pause is None else pause
+                if now + pause > state.next_start:
+                    state.paused_seconds += now + pause - max(now, state.next_start)
+                    state.next_start = now + pause
+                    self._decide(host, state, 'pause', f"HTTP {status}, waiting {pause:g}s")
+            if status is None or status in OVERLOAD_STATUSES:
+                state.errors += status not in THROTTLE_STATUSES
+                if fresh_signal:
+                    state.ceiling = state.slots
+                    state.last_pushback = now
+                    self._decrease(host, state, DECREASE_FACTOR, now,
+                                   "request failed" if status is None else f"HTTP {status}")
+            else:
+                if state.best_latency is None or latency < state.best_latency:
+                    state.best_latency = latency
+                state.smoothed_latency = latency if state.smoothed_latency is None else (
+                    LATENCY_SMOOTHING * latency + (1 - LATENCY_SMOOTHING) * state.smoothed_latency)
+                if (fresh_signal and state.smoothed_latency >
+                        LATENCY_BACKOFF_RATIO * state.best_latency + LATENCY_BACKOFF_SLACK):
+                    self._decrease(host, state, LATENCY_DECREASE_FACTOR, now,
+                                   f"latency {state.smoothed_latency:.2f}s vs best {state.best_latency:.2f}s")
+                elif state.limit < self.max_limit and not state.crawl_delay:
+                    slots = state.slots
+                    cap = self.max_limit
+                    if state.ceiling is not None and now - state.last_pushback < PROBE_INTERVAL:
+                        cap = min(cap, state.ceiling - 0.01)
+                    state.limit = max(state.limit, min(cap, state.limit + 1 / state.limit))
+                    state.peak_limit = max(state.peak_limit, state.limit)
+                    if state.slots > slots:
+                        state.increases += 1
+                        self._decide(host, state, 'increase', f"latency {state.smoothed_latency:.2f}s")
+            self._condition.notify_all()
+            waiters, state.async_waiters = state.async_waiters, []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+
+    def _decrease(self, host, state, factor, now, reason):
+        state.limit = max(MIN_LIMIT, state.limit * factor)
+        state.lowest_limit = min(state.lowest_limit, state.limit)
+        state.last_decrease = now
+        state.decreases += 1
+        self._decide(host, state, 'decrease', reason)
+
+    def report(self):
+        """Return per-host throughput and limits and the most recent throttle decisions."""
+        with self._condition:
+            hosts = {}
+            for host, state in sorted(self._hosts.items()):
+                active = (state.last_end - state.first_start) if state.first_start is not None and state.last_end else 0
+                hosts[host] = {
+                    'requests': state.requests,
+                    'completed': state.completed,
+                    'throttled': state.throttled,
+                    'errors': state.errors,
+                    'throughput': round(state.completed / active, 2) if active else None,
+                    'limit': state.slots,
+                    'peak_limit': max(MIN_LIMIT, int(state.peak_limit)),
+                    'lowest_limit': max(MIN_LIMIT, int(state.lowest_limit)),
+                    'increases': state.increases,
+                    'decreases': state.decreases,
+                    'paused_seconds': round(state.paused_seconds, 3),
+                    'crawl_delay': state.crawl_delay,
+                    'smoothed_latency': round(state.smoothed_latency, 4) if state.smoothed_latency is not None else None,
+                    'best_latency': round(state.best_latency, 4) if state.best_latency is not None else None,
+                }
+            return {'hosts': hosts, 'decisions': list(self.decisions)}
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+def log_throttle_report(report, log=logger):
+    """Log one line per host of an AdaptiveThrottle report."""
+    for host, summary in report['hosts'].items():
+        log.info(f"{host}: {summary['completed']} requests at {summary['throughput']}/s, limit {summary['limit']} "
+                 f"(peak {summary['peak_limit']}, lowest {summary['lowest_limit']}), {summary['throttled']} throttled, "
+                 f"{summary['errors']} failed, paused {summary['paused_seconds']}s"
+                 + (f", crawl-delay {summary['crawl_delay']:g}s" if summary['crawl_delay'] else ''))
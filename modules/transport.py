@@ -0,0 +1,322 @@
+"""Shared HTTP transport for every page, robots.txt and sitemap request.
+
+Sessions from `create_session` keep connections alive in a pool sized to
+the caller's concurrency and ask for compressed responses: gzip and
+deflate, plus brotli and zstd when urllib3 can decode them. GETs that fail
+to connect, time out or answer 500, 502 or 504 are retried a bounded
+number of times with jittered exponential backoff. 429 and 503 are left to
+the caller, where AdaptiveThrottle pauses the host for its Retry-After.
+
+`default_session` is the process-wide session used when no other is
+given. With ``LINK_FINDER_HTTP2=1`` and httpx installed with its http2
+extra, keyword searches download pages over HTTP/2; its responses are
+converted to requests.Response objects, so callers do not change.
+Requests, new connections and retries of every session are counted in
+`transport_stats`, which the run metrics report. Time spent opening
+connections goes to the connect stage of the current URL's trace; urllib3
+and httpx resolve host names while connecting, so DNS time is part of it.
+"""
+import datetime
+import importlib.util
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+except ImportError:  # optional, only needed for HTTP/2
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    'User-Agent': "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36"
+}
+DEFAULT_POOL_SIZE = 16
+# Hosts whose connection pools a session keeps; pages of one site share a pool.
+POOLED_HOSTS = 100
+KEEPALIVE_SECONDS = 30
+DEFAULT_RETRIES = 2
+RETRY_STATUSES = frozenset({500, 502, 504})
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+HTTP2_ENABLED = os.environ.get('LINK_FINDER_HTTP2', '0') == '1'
+HTTP2_SUPPORTED = httpx is not None and importlib.util.find_spec('h2') is not None
+
+class TransportStats:
+    """Requests, new connections, retries and HTTP versions of every session in this process."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._retries = Counter()
+        self._versions = Counter()
+
+    def add(self, name, count=1):
+        with self._lock:
+            self._counts[name] += count
+
+    def add_retry(self, reason):
+        with self._lock:
+            self._retries[reason] += 1
+
+    def add_response(self, version):
+        with self._lock:
+            self._versions[version] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {'counts': Counter(self._counts), 'retries': Counter(self._retries),
+                    'versions': Counter(self._versions)}
+
+    def since(self, snapshot):
+        """Return what was counted after `snapshot` as a JSON-serializable dict."""
+        current = self.snapshot()
+        counts, retries, versions = (current[key] - snapshot[key] for key in ('counts', 'retries', 'versions'))
+        return {
+            'requests': counts['requests'],
+            'connections_opened': counts['connections_opened'],
+            'connections_reused': max(counts['requests'] - counts['connections_opened'], 0),
+            'retries': sum(retries.values()),
+            'retries_by_reason': dict(retries),
+            'http_versions': dict(versions),
+        }
+
+transport_stats = TransportStats()
+
+def backoff_delay(retry):
+    """Seconds to wait before retry number `retry` (from 1): exponential, with the upper half jittered."""
+    ceiling = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (retry - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+class _CountingRetry(Retry):
+    """urllib3 Retry that counts the retries it allows and backs off with jitter."""
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        transport_stats.add_retry(type(error).__name__ if error is not None else f"HTTP {response.status}")
+        return retry
+
+    def get_backoff_time(self):
+        return backoff_delay(len(self.history)) if self.history else 0
+
+def retry_policy(retries=DEFAULT_RETRIES):
+    """Retry idempotent requests on connection errors, timeouts and RETRY_STATUSES, `retries` times at most."""
+    return _CountingRetry(
+        total=retries, connect=retries, read=retries, status=retries, other=0,
+        allowed_methods=frozenset({'GET', 'HEAD'}), status_forcelist=RETRY_STATUSES,
+        # 429 and 503 are paced by the caller's throttle, not slept on here.
+        respect_retry_after_header=False, raise_on_status=False,
+    )
+
+def _record_request_setup(name, seconds):
+    # Imported here because modules.metrics imports this module.
+    from modules.metrics import record_request_setup
+    record_request_setup(name, seconds)
+
+class _TimedConnectionMixin:
+    """Records connection setup (DNS, TCP, and TLS for HTTPS) in the current trace.
+
+    urllib3 resolves inside its connect, so DNS time is part of connect.
+    """
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _record_request_setup('connect', time.perf_counter() - start)
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+def _http_version(version):
+    return f"HTTP/{version // 10}.{version % 10}" if version else 'unknown'
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+    def _new_conn(self):
+        transport_stats.add('connections_opened')
+        return super()._new_conn()
+
+    def urlopen(self, *args, **kwargs):
+        # Retries re-enter urlopen, so every attempt is counted.
+        transport_stats.add('requests')
+        response = super().urlopen(*args, **kwargs)
+        transport_stats.add_response(_http_version(getattr(response, 'version', None)))
+        return response
+
+class _CountingHTTPSConnectionPool(_CountingHTTPConnectionPool, HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+class _PooledAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _CountingHTTPConnectionPool,
+                                                   'https': _CountingHTTPSConnectionPool}
+
+class Http2Session:
+    """The part of requests.Session this package uses, over an httpx HTTP/2 client.
+
+    Responses come back as requests.Response objects and httpx errors are
+    raised as the matching requests exceptions. Streaming is not supported,
+    so sitemaps always use a requests session.
+    """
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES, headers=None):
+        self.headers = dict(headers or {})
+        self.retries = retries
+        self._limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size,
+                                    keepalive_expiry=KEEPALIVE_SECONDS)
+        # httpx verifies certificates per client, not per request.
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _client(self, verify):
+        with self._lock:
+            if verify not in self._clients:
+                self._clients[verify] = httpx.Client(http2=True, verify=verify, limits=self._limits,
+                                                     headers=self.headers, follow_redirects=True)
+            return self._clients[verify]
+
+    def get(self, url, headers=None, timeout=None, verify=True, stream=False, **kwargs):
+        if stream:
+            raise ValueError("Http2Session cannot stream responses")
+        client = self._client(verify)
+        for retry in range(1, self.retries + 2):
+            transport_stats.add('requests')
+            trace = _Http2Trace()
+            try:
+                response = client.get(url, headers=headers, timeout=timeout, extensions={'trace': trace})
+            except httpx.TransportError as e:
+                if retry > self.retries:
+                    raise _requests_error(e) from e
+                transport_stats.add_retry(type(e).__name__)
+            else:
+                transport_stats.add_response(response.http_version)
+                if response.status_code not in RETRY_STATUSES or retry > self.retries:
+                    return _requests_response(response, trace.headers_elapsed)
+                transport_stats.add_retry(f"HTTP {response.status_code}")
+            time.sleep(backoff_delay(retry))
+
+    def close(self):
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class _Http2Trace:
+    """httpcore trace callback: counts new connections and times their setup and the response headers."""
+    def __init__(self):
+        self._started = self._step_started = time.perf_counter()
+        self.headers_elapsed = None
+
+    def __call__(self, event, info):
+        now = time.perf_counter()
+        if event in ('connection.connect_tcp.started', 'connection.start_tls.started'):
+            self._step_started = now
+        elif event in ('connection.connect_tcp.complete', 'connection.start_tls.complete'):
+            if event == 'connection.connect_tcp.complete':
+                transport_stats.add('connections_opened')
+            _record_request_setup('connect', now - self._step_started)
+        elif event.endswith('.receive_response_headers.complete'):
+            self.headers_elapsed = datetime.timedelta(seconds=now - self._started)
+
+def _requests_error(error):
+    message = str(error) or type(error).__name__
+    if isinstance(error, httpx.ConnectTimeout):
+        return requests.exceptions.ConnectTimeout(message)
+    if isinstance(error, httpx.TimeoutException):
+        return requests.exceptions.Timeout(message)
+    if isinstance(error, httpx.NetworkError):
+        return requests.exceptions.ConnectionError(message)
+    return requests.exceptions.RequestException(message)
+
+def _requests_response(response, headers_elapsed=None):
+    converted = requests.Response()
+    converted.status_code = response.status_code
+    converted.reason = response.reason_phrase
+    converted.url = str(response.url)
+    converted.headers = CaseInsensitiveDict(response.headers)
+    converted.encoding = response.charset_encoding
+    # Like requests, elapsed runs until the headers arrived, not until the body was read.
+    converted.elapsed = headers_elapsed or response.elapsed
+    converted._content = response.content
+    converted._content_consumed = True
+    return converted
+
+_warned_http2 = False
+
+def create_session(pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES, headers=None, http2=HTTP2_ENABLED):
+    """Return a keep-alive session with up to `pool_size` connections per host.
+
+    `headers` are added to DEFAULT_HEADERS and the Accept-Encoding this
+    process can decode. With `http2` (and httpx with HTTP/2 installed) an
+    Http2Session is returned instead of a requests.Session.
+    """
+    global _warned_http2
+    headers = {**DEFAULT_HEADERS, 'Accept-Encoding': ACCEPT_ENCODING, **(headers or {})}
+    if http2 and HTTP2_SUPPORTED:
+        return Http2Session(pool_size, retries, headers)
+    if http2 and not _warned_http2:
+        logger.warning("HTTP/2 needs httpx with HTTP/2 support (pip install 'httpx[http2]'); using HTTP/1.1")
+        _warned_http2 = True
+    session = requests.Session()
+    session.headers.update(headers)
+    adapter = _PooledAdapter(pool_connections=POOLED_HOSTS, pool_maxsize=pool_size,
+                             max_retries=retry_policy(retries))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+def default_session():
+    """Return the process-wide HTTP/1.1 session, for requests made without a session of their own."""
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = create_session(http2=False)
+        return _default_session
+
+def aiohttp_trace_config():
+    """Return an aiohttp TraceConfig that counts requests and new connections in `transport_stats`."""
+    async def on_request_start(session, context, params):
+        transport_stats.add('requests')
+
+    async def on_request_end(session, context, params):
+        version = params.response.version
+        transport_stats.add_response(f"HTTP/{version.major}.{version.minor}")
+
+    async def on_connection_create_end(session, context, params):
+        transport_stats.add('connections_opened')
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    return trace_config
+
+def log_transport_stats(stats, log=logger):
+    """Log one line summarizing TransportStats.since() output."""
+    retries = ', '.join(f"{reason} {count}" for reason, count in stats['retries_by_reason'].items())
+    log.info(f"HTTP: {stats['requests']} requests over {stats['connections_opened']} new connections "
+             f"({stats['connections_reused']} reused), {stats['retries']} retries" + (f" ({retries})" if retries else ''))
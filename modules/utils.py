@@ -0,0 +1,54 @@
+import re
+from functools import lru_cache
+import pandas as pd
+import requests.compat
+
+def clean_text(text):
+    if not text:
+        return ""
+    text = re.sub(r'<[^>]+>', ' ', text)
+    text = re.sub(r'[^\w\s]', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.lower().strip()
+
+# Plain http(s) URLs with an ASCII host and no characters or ;params that
+# urlparse treats specially; anything else goes through urlparse itself.
+SIMPLE_URL_RE = re.compile(r"(https?)://([!$&'()*+,\-.0-9:=@A-Z_a-z~%]+)(/[^?#;\t\r\n]*)?(?:[?#][^\t\r\n]*)?\Z")
+# Distinct URLs remembered by standardize_url; navigation links repeat on every page.
+STANDARDIZE_CACHE_SIZE = 100000
+
+@lru_cache(maxsize=STANDARDIZE_CACHE_SIZE)
+def standardize_url(url):
+    url = url.strip()
+    if url.startswith("www."):
+        url = "https://" + url
+    elif not url.startswith(('http://', 'https://')):
+        url = "https://" + url
+    match = SIMPLE_URL_RE.match(url)
+    if match:
+        scheme, netloc, path = match.groups()
+        path = path.rstrip('/') if path and path != '/' else (path or '')
+        return f"{scheme}://{netloc.lower()}{path}"
+    parsed = requests.compat.urlparse(url)
+    netloc = parsed.netloc.lower()
+    path = parsed.path.rstrip('/') if parsed.path != '/' else '/'
+    standardized = requests.compat.urlunparse(
+        (parsed.scheme, netloc, path, '', '', '')
+    )
+    return standardized
+
+def standardize_urls(urls):
+    """Standardize a whole list, array or Series of URLs.
+
+    Each distinct URL is standardized once. A Series comes back as a Series
+    with the same index, anything else as a list.
+    """
+    if isinstance(urls, pd.Series):
+        unique_urls = urls.unique()
+        return urls.map(dict(zip(unique_urls, map(standardize_url, unique_urls))))
+    return [standardize_url(url) for url in urls]
+
+def read_table(path_or_file, name=None):
+    """Read a CSV or Excel file into a DataFrame, choosing the reader by file name."""
+    name = name or str(path_or_file)
+    return pd.read_csv(path_or_file) if name.endswith('.csv') else pd.read_excel(path_or_file)